@@ -0,0 +1,26 @@
+"""
+Gunicorn settings – picked up automatically from the project root.
+
+Only lifecycle hooks live here; workers/threads/bind still come from the
+command line or env (WEB_CONCURRENCY, PORT) as before.
+"""
+
+
+def post_worker_init(worker):
+    # Periodic retention pruning, if RETENTION_PRUNE_INTERVAL is set.
+    from portfolio import retention
+    retention.start_periodic_pruner()
+
+    # Deliver queued emails (and retries) from this worker.
+    from django.conf import settings
+    from portfolio import outbox
+    if getattr(settings, 'OUTBOX_DELIVERY', 'thread') == 'thread':
+        outbox.start_worker()
+
+
+def worker_exit(server, worker):
+    # Write any visits still sitting in this worker's in-memory queue
+    # before the process goes away.
+    from portfolio import outbox, tracking
+    tracking.shutdown()
+    outbox.shutdown()
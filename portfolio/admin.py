@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, Skill, ContactMessage, SiteSettings
+from .models import Project, Skill, ContactMessage, OutboxEmail, SiteSettings
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
@@ -31,6 +31,13 @@ class ContactMessageAdmin(admin.ModelAdmin):
     mark_as_read.short_description = "Mark selected as read"
 
 
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
+
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
@@ -0,0 +1,267 @@
+"""
+Self-hosted front-end bundle.
+
+The public pages used to load Bootstrap, Bootstrap Icons, AOS,
+particles.js and Google Fonts from four other origins. ``build()``
+downloads the pinned versions listed below, keeps only what the templates
+use, and writes the bundles to ASSET_BUNDLE_DIR (portfolio/static/bundle):
+
+    site.css      Bootstrap + the icons actually used + AOS + Space Grotesk / JetBrains Mono
+    site.js       Bootstrap bundle + particles.js + AOS + portfolio/js/main.js (minified)
+    project.css   Orbitron / Rajdhani for the project pages
+    fonts/        latin-only woff2 files, and the icon font cut down to the used glyphs
+
+collectstatic then hashes every file and precompresses it (gzip +
+brotli) through WhiteNoise's CompressedManifestStaticFilesStorage.
+Because the names are hashed, WhiteNoise serves them with a one-year
+immutable Cache-Control.
+
+    python manage.py build_assets      # before collectstatic
+
+Needs network access, plus rjsmin / rcssmin / fonttools (requirements.txt).
+
+Every vendor file and every font file must match the SRI hash pinned for
+its URL in asset_pins.json, or the build fails. After changing a version
+(or when Google Fonts moves to new font URLs):
+
+    python manage.py build_assets --pin   # records hashes for new URLs; review the diff
+
+--pin never replaces an existing hash, so a changed file still fails.
+The Google Fonts stylesheets themselves are not pinned (their content
+depends on the User-Agent); the font files they point at are.
+
+Until the bundle is built, {% bundle %} (templatetags/bundle.py) loads
+the same files from their CDNs and {% bundle_csp %} allows those origins.
+
+render.yaml does not run build_assets yet: asset_pins.json only has the
+Bootstrap hashes, and the build refuses every other download. Record the
+rest with --pin, review them, and add the step in front of build_styles
+in the same change.
+"""
+
+import base64
+import hashlib
+import json
+import re
+import urllib.request
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+
+
+# name -> url; the SRI hashes are in asset_pins.json
+VENDOR = {
+    'bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+    'bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+    'bootstrap-icons.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css',
+    'bootstrap-icons.woff2': 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff2',
+    'aos.css': 'https://unpkg.com/aos@2.3.1/dist/aos.css',
+    'aos.js': 'https://unpkg.com/aos@2.3.1/dist/aos.js',
+    'particles.min.js': 'https://cdn.jsdelivr.net/npm/particles.js@2.0.0/particles.min.js',
+}
+
+GOOGLE_FONTS = {
+    'site': 'https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@300;400;500;600;700'
+            '&family=JetBrains+Mono:wght@400;500;600;700&display=swap',
+    'project': 'https://fonts.googleapis.com/css2?family=Orbitron:wght@700;900'
+               '&family=Rajdhani:wght@300;400;600;700&display=swap',
+}
+
+# icon names main.js assembles at runtime (showNotification), so the scan can't see them
+DYNAMIC_ICONS = {'check-circle', 'exclamation-circle', 'info-circle'}
+
+# Google Fonts only sends woff2 to browsers it recognises
+_BROWSER_UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+_SOURCE_MAP = re.compile(r'/[/*][#@] sourceMappingURL=[^\s*]+(?: \*/)?')
+_ICON_CLASS = re.compile(r'\bbi-([a-z0-9-]+)')
+_ICON_RULE = re.compile(r'\.bi-([a-z0-9-]+)::?before\s*\{\s*content:\s*"\\([0-9a-f]+)"\s*;?\s*\}')
+_FONT_FACE = re.compile(r'/\*\s*([a-z-]+)\s*\*/\s*(@font-face\s*\{[^}]*\})')
+_URL = re.compile(r'url\(([^)]+)\)')
+
+
+def bundle_dir():
+    return Path(getattr(settings, 'ASSET_BUNDLE_DIR', settings.BASE_DIR / 'portfolio' / 'static' / 'bundle'))
+
+
+def pins_path():
+    return Path(getattr(settings, 'ASSET_PINS_FILE', Path(__file__).resolve().parent / 'asset_pins.json'))
+
+
+def load_pins():
+    try:
+        return json.loads(pins_path().read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def save_pins(pins):
+    pins_path().write_text(json.dumps(dict(sorted(pins.items())), indent=2) + '\n')
+
+
+def integrity(body, algorithm='sha384'):
+    return f'{algorithm}-{base64.b64encode(hashlib.new(algorithm, body).digest()).decode()}'
+
+
+def fetch(url):
+    request = urllib.request.Request(url, headers={'User-Agent': _BROWSER_UA})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def check(url, body, expected):
+    actual = integrity(body, expected.split('-', 1)[0])
+    if actual != expected:
+        raise ValueError(f'{url}: integrity mismatch (pinned {expected}, got {actual})')
+
+
+def pinned(pins, record=False, fetch=fetch):
+    """
+    A fetch() that checks every download against `pins` ({url: SRI hash}).
+    An unpinned URL is an error, unless `record` is set: then its hash is
+    added to `pins`.
+    """
+    def fetch_pinned(url):
+        expected = pins.get(url)
+        if expected is None and not record:
+            raise ValueError(f'{url}: no pinned hash (manage.py build_assets --pin)')
+        body = fetch(url)
+        if expected is None:
+            pins[url] = integrity(body)
+        else:
+            check(url, body, expected)
+        return body
+    return fetch_pinned
+
+
+def strip_source_maps(text):
+    """The .map files are not vendored; the manifest storage would fail on the reference."""
+    return _SOURCE_MAP.sub('', text)
+
+
+# ---------------------------------------------------------------------------
+# Icons
+# ---------------------------------------------------------------------------
+
+def used_icons(paths):
+    """Bootstrap Icons class names (without 'bi-') that appear in `paths`."""
+    names = set()
+    for path in paths:
+        names.update(_ICON_CLASS.findall(Path(path).read_text(encoding='utf-8')))
+    return names
+
+
+def icon_css(css, used, font_url):
+    """Bootstrap Icons CSS with only the `used` icon rules. Returns (css, codepoints)."""
+    rules, codepoints = [], []
+    for name, code in _ICON_RULE.findall(css):
+        if name in used:
+            rules.append(f'.bi-{name}::before{{content:"\\{code}"}}')
+            codepoints.append(int(code, 16))
+    first = _ICON_RULE.search(css)
+    head = css[:first.start()] if first else css   # @font-face + the shared .bi rule
+    head = re.sub(r'src:[^;}]+', f'src:url("{font_url}") format("woff2")', head)
+    return head + ''.join(rules), codepoints
+
+
+def subset_font(data, codepoints):
+    """woff2 with only `codepoints` (fontTools)."""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(BytesIO(data))
+    subsetter = subset.Subsetter(subset.Options(flavor='woff2', layout_features=[]))
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    out = BytesIO()
+    font.flavor = 'woff2'
+    font.save(out)
+    return out.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Google Fonts
+# ---------------------------------------------------------------------------
+
+def latin_faces(css):
+    """The latin @font-face blocks of a Google Fonts stylesheet (the page text is English)."""
+    return [block for subset_name, block in _FONT_FACE.findall(css) if subset_name == 'latin']
+
+
+def localize_fonts(css, out_dir, prefix, fetch=fetch):
+    """Download the latin font files, point the CSS at them. Returns the rewritten CSS."""
+    faces = []
+    for block in latin_faces(css):
+        def download(match):
+            url = match.group(1).strip('\'"')
+            name = f'{prefix}-{hashlib.sha256(url.encode()).hexdigest()[:10]}.woff2'
+            target = out_dir / name
+            if not target.exists():
+                target.write_bytes(fetch(url))
+            return f'url("fonts/{name}")'
+        faces.append(_URL.sub(download, block))
+    return '\n'.join(faces)
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def template_sources():
+    root = Path(settings.BASE_DIR) / 'portfolio'
+    return sorted(root.glob('templates/portfolio/*.html')) + sorted(root.glob('static/portfolio/js/*.js'))
+
+
+def minify_css(text):
+    import rcssmin
+    return rcssmin.cssmin(text)
+
+
+def minify_js(text):
+    import rjsmin
+    return rjsmin.jsmin(text)
+
+
+def build(pin=False):
+    """
+    Write the bundles; returns {file name: bytes written}. With `pin`,
+    hashes for URLs without one are recorded in asset_pins.json.
+    """
+    out = bundle_dir()
+    fonts = out / 'fonts'
+    fonts.mkdir(parents=True, exist_ok=True)
+    pins = load_pins()
+    fetch_pinned = pinned(pins, record=pin)
+    vendor = {name: fetch_pinned(url) for name, url in VENDOR.items()}
+
+    css, codepoints = icon_css(
+        vendor['bootstrap-icons.min.css'].decode(), used_icons(template_sources()) | DYNAMIC_ICONS,
+        'fonts/bootstrap-icons.woff2',
+    )
+    (fonts / 'bootstrap-icons.woff2').write_bytes(subset_font(vendor['bootstrap-icons.woff2'], codepoints))
+
+    bundles = {
+        'site.css': minify_css('\n'.join([
+            strip_source_maps(vendor['bootstrap.min.css'].decode()),
+            css,
+            vendor['aos.css'].decode(),
+            localize_fonts(fetch(GOOGLE_FONTS['site']).decode(), fonts, 'site', fetch_pinned),
+        ])),
+        'project.css': minify_css(localize_fonts(fetch(GOOGLE_FONTS['project']).decode(), fonts, 'project', fetch_pinned)),
+        'site.js': ';\n'.join([
+            strip_source_maps(vendor['bootstrap.bundle.min.js'].decode()),
+            vendor['particles.min.js'].decode(),
+            minify_js(vendor['aos.js'].decode()),
+            minify_js((Path(settings.BASE_DIR) / 'portfolio' / 'static' / 'portfolio' / 'js' / 'main.js').read_text()),
+        ]),
+    }
+    if pin:
+        save_pins(pins)
+    written = {}
+    for name, text in bundles.items():
+        (out / name).write_text(text, encoding='utf-8')
+        written[name] = len(text.encode())
+    for path in sorted(fonts.iterdir()):
+        written[f'fonts/{path.name}'] = path.stat().st_size
+    return written
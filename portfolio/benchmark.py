@@ -0,0 +1,277 @@
+"""
+In-process benchmark of every portfolio endpoint.
+
+``seed()`` fills SiteVisitor / ContactMessage / LoginAttempt with
+synthetic rows (visits spread over the last 90 days). ``run()`` drives each
+endpoint through the Django test client and records per-request latency
+and query count. It reports p50 / p95 / p99 and queries per request.
+Results are plain dicts so ``manage.py benchmark`` can write them as JSON
+and ``compare()`` can diff two runs (e.g. two commits).
+
+Everything goes through the full middleware stack, but not through a web
+server, so the numbers are the time spent in Django. Use
+``manage.py bench_servers`` to compare servers.
+"""
+
+import math
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import pagination, rollup, tracking, views
+from .models import ContactMessage, LoginAttempt, SiteVisitor
+
+
+PAGES = ['/', '/', '/', '/project/joint-force/', '/project/inventory-system/', '/project-example/']
+REFERRERS = ['', '', 'https://www.google.com/', 'https://github.com/Hishamharis', 'https://www.linkedin.com/']
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+]
+BENCH_IP = '198.51.100.1'   # TEST-NET-2 – never a real visitor
+
+
+# ---------------------------------------------------------------------------
+# Seeding
+# ---------------------------------------------------------------------------
+
+def _ip(rng, pool):
+    n = rng.randrange(pool)
+    return f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'
+
+
+def seed(rows, batch_size=5000, days=90, seed_value=1):
+    """
+    Insert `rows` visits plus rows // 10 messages and rows // 10 failed
+    logins, then roll the visits up like the nightly job would.
+    Returns {model name: rows inserted}.
+    """
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    span = days * 86400
+    ip_pool = max(rows // 20, 10)
+
+    def stamp():
+        return now - timedelta(seconds=rng.randrange(span))
+
+    def insert(model, count, make):
+        for start in range(0, count, batch_size):
+            model.objects.bulk_create([make() for _ in range(min(batch_size, count - start))])
+        return count
+
+    counts = {
+        'SiteVisitor': insert(SiteVisitor, rows, lambda: SiteVisitor(
+            ip_address=_ip(rng, ip_pool), page=rng.choice(PAGES), referrer=rng.choice(REFERRERS),
+            user_agent=rng.choice(USER_AGENTS), visited_at=stamp(),
+        )),
+        'ContactMessage': insert(ContactMessage, rows // 10, lambda: ContactMessage(
+            name='Bench Visitor', email='bench@example.com', subject='Hello',
+            message='Benchmark message body. ' * 8, ip_address=_ip(rng, ip_pool),
+            is_read=rng.random() < 0.8,
+        )),
+        'LoginAttempt': insert(LoginAttempt, rows // 10, lambda: LoginAttempt(ip_address=_ip(rng, ip_pool))),
+    }
+    rollup.update_rollups()
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+def _counter():
+    n = 0
+    while True:
+        n += 1
+        yield n
+
+
+def _contact(client, n):
+    return client.post(
+        '/api/contact/',
+        data=f'{{"name": "Bench", "email": "bench@example.com", "subject": "Bench {n}", "message": "Hi"}}',
+        content_type='application/json',
+        REMOTE_ADDR=f'203.0.113.{n % 250 + 1}',   # spread over IPs to stay under the rate limit
+    )
+
+
+def _failed_login(client, n):
+    return client.post('/admin-panel/login/', {'password': 'wrong'}, REMOTE_ADDR=f'192.0.2.{n % 250 + 1}')
+
+
+_cursors = {}
+
+
+def _visitors_page_two(client, n):
+    if 'visitors' not in _cursors:   # looked up once, during warm-up
+        page_size = getattr(settings, 'ADMIN_PAGE_SIZE', 50)
+        row = (SiteVisitor.objects.order_by('-visited_at', '-pk')
+               .values_list('visited_at', 'pk')[page_size - 1:page_size].first())
+        _cursors['visitors'] = pagination.encode_cursor(*row) if row else ''
+    return client.get('/admin-panel/visitors/', {'cursor': _cursors['visitors']})
+
+
+def _export(kind):
+    def request(client, n):
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response = client.get(f'/admin-panel/export/{kind}/', {'start': since})
+        b''.join(response.streaming_content)   # the work happens while streaming
+        return response
+    return request
+
+
+def _log_in(client):
+    """Give `client` an admin session directly, so the login is not part of what is measured."""
+    session = client.session
+    session[views.ADMIN_SESSION_KEY] = views._make_token()
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+
+def _logout(client, n):
+    return client.get('/admin-panel/logout/')
+
+
+_logout.prepare = _log_in   # each iteration logs out a fresh session
+
+
+# name -> (needs admin session, request(client, n)); a request may have a
+# .prepare(client), run untimed before each call. Together they must reach
+# every route in portfolio/urls.py (BenchmarkTests checks).
+ENDPOINTS = {
+    'portfolio_index':        (False, lambda c, n: c.get('/', HTTP_ACCEPT_ENCODING='gzip')),
+    'project_detail':         (False, lambda c, n: c.get('/project/joint-force/', HTTP_ACCEPT_ENCODING='gzip')),
+    'project_detail_404':     (False, lambda c, n: c.get('/project/does-not-exist/')),
+    'project_example':        (False, lambda c, n: c.get('/project-example/', HTTP_ACCEPT_ENCODING='gzip')),
+    'contact_api':            (False, _contact),
+    'csrf_cookie':            (False, lambda c, n: c.get('/api/csrf/')),
+    'admin_login_get':        (False, lambda c, n: c.get('/admin-panel/login/')),
+    'admin_login_failed':     (False, _failed_login),
+    'admin_dashboard':        (True,  lambda c, n: c.get('/admin-panel/')),
+    'admin_visitors':         (True,  lambda c, n: c.get('/admin-panel/visitors/')),
+    'admin_visitors_page2':   (True,  _visitors_page_two),
+    'admin_messages':         (True,  lambda c, n: c.get('/admin-panel/messages/')),
+    'admin_updates':          (True,  lambda c, n: c.get('/admin-panel/updates/')),
+    'admin_export_visitors':  (True,  _export('visitors')),
+    'admin_export_messages':  (True,  _export('messages')),
+    'admin_metrics':          (True,  lambda c, n: c.get('/admin-panel/metrics/')),
+    'admin_logout':           (False, _logout),   # its own session each time, the admin client stays logged in
+}
+
+
+# ---------------------------------------------------------------------------
+# Measuring
+# ---------------------------------------------------------------------------
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, queries, statuses):
+    ms = [t * 1000 for t in latencies]
+    return {
+        'requests': len(ms),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'max_queries': max(queries),
+        'statuses': sorted(set(statuses)),
+    }
+
+
+def measure(client, request, iterations, warmup, counter):
+    prepare = getattr(request, 'prepare', None)
+    for _ in range(warmup):
+        if prepare:
+            prepare(client)
+        request(client, next(counter))
+
+    latencies, queries, statuses, routes = [], [], [], set()
+    for _ in range(iterations):
+        n = next(counter)
+        if prepare:
+            prepare(client)
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = request(client, n)
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(ctx.captured_queries))
+        statuses.append(response.status_code)
+        if response.resolver_match is not None:
+            routes.add(response.resolver_match.view_name)
+    return {**summarize(latencies, queries, statuses), 'routes': sorted(routes)}
+
+
+def run(iterations=50, warmup=3, only=None):
+    """Benchmark every endpoint (or the names in `only`). Returns {name: summary}."""
+    public, admin = Client(), Client()
+    admin.post('/admin-panel/login/', {'password': settings.ADMIN_PANEL_PASSWORD}, REMOTE_ADDR=BENCH_IP)
+    counter = _counter()
+    _cursors.clear()
+
+    results = {}
+    for name, (needs_admin, request) in ENDPOINTS.items():
+        if only and name not in only:
+            continue
+        results[name] = measure(admin if needs_admin else public, request, iterations, warmup, counter)
+    tracking.shutdown()   # write out the queued visits before the caller tears the DB down
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'commit': commit,
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def compare(old, new, threshold=0.2):
+    """
+    Lines describing how `new` differs from `old` (both benchmark JSON
+    dicts). Returns (lines, regressed) where regressed lists endpoints whose
+    p95 grew by more than `threshold` or whose query count went up.
+    """
+    lines, regressed = [], []
+    for name, now in new['results'].items():
+        before = old.get('results', {}).get(name)
+        if before is None:
+            lines.append(f'  {name:<24} new')
+            continue
+        change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        more_queries = now['queries_per_request'] > before['queries_per_request']
+        flag = ''
+        if change > threshold or more_queries:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        lines.append(
+            f'  {name:<24} p95 {before["p95_ms"]:>8.2f} -> {now["p95_ms"]:>8.2f} ms ({change:+.0%})'
+            f'   queries {before["queries_per_request"]:>6} -> {now["queries_per_request"]:<6}{flag}'
+        )
+    return lines, regressed
@@ -0,0 +1,169 @@
+"""
+Per-view query budgets.
+
+Every named route in portfolio/urls.py has a budget: the most SQL
+statements it may run and the most time it may spend in the database
+for one request. The budgets are the cold-cache worst case, so a view
+that quietly grows a query fails here first. Transaction bookkeeping
+(SAVEPOINT / RELEASE) is not counted.
+
+    with budgets.within_budget('portfolio:admin_dashboard'):
+        self.client.get('/admin-panel/')          # tests: BudgetExceeded if over (queries only)
+
+QueryBudgetMiddleware (middleware.py) applies the same check to every
+request while QUERY_BUDGET_MODE is 'log' or 'raise' (development). Each
+report lists the offending SQL with the project code line that issued it.
+settings.QUERY_BUDGETS overrides single entries:
+{'portfolio:home': (max_queries, max_db_ms)}.
+"""
+
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+
+
+@dataclass(frozen=True)
+class Budget:
+    max_queries: int
+    max_db_ms: float
+
+
+BUDGETS = {
+    # public – page cache / pre-rendered hit is 0 (plus a version-stamp read
+    # every SITE_SETTINGS_RECHECK_SECONDS with a per-process cache); these are the misses
+    'portfolio:home':            Budget(4, 25),
+    'portfolio:project_detail':  Budget(4, 25),
+    'portfolio:project_example': Budget(4, 25),
+    'portfolio:contact_submit':  Budget(5, 50),
+    'portfolio:csrf_cookie':     Budget(0, 0),
+
+    # admin panel
+    'portfolio:admin_login':     Budget(4, 50),
+    'portfolio:admin_logout':    Budget(3, 25),
+    'portfolio:admin_dashboard': Budget(16, 250),   # includes folding in up to ROLLUP_MAX_HOURS_PER_REQUEST hours
+    'portfolio:admin_visitors':  Budget(3, 100),
+    'portfolio:admin_messages':  Budget(4, 100),
+    'portfolio:admin_updates':   Budget(3, 50),
+    'portfolio:admin_export':    Budget(2, 50),     # rows are streamed after the view returns
+    'portfolio:admin_metrics':   Budget(2, 25),
+}
+
+_TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def get_budget(view_name):
+    override = getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+    if override is not None:
+        return Budget(*override)
+    return BUDGETS.get(view_name)
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class QueryRecord:
+    sql: str
+    ms: float
+    origin: list
+
+
+@dataclass
+class QueryLog:
+    records: list = field(default_factory=list)
+
+    @property
+    def counted(self):
+        return [r for r in self.records if not r.sql.lstrip().upper().startswith(_TRANSACTION_CONTROL)]
+
+    @property
+    def count(self):
+        return len(self.counted)
+
+    @property
+    def db_ms(self):
+        return sum(r.ms for r in self.records)
+
+
+def _origin():
+    """The project frames (outside site-packages and this module) that led to the query."""
+    root = str(Path(settings.BASE_DIR))
+    frames = [
+        f'{Path(f.filename).relative_to(root)}:{f.lineno} in {f.name}'
+        for f in traceback.extract_stack()[:-3]
+        if f.filename.startswith(root) and 'site-packages' not in f.filename and f.filename != __file__
+    ]
+    return frames[-3:]
+
+
+_log = ContextVar('portfolio_query_log', default=None)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """On every connection (signals.py); adds the query to the recording() it runs under, if any."""
+    log = _log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.records.append(QueryRecord(sql, (time.perf_counter() - started) * 1000, _origin()))
+
+
+@contextmanager
+def recording():
+    """
+    Collect every query run inside the block, including those an async
+    view runs in sync_to_async threads (they inherit the context).
+    """
+    log = QueryLog()
+    token = _log.set(log)
+    try:
+        yield log
+    finally:
+        _log.reset(token)
+
+
+def violations(view_name, log, check_time=True):
+    """Human-readable budget overruns for `log` (empty when within budget)."""
+    budget = get_budget(view_name)
+    if budget is None:
+        return []
+    problems = []
+    if log.count > budget.max_queries:
+        problems.append(f'{log.count} queries (budget {budget.max_queries})')
+    if check_time and log.db_ms > budget.max_db_ms:
+        problems.append(f'{log.db_ms:.1f} ms in the database (budget {budget.max_db_ms:g} ms)')
+    return problems
+
+
+def report(view_name, log, problems):
+    lines = [f'{view_name} over budget: {", ".join(problems)}']
+    for n, record in enumerate(log.counted, 1):
+        lines.append(f'  {n:>2}. [{record.ms:.2f} ms] {record.sql[:300]}')
+        lines.extend(f'        at {frame}' for frame in record.origin)
+    return '\n'.join(lines)
+
+
+@contextmanager
+def within_budget(view_name, check_time=False):
+    """
+    Test helper: raise BudgetExceeded if the block runs more queries than
+    `view_name`'s budget. Database time depends on the machine, so it is
+    only checked with check_time=True (QueryBudgetMiddleware always checks it).
+    """
+    if get_budget(view_name) is None:
+        raise KeyError(f'No query budget for {view_name!r}')
+    with recording() as log:
+        yield log
+    problems = violations(view_name, log, check_time)
+    if problems:
+        raise BudgetExceeded(report(view_name, log, problems))
+
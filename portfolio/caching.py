@@ -0,0 +1,98 @@
+"""
+Process-local caching of rarely-changing values.
+
+``VersionedValue`` keeps a loaded value (e.g. the SiteSettings row) in the
+worker's memory, next to a version stamp for it. A worker serves its local
+copy without any query. At most every `recheck_seconds` it compares its
+stamp with the current one and reloads if they differ, so every worker
+sees an edit within that delay.
+
+Where the current stamp comes from depends on the cache:
+
+* shared cache (file, database, Redis …): a random stamp in the cache,
+  replaced by ``invalidate()`` (called from model signals);
+* per-process cache (the default LocMemCache): the cache can't tell other
+  workers anything, so the stamp is the result of the value's `stamp`
+  query, a cheap read that changes with every edit (e.g. an
+  ``updated_at`` column).
+"""
+
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+_MISSING = object()
+
+
+def is_process_local(alias='default'):
+    """True when the cache `alias` is not shared between worker processes."""
+    return isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+class VersionedValue:
+
+    def __init__(self, name, loader, recheck_seconds=5, stamp=None):
+        self.name = name
+        self.loader = loader
+        self.recheck_seconds = recheck_seconds
+        self.stamp = stamp   # () -> value that changes with every edit, read from the DB
+        self.version_key = f'portfolio:version:{name}'
+        self._value = _MISSING
+        self._version = None
+        self._checked_until = 0.0
+        # re-entrant: the loader may save a row, and the post_save signal
+        # calls invalidate() on this same thread
+        self._lock = threading.RLock()
+
+    def _shared_version(self):
+        if self.stamp is not None and is_process_local():
+            return str(self.stamp())
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self):
+        value = self._value
+        if value is not _MISSING and time.monotonic() < self._checked_until:
+            return value
+
+        with self._lock:
+            version = self._shared_version()
+            if self._value is _MISSING or version != self._version:
+                self._value = self.loader()
+                self._version = version
+            recheck = self.recheck_seconds() if callable(self.recheck_seconds) else self.recheck_seconds
+            self._checked_until = time.monotonic() + recheck
+            return self._value
+
+    async def aget(self):
+        """get() for async code: no thread hop unless a recheck is due."""
+        value = self._value
+        if value is not _MISSING and time.monotonic() < self._checked_until:
+            return value
+        return await sync_to_async(self.get)()
+
+    async def aversion(self):
+        await self.aget()
+        return self._version
+
+    @property
+    def version(self):
+        """Current shared version stamp – handy as part of other cache keys."""
+        if self._value is _MISSING or time.monotonic() >= self._checked_until:
+            self.get()
+        return self._version
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+        with self._lock:
+            self._value = _MISSING
+            self._checked_until = 0.0
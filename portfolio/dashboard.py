@@ -0,0 +1,102 @@
+"""
+Admin dashboard numbers.
+
+Everything the dashboard shows comes from ``get_snapshot()``: one
+conditional-aggregate query over the hourly VisitorRollup table (total,
+today, 7-day chart), one over ContactMessage (total, unread) and the 5
+newest messages. Visit numbers never touch the raw SiteVisitor table
+beyond the rows added since the last rollup, which are folded in first
+(at most ROLLUP_MAX_HOURS_PER_REQUEST hours of them).
+Unique visitors (today / 7 days) are estimated from the per-day
+HyperLogLog sketches, so they cost the same however busy the site gets.
+
+The result is cached for DASHBOARD_CACHE_SECONDS, so new visits show up
+within that time. ``invalidate()`` drops it early when the contact form
+or the admin panel changes messages (rare, and the admin expects to see
+them at once).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import rollup
+from .models import ContactMessage, VisitorRollup
+
+
+CACHE_KEY = 'portfolio:dashboard:snapshot'
+CHART_DAYS = 7
+
+
+def _visitor_stats(now):
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    days = [today_start - timedelta(days=i) for i in range(CHART_DAYS - 1, -1, -1)]
+
+    def hits(**filters):
+        return Coalesce(Sum('hits', filter=Q(**filters) if filters else None), 0)
+
+    per_day = {
+        f'day_{i}': hits(bucket__gte=start, bucket__lt=start + timedelta(days=1))
+        for i, start in enumerate(days)
+    }
+    sketches = rollup.daily_sketches(days[0].date())
+    today_sketch = sketches.get(today_start.date())
+    row = VisitorRollup.objects.aggregate(
+        total=hits(),
+        today=hits(bucket__gte=today_start),
+        **per_day,
+    )
+    return {
+        'total_visits': row['total'],
+        'today_visits': row['today'],
+        'unique_today': today_sketch.count() if today_sketch else 0,
+        'unique_week': rollup.merged_count(sketches.values()),
+        'chart_labels': [day.strftime('%a') for day in days],
+        'chart_values': [row[f'day_{i}'] for i in range(CHART_DAYS)],
+    }
+
+
+def _message_stats():
+    row = ContactMessage.objects.aggregate(
+        total=Count('id'),
+        unread=Count('id', filter=Q(is_read=False)),
+    )
+    return {'total_messages': row['total'], 'unread': row['unread']}
+
+
+def build_snapshot(now=None):
+    # bounded, so a backlog never lands on one admin request (rollup_visitors catches up the rest)
+    rollup.update_rollups(max_hours=getattr(settings, 'ROLLUP_MAX_HOURS_PER_REQUEST', 48))
+    snapshot = _visitor_stats(now or timezone.now())
+    snapshot.update(_message_stats())
+    snapshot['recent_messages'] = list(
+        ContactMessage.objects.only('name', 'subject', 'created_at', 'is_read')
+        .order_by('-created_at')[:5]
+    )
+    return snapshot
+
+
+def get_snapshot():
+    snapshot = cache.get(CACHE_KEY)
+    if snapshot is None:
+        snapshot = build_snapshot()
+        cache.set(CACHE_KEY, snapshot, getattr(settings, 'DASHBOARD_CACHE_SECONDS', 30))
+    return snapshot
+
+
+def invalidate():
+    try:
+        cache.delete(CACHE_KEY)
+    except Exception:
+        pass
+
+
+async def ainvalidate():
+    try:
+        await cache.adelete(CACHE_KEY)
+    except Exception:
+        pass
@@ -0,0 +1,112 @@
+"""
+Row exports for SiteVisitor and ContactMessage.
+
+Rows are read with ``.values_list().iterator(chunk_size=...)`` and turned
+into CSV or NDJSON lines one at a time, so memory stays flat however many
+rows match. The same generators feed the admin download view
+(StreamingHttpResponse) and ``manage.py export_visitors`` (gzip file).
+
+Most columns are visitor-supplied (user agent, referrer, contact form
+fields). In CSV, text starting with = + - @ tab or CR is prefixed with
+a ' so a spreadsheet shows it instead of evaluating it.
+"""
+
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import ContactedIP, ContactMessage, SiteVisitor
+
+
+EXPORTS = {
+    'visitors': (
+        SiteVisitor, 'visited_at',
+        ('id', 'visited_at', 'ip_address', 'page', 'referrer', 'user_agent', 'sent_contact'),
+    ),
+    'messages': (
+        ContactMessage, 'created_at',
+        ('id', 'created_at', 'name', 'email', 'subject', 'message', 'ip_address', 'is_read'),
+    ),
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+
+
+def parse_day(value):
+    """'YYYY-MM-DD' -> date. Empty -> None. Raises ValueError on junk."""
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'Invalid date: {value!r}')
+    return day
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(kind, start=None, end=None, page=None):
+    """Matching rows as a values_list queryset. `start`/`end` are inclusive dates."""
+    model, date_field, fields = EXPORTS[kind]
+    qs = model.objects.order_by(date_field, 'pk')
+    if start:
+        qs = qs.filter(**{f'{date_field}__gte': _day_start(start)})
+    if end:
+        qs = qs.filter(**{f'{date_field}__lt': _day_start(end + timedelta(days=1))})
+    if kind == 'visitors':
+        qs = qs.annotate(sent_contact=ContactedIP.sent_contact())
+        if page:
+            qs = qs.filter(page=page)
+    return qs.values_list(*fields)
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# a spreadsheet treats a cell starting with one of these as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    """_cell() for CSV: visitor-supplied text that looks like a formula gets a leading quote."""
+    value = _cell(value)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(kind, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORTS[kind][2])
+    for row in rows:
+        yield writer.writerow([_csv_cell(v) for v in row])
+
+
+def ndjson_lines(kind, rows):
+    fields = EXPORTS[kind][2]
+    for row in rows:
+        yield json.dumps(dict(zip(fields, (_cell(v) for v in row))), ensure_ascii=False) + '\n'
+
+
+def stream(kind, fmt, start=None, end=None, page=None, chunk_size=CHUNK_SIZE):
+    """Yield the export as text lines."""
+    rows = export_queryset(kind, start=start, end=end, page=page).iterator(chunk_size=chunk_size)
+    lines = csv_lines if fmt == 'csv' else ndjson_lines
+    return lines(kind, rows)
@@ -0,0 +1,76 @@
+"""
+A small HyperLogLog sketch for counting unique visitors.
+
+With the default precision (p=11) a sketch is 2 KB – 2048 one-byte
+registers plus a one-byte header – whatever the number of visitors.
+The standard error is 1.04 / sqrt(2048) ≈ 2.3 %, so 99.7 % of estimates
+are within ±7 % of the exact count. Small sets (< ~5000 distinct values)
+use the linear-counting correction and are usually much closer.
+
+Sketches merge by taking the max of each register. Merging is
+idempotent, so adding the same IP twice, or merging overlapping days,
+never inflates the count. That makes it safe to combine sketches across
+days, pages and gunicorn workers.
+"""
+
+import hashlib
+import math
+
+
+DEFAULT_PRECISION = 11
+
+
+class HyperLogLog:
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+        if len(self.registers) != self.m:
+            raise ValueError('register count does not match precision')
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        index = x >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = x & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1   # position of the first 1-bit
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('cannot merge sketches with different precision')
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)   # linear counting for small sets
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+    # --- storage ---
+
+    def to_bytes(self):
+        return bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        blob = bytes(blob)
+        if not blob:
+            return cls()
+        return cls(precision=blob[0], registers=blob[1:])
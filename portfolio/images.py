@@ -0,0 +1,175 @@
+"""
+Responsive variants of the images in portfolio/static/images.
+
+``optimize()`` writes, for every source image, resized copies at
+IMAGE_WIDTHS (never wider than the original) in AVIF (when Pillow can
+write it), WebP and a fallback: PNG for images with transparency, JPEG
+for the rest (opaque screenshots included). They go to IMAGE_VARIANTS_DIR
+with content-hashed names, so they can be cached forever. manifest.json
+records the original size and every variant. Unchanged sources are
+skipped.
+
+The ``{% picture %}`` tag (templatetags/images.py) turns the manifest
+into a <picture> element with srcset, width/height and loading="lazy".
+Without a manifest it falls back to a plain <img>.
+
+    python manage.py optimize_images      # before collectstatic (render.yaml)
+"""
+
+import hashlib
+import json
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.templatetags.static import static
+from PIL import Image
+
+
+SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+
+# format name -> (mime type, extension, save options)
+FORMATS = {
+    'AVIF': ('image/avif', 'avif', {'quality': 55}),
+    'WEBP': ('image/webp', 'webp', {'quality': 80, 'method': 6}),
+    'PNG':  ('image/png', 'png', {'optimize': True}),
+    'JPEG': ('image/jpeg', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def source_dir():
+    return Path(getattr(settings, 'IMAGE_SOURCE_DIR', settings.BASE_DIR / 'portfolio' / 'static' / 'images'))
+
+
+def variants_dir():
+    return Path(getattr(settings, 'IMAGE_VARIANTS_DIR', settings.BASE_DIR / 'portfolio' / 'static' / 'optimized'))
+
+
+def _static_prefix():
+    """Static path of variants_dir(), e.g. 'optimized/'."""
+    for root in settings.STATICFILES_DIRS:
+        try:
+            return variants_dir().relative_to(root).as_posix() + '/'
+        except ValueError:
+            continue
+    raise ValueError('IMAGE_VARIANTS_DIR must be inside one of STATICFILES_DIRS')
+
+
+def output_formats(image):
+    """Modern formats first (the browser takes the first it supports), then PNG or JPEG."""
+    Image.init()
+    modern = ['AVIF', 'WEBP'] if 'AVIF' in Image.SAVE else ['WEBP']   # AVIF: Pillow 11.2+ or pillow-avif-plugin
+    fallback = 'PNG' if image.mode in ('RGBA', 'LA') else 'JPEG'
+    return modern + [fallback]
+
+
+def widths_for(width):
+    widths = [w for w in getattr(settings, 'IMAGE_WIDTHS', (320, 640, 960, 1280)) if w < width]
+    return widths + [min(width, getattr(settings, 'IMAGE_MAX_WIDTH', 1600))]
+
+
+def _encode(image, fmt):
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, fmt, **FORMATS[fmt][2])
+    return buffer.getvalue()
+
+
+def _opaque(image):
+    """Screenshots are often RGBA with no transparency; dropping alpha shrinks every variant."""
+    if image.mode in ('RGBA', 'LA') and image.getchannel('A').getextrema() == (255, 255):
+        return image.convert('RGB' if image.mode == 'RGBA' else 'L')
+    return image
+
+
+def _digest(data):
+    """Identifies the source bytes plus everything that decides the variants."""
+    options = (getattr(settings, 'IMAGE_WIDTHS', None), getattr(settings, 'IMAGE_MAX_WIDTH', None), FORMATS)
+    return hashlib.sha256(data + repr(options).encode()).hexdigest()[:16]
+
+
+def optimize_one(path, out_dir, prefix):
+    """Write every variant of `path`; returns its manifest entry."""
+    data = path.read_bytes()
+    with Image.open(BytesIO(data)) as original:
+        image = _opaque(original.convert('RGBA') if original.mode == 'P' else original.copy())
+
+    entry = {
+        'digest': _digest(data),
+        'width': image.width,
+        'height': image.height,
+        'bytes': len(data),
+        'sources': {},
+    }
+    stem = path.stem.lower().replace(' ', '-')
+    for fmt in output_formats(image):
+        mime, ext, _ = FORMATS[fmt]
+        variants = []
+        for width in widths_for(image.width):
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            body = _encode(resized, fmt)
+            name = f'{stem}-{width}w.{hashlib.sha256(body).hexdigest()[:10]}.{ext}'
+            (out_dir / name).write_bytes(body)
+            variants.append({'path': prefix + name, 'width': width, 'bytes': len(body)})
+        entry['sources'][mime] = variants
+    return entry
+
+
+def optimize(force=False):
+    """
+    Bring the variants up to date with the source images. Returns
+    {static path: (entry, rebuilt?)} and removes variants no longer listed.
+    """
+    src, out = source_dir(), variants_dir()
+    out.mkdir(parents=True, exist_ok=True)
+    prefix = _static_prefix()
+    previous = load_manifest(out) if not force else {}
+
+    manifest, results = {}, {}
+    for path in sorted(p for p in src.iterdir() if p.suffix.lower() in SOURCE_EXTENSIONS):
+        key = Path(src.name, path.name).as_posix()   # as written in {% static %}, e.g. images/Avatar.jpg
+        old = previous.get(key)
+        if old and old['digest'] == _digest(path.read_bytes()) and all(
+            (out / Path(v['path']).name).exists() for vs in old['sources'].values() for v in vs
+        ):
+            manifest[key], results[key] = old, (old, False)
+            continue
+        manifest[key] = optimize_one(path, out, prefix)
+        results[key] = (manifest[key], True)
+
+    keep = {Path(v['path']).name for e in manifest.values() for vs in e['sources'].values() for v in vs}
+    for stale in out.iterdir():
+        if stale.name != 'manifest.json' and stale.name not in keep:
+            stale.unlink()
+    (out / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    _manifest_cache.clear()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Reading the manifest (template tag)
+# ---------------------------------------------------------------------------
+
+_manifest_cache = {}
+
+
+def load_manifest(out=None):
+    path = Path(out or variants_dir()) / 'manifest.json'
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return {}
+    cached = _manifest_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            cached = (mtime, json.loads(path.read_text()))
+        except ValueError:
+            cached = (mtime, {})
+        _manifest_cache[path] = cached
+    return cached[1]
+
+
+def srcset(variants):
+    return ', '.join(f'{static(v["path"])} {v["width"]}w' for v in variants)
@@ -0,0 +1,153 @@
+"""
+Non-blocking, JSON-formatted logging.
+
+settings.LOGGING sends the ``portfolio`` loggers to BackgroundHandler.
+The request thread only puts the record on an in-memory queue. A
+QueueListener thread formats it as one JSON line and writes it to
+stderr, so a slow log pipe never holds up a response. When the queue is
+full, records are dropped and counted instead.
+
+    logger.exception('Visitor tracking failed', extra=log.request_extra(request))
+
+gives
+
+    {"time": "...", "level": "ERROR", "logger": "portfolio.tracking",
+     "message": "Visitor tracking failed", "route": "portfolio:home",
+     "ip_hash": "3f1c9a0b7d2e", "duration_ms": 4.2, "exception": "Traceback ..."}
+
+High-volume errors (a tracking failure repeats on every page view) go
+through SampledFilter: at most `burst` records per message per `window`
+seconds. The next record let through carries ``"suppressed": n``.
+"""
+
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+
+# LogRecord attributes that are not "extra" fields
+_STANDARD = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def hash_ip(ip):
+    """Short keyed hash of an IP, so log lines can be correlated without storing addresses."""
+    if not ip:
+        return ''
+    return hmac.new(settings.SECRET_KEY.encode(), ip.encode(), hashlib.sha256).hexdigest()[:12]
+
+
+def request_extra(request):
+    """`extra=` fields describing `request`: route, ip_hash and time spent so far."""
+    from .views import _get_client_ip
+
+    match = getattr(request, 'resolver_match', None)
+    extra = {
+        'route': match.view_name if match is not None else request.path,
+        'ip_hash': hash_ip(_get_client_ip(request)),
+    }
+    started = getattr(request, 'timing_started', None)   # set by RequestTimingMiddleware
+    if started is not None:
+        extra['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return extra
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields included."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update((k, v) for k, v in vars(record).items() if k not in _STANDARD and not k.startswith('_'))
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    QueueHandler with its own QueueListener writing to `stream`. The
+    formatter set on this handler (dictConfig 'formatter') is used by the
+    listener thread, so formatting is off the request thread too.
+    """
+
+    def __init__(self, stream=None, max_size=10000):
+        super().__init__(queue.Queue(maxsize=max_size))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.dropped = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.listener = None
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # same process: the record needs no pickling, the listener formats it
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():   # first record, or first one after a fork
+                self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self.listener.start()
+                self._pid = os.getpid()
+
+    def stop(self):
+        """Write out whatever is queued and stop the listener thread."""
+        if self.listener is not None and self._pid == os.getpid():
+            try:
+                self.listener.stop()
+            except queue.Full:
+                pass
+            self._pid = None
+
+
+class SampledFilter(logging.Filter):
+    """Let at most `burst` records per message template through per `window` seconds."""
+
+    def __init__(self, burst=5, window=60):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.lock = threading.Lock()
+        self.seen = {}   # (logger, msg) -> [window start, passed, suppressed]
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                entry = self.seen[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if entry[1] >= self.burst:
+                entry[2] += 1
+                return False
+            entry[1] += 1
+            return True
@@ -0,0 +1,163 @@
+"""
+Usage:
+    python manage.py bench_servers
+    python manage.py bench_servers --duration 20 --concurrency 50 --workers 4
+    python manage.py bench_servers --path / --path /project/inventory-system/
+
+What it does:
+    - Starts gunicorn (sync workers, portfolio_site.wsgi) and uvicorn
+      (portfolio_site.asgi with ASYNC_VIEWS=True) on free local ports, with
+      the same number of worker processes
+    - Hammers each one with the same paths from --concurrency client threads
+      for --duration seconds (one connection per request)
+    - Prints requests/second, p50 / p99 latency and errors for both
+
+Both servers use the database and cache from the current settings, so run
+`migrate` first. The load generator runs in this process; on a small
+machine it competes with the servers for CPU, so compare the two numbers
+with each other rather than with production traffic.
+"""
+
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f'Server exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'Server on port {port} did not start within {timeout}s')
+
+
+def _load(port, paths, concurrency, duration):
+    """Run the load; returns (latencies in seconds, error count)."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        nonlocal errors
+        own, own_errors, i = [], 0, offset
+        while time.monotonic() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                if response.status >= 500:
+                    own_errors += 1
+                    continue
+            except OSError:
+                own_errors += 1
+                continue
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+            errors += own_errors
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def _gunicorn(workers, port):
+    return [
+        sys.executable, '-m', 'gunicorn', 'portfolio_site.wsgi:application',
+        '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+    ]
+
+
+def _uvicorn(workers, port):
+    return [
+        sys.executable, '-m', 'uvicorn', 'portfolio_site.asgi:application',
+        '--workers', str(workers), '--host', '127.0.0.1', '--port', str(port),
+        '--log-level', 'warning', '--no-access-log',
+    ]
+
+
+SERVERS = [
+    ('gunicorn (sync)', _gunicorn, {'ASYNC_VIEWS': 'False'}),
+    ('uvicorn (async)', _uvicorn, {'ASYNC_VIEWS': 'True'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare gunicorn (sync) and uvicorn (async views) throughput on this machine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per server (default 10)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Client threads (default 20)')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes (default 2)')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to request (repeatable; default: home + one project page)')
+        parser.add_argument('--warmup', type=float, default=2, help='Warm-up seconds before measuring')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/', '/project/joint-force/']
+        results = []
+
+        for name, make_command, extra_env in SERVERS:
+            port = _free_port()
+            command = make_command(options['workers'], port)
+            env = {**os.environ, **extra_env}
+
+            self.stdout.write(f'Starting {name} on :{port} ...')
+            try:
+                process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+            except OSError as e:
+                raise CommandError(f'Could not start {name}: {e}')
+            try:
+                _wait_until_up(port, process)
+                _load(port, paths, options['concurrency'], options['warmup'])
+                started = time.monotonic()
+                latencies, errors = _load(port, paths, options['concurrency'], options['duration'])
+                elapsed = time.monotonic() - started
+            finally:
+                process.terminate()
+                try:
+                    process.wait(10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+            results.append((name, len(latencies) / elapsed, latencies, errors))
+
+        self.stdout.write(
+            f'\n{options["workers"]} worker(s), {options["concurrency"]} client(s), '
+            f'{options["duration"]:.0f}s each, paths: {", ".join(paths)}\n'
+        )
+        self.stdout.write(f'  {"server":<18} {"req/s":>9} {"p50 ms":>9} {"p99 ms":>9} {"errors":>7}')
+        for name, rate, latencies, errors in results:
+            if latencies:
+                p50 = statistics.median(latencies) * 1000
+                p99 = statistics.quantiles(latencies, n=100)[98] * 1000 if len(latencies) > 1 else p50
+            else:
+                p50 = p99 = float('nan')
+            self.stdout.write(f'  {name:<18} {rate:>9.1f} {p50:>9.1f} {p99:>9.1f} {errors:>7}')
@@ -0,0 +1,100 @@
+"""
+Usage:
+    python manage.py benchmark                              # 10k visits, 50 requests per endpoint
+    python manage.py benchmark --rows 1000000 --output bench-1m.json
+    python manage.py benchmark --compare bench-main.json    # exit 1 on a regression
+    python manage.py benchmark --only portfolio_index --only contact_api
+
+What it does:
+    - Creates a throwaway test database (your real data is never touched)
+    - Seeds --rows SiteVisitor rows, plus rows/10 ContactMessage and
+      LoginAttempt rows, and rolls the visits up
+    - Calls every public and admin-panel endpoint through the test client
+      and records p50 / p95 / p99 latency and queries per request
+    - Prints a table, writes the results as JSON (--output), and compares
+      them with an earlier run (--compare)
+
+Outgoing email is kept in memory during the run.
+"""
+
+import json
+import logging
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from portfolio import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every portfolio endpoint on a seeded throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='SiteVisitor rows to seed (default 10000)')
+        parser.add_argument('--iterations', type=int, default=50, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per endpoint first')
+        parser.add_argument('--only', action='append', choices=sorted(benchmark.ENDPOINTS),
+                            help='Benchmark only this endpoint (repeatable)')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Earlier results JSON to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='p95 growth counted as a regression (default 0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read {options["compare"]}: {e}')
+
+        logging.getLogger('django.request').setLevel(logging.ERROR)   # the 404 endpoint is expected
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                OUTBOX_DELIVERY='command',
+            ):
+                self.stdout.write(f'Seeding {options["rows"]:,} visits ...')
+                counts = benchmark.seed(options['rows'])
+                self.stdout.write(f'Running {options["iterations"]} requests per endpoint ...\n')
+                results = benchmark.run(options['iterations'], options['warmup'], options['only'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'environment': benchmark.environment(),
+            'seed': counts,
+            'iterations': options['iterations'],
+            'results': results,
+        }
+
+        self.stdout.write(f'  {"endpoint":<24} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8}  status')
+        for name, r in results.items():
+            self.stdout.write(
+                f'  {name:<24} {r["p50_ms"]:>9.2f} {r["p95_ms"]:>9.2f} {r["p99_ms"]:>9.2f} '
+                f'{r["queries_per_request"]:>8}  {",".join(map(str, r["statuses"]))}'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Results written to {options["output"]}'))
+
+        if baseline is not None:
+            lines, regressed = benchmark.compare(baseline, report, options['threshold'])
+            self.stdout.write(f'\nCompared with {options["compare"]} ({baseline.get("environment", {}).get("commit") or "?"}):')
+            for line in lines:
+                self.stdout.write(line)
+            if regressed:
+                self.stderr.write(self.style.ERROR(f'\n✗ Regressed: {", ".join(regressed)}'))
+                sys.exit(1)
+            self.stdout.write(self.style.SUCCESS('\n✓ No regressions'))
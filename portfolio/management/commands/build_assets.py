@@ -0,0 +1,45 @@
+"""
+Usage:
+    python manage.py build_assets
+    python manage.py build_assets --pin   # record hashes for new URLs in asset_pins.json
+
+What it does:
+    - Downloads the pinned Bootstrap / Bootstrap Icons / AOS / particles.js
+      files and the Google Fonts stylesheets (see portfolio/assets.py)
+    - Fails if a vendor or font file has no hash in portfolio/asset_pins.json
+      or does not match it
+    - Keeps only the icons the templates use (CSS rules + font glyphs) and
+      the latin font files
+    - Minifies and concatenates everything into portfolio/static/bundle/
+      (site.css, site.js, project.css, fonts/), which is not committed
+
+Run it before collectstatic; collectstatic then adds content hashes and
+.gz / .br copies. Needs network access. Not part of render.yaml until
+asset_pins.json covers every download (see portfolio/assets.py).
+"""
+
+from urllib.error import URLError
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio import assets
+
+
+class Command(BaseCommand):
+    help = 'Build the self-hosted CSS/JS/font bundle into portfolio/static/bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pin', action='store_true',
+                            help='Record SRI hashes for URLs that have none yet (existing ones are still enforced)')
+
+    def handle(self, *args, **options):
+        try:
+            written = assets.build(pin=options['pin'])
+        except (URLError, ValueError) as e:
+            raise CommandError(f'Could not build the asset bundle: {e}')
+        except ImportError as e:
+            raise CommandError(f'{e.name} is missing – pip install -r requirements.txt')
+
+        for name, size in written.items():
+            self.stdout.write(f'  {name:<40} {size / 1024:>8.1f} KB')
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {len(written)} file(s) in {assets.bundle_dir()}'))
@@ -0,0 +1,38 @@
+"""
+Usage:
+    python manage.py build_styles
+
+What it does:
+    - Splits the inline <style> block of index.html and the project
+      templates (see portfolio/styles.py):
+        * critical (above-the-fold) rules stay inline
+        * rules all project pages share  -> bundle/css/project-shared.css
+        * everything else                -> bundle/css/<template>.css
+    - Writes the rewritten templates to CSS_BUILD_DIR (build/templates),
+      which the template loader prefers while they match their source
+    - Prints the bytes saved per template
+
+Run it before collectstatic (render.yaml does this). Nothing it writes
+is committed.
+"""
+
+from django.core.management.base import BaseCommand
+
+from portfolio import styles
+
+
+class Command(BaseCommand):
+    help = 'Inline only the critical CSS of the public templates; move the rest to cacheable stylesheets'
+
+    def handle(self, *args, **options):
+        report = styles.build()
+
+        self.stdout.write(f'  {"template":<40} {"html before":>12} {"after":>9} {"inline css":>18} {"linked css":>11}')
+        for name, r in report.items():
+            saved = 1 - r['html_after'] / r['html_before']
+            self.stdout.write(
+                f'  {name:<40} {r["html_before"] / 1024:>9.1f} KB {r["html_after"] / 1024:>6.1f} KB '
+                f'{r["inline_css_before"] / 1024:>6.1f} -> {r["inline_css_after"] / 1024:>5.1f} KB '
+                f'{(r["page_css"] + r["shared_css"]) / 1024:>8.1f} KB   ({saved:.0%} less HTML)'
+            )
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {len(report)} template(s) built into {styles.build_dir()}'))
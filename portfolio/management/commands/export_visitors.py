@@ -0,0 +1,54 @@
+"""
+Usage:
+    python manage.py export_visitors
+    python manage.py export_visitors --format ndjson --start 2026-01-01 --end 2026-01-31
+    python manage.py export_visitors --page /project/joint-force/ --output visits.csv.gz
+
+What it does:
+    - Streams SiteVisitor rows (oldest first) straight into a gzip file
+    - Reads the table in chunks, so memory stays flat for millions of rows
+    - --kind messages exports ContactMessage rows the same way
+"""
+
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from portfolio import exports
+
+
+class Command(BaseCommand):
+    help = 'Export visitor (or message) rows to a gzip-compressed CSV / NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(exports.EXPORTS), default='visitors')
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--start', help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--page', help='Only visits to this path')
+        parser.add_argument('--output', help='Target file (default: <kind>-<timestamp>.<format>.gz)')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        kind, fmt = options['kind'], options['format']
+        try:
+            start = exports.parse_day(options['start'])
+            end = exports.parse_day(options['end'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = options['output'] or f"{kind}-{timezone.now():%Y%m%d-%H%M}.{fmt}.gz"
+        lines = exports.stream(
+            kind, fmt, start=start, end=end, page=options['page'], chunk_size=options['chunk_size'],
+        )
+
+        rows = 0
+        with gzip.open(output, 'wt', encoding='utf-8', newline='') as fh:
+            for line in lines:
+                fh.write(line)
+                rows += 1
+        if fmt == 'csv':
+            rows -= 1   # header line
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Exported {rows} row(s) to {output}'))
@@ -0,0 +1,42 @@
+"""
+Usage:
+    python manage.py optimize_images
+    python manage.py optimize_images --force     # rebuild every variant
+
+What it does:
+    - Reads every PNG / JPEG in portfolio/static/images
+    - Writes resized AVIF (if supported) / WebP / PNG-or-JPEG copies at
+      IMAGE_WIDTHS with content-hashed names into IMAGE_VARIANTS_DIR
+      (portfolio/static/optimized, not committed)
+    - Writes manifest.json there for the {% picture %} template tag
+
+Run it before collectstatic (render.yaml does this). Images whose source
+has not changed are skipped.
+"""
+
+from django.core.management.base import BaseCommand
+
+from portfolio import images
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/AVIF variants of the static images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants of unchanged images too')
+
+    def handle(self, *args, **options):
+        results = images.optimize(force=options['force'])
+
+        for path, (entry, rebuilt) in results.items():
+            # bytes of the widest variant per format, vs. the source
+            sizes = ', '.join(
+                f'{mime.split("/")[1]} {variants[-1]["bytes"] / 1024:.0f} KB'
+                for mime, variants in entry['sources'].items()
+            )
+            self.stdout.write(
+                f'  {path:<42} {entry["bytes"] / 1024:>6.0f} KB -> {sizes}'
+                f'{"" if rebuilt else "  (unchanged)"}'
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {len(results)} image(s) in {images.variants_dir()}'))
@@ -0,0 +1,36 @@
+"""
+Usage:
+    python manage.py prerender_pages
+    python manage.py prerender_pages --output /tmp/pages
+
+What it does:
+    - Renders the home page and every project page to static HTML
+      (PRERENDER_ROOT/<url path>/index.html)
+    - Writes gzip (.gz) and brotli (.br) variants next to each file
+    - Writes manifest.json, which PrerenderedPageMiddleware reads on startup
+
+Run it at deploy time, after migrate (render.yaml does this). Pages whose
+template, SiteSettings or projects change later are served by the normal views
+again until the next run.
+"""
+
+from django.core.management.base import BaseCommand
+
+from portfolio import prerender
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the public pages to static HTML (+ .gz / .br)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Target directory (default: PRERENDER_ROOT)')
+
+    def handle(self, *args, **options):
+        root = options['output'] or prerender.prerender_root()
+        manifest = prerender.build(root)
+
+        for path, entry in manifest['pages'].items():
+            sizes = ', '.join(f"{enc} {meta['size'] / 1024:.1f} KB" for enc, meta in entry['encodings'].items())
+            self.stdout.write(f'  {path:<28} {sizes}')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Pre-rendered {len(manifest["pages"])} page(s) into {root}'))
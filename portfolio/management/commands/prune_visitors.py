@@ -0,0 +1,55 @@
+"""
+Usage:
+    python manage.py prune_visitors
+    python manage.py prune_visitors --model SiteVisitor --batch-size 500 --sleep 0.1
+
+What it does:
+    - Deletes rows older than their retention (RETENTION_DAYS in settings)
+      from SiteVisitor, LoginAttempt and ContactMessage
+    - Works in small primary-key batches so it never locks a table for long
+    - Models whose retention is None are left alone
+    - Rolls up new SiteVisitor rows first; raw visits are only deleted
+      once they are counted in VisitorRollup
+    - Clears expired sessions (same as `manage.py clearsessions`)
+
+Run it from cron or after each deploy. Setting RETENTION_PRUNE_INTERVAL
+runs the same job inside the gunicorn workers instead.
+"""
+
+from django.core.management.base import BaseCommand
+
+from portfolio import retention, rollup
+
+
+class Command(BaseCommand):
+    help = 'Delete expired visitor / login / message rows in small batches, and expired sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(retention.PRUNABLE), action='append',
+                            help='Only prune this model (repeatable). Default: all.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows per DELETE (default: RETENTION_BATCH_SIZE)')
+        parser.add_argument('--sleep', type=float, default=None,
+                            help='Seconds to pause between batches (default: RETENTION_BATCH_SLEEP)')
+
+    def handle(self, *args, **options):
+        names = options['model'] or list(retention.PRUNABLE)
+
+        if 'SiteVisitor' in names:
+            rows, _ = rollup.catch_up()
+            self.stdout.write(f'  {"VisitorRollup":<15} {rows} new visit(s) rolled up')
+
+        for name in names:
+            days = retention.retention_days(name)
+            if days is None:
+                self.stdout.write(f'  {name:<15} kept forever')
+                continue
+            deleted = retention.prune_model(
+                name, batch_size=options['batch_size'], sleep=options['sleep'],
+            )
+            self.stdout.write(f'  {name:<15} {deleted} row(s) older than {days} days deleted')
+
+        retention.clear_expired_sessions()
+        self.stdout.write(f'  {"Sessions":<15} expired sessions cleared')
+
+        self.stdout.write(self.style.SUCCESS('✓ Retention prune finished'))
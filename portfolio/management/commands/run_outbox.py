@@ -0,0 +1,49 @@
+"""
+Usage:
+    python manage.py run_outbox                # keep running, poll every OUTBOX_POLL_SECONDS
+    python manage.py run_outbox --once         # send what is due now, then exit (cron)
+    python manage.py run_outbox --interval 10
+
+What it does:
+    - Picks up pending OutboxEmail rows that are due
+    - Sends them in batches of OUTBOX_BATCH_SIZE over one SMTP connection
+    - Reschedules failures with exponential backoff, gives up after
+      OUTBOX_MAX_ATTEMPTS
+
+Use it with OUTBOX_DELIVERY = 'command', or alongside the in-process
+thread – rows are leased, so nothing is sent twice.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from portfolio import outbox
+from portfolio.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued contact emails from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain once and exit')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between polls (default: OUTBOX_POLL_SECONDS)')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'OUTBOX_POLL_SECONDS', 30)
+
+        while True:
+            close_old_connections()
+            sent, failed = outbox.drain(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'  sent {sent}, failed {failed}')
+            if options['once']:
+                break
+            time.sleep(interval)
+
+        pending = OutboxEmail.objects.filter(status=OutboxEmail.PENDING).count()
+        self.stdout.write(self.style.SUCCESS(f'✓ Outbox drained – {pending} pending (waiting for retry)'))
@@ -0,0 +1,241 @@
+"""
+Per-request timing: Server-Timing headers and per-route latency histograms.
+
+RequestTimingMiddleware (middleware.py) opens a timer for each request.
+Work inside it is attributed to phases with ``timed()``:
+
+    db        every SQL statement (db_wrapper, on every connection: signals.py)
+    template  every template render (TimedDjangoTemplates, see settings.TEMPLATES)
+    tracking  queueing the SiteVisitor row (views._track_visitor)
+
+The response gets ``Server-Timing: total;dur=…, db;dur=…, …`` so the
+split shows up in the browser's network panel, and the request is added
+to this worker's histograms, keyed by URL name.
+
+Each worker keeps its own counts and writes a snapshot of them to the
+cache every METRICS_FLUSH_SECONDS. The admin endpoint adds up the
+snapshots of every worker, so with a shared cache (CACHE_BACKEND) it
+covers all of them; with the default local-memory cache it is this
+worker only. Snapshots are cumulative, so a restarted worker shows up as
+a counter reset, which Prometheus' rate() already handles.
+"""
+
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.django import DjangoTemplates
+
+
+# upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PHASES = ('db', 'template', 'tracking')
+
+_WORKERS_KEY = 'portfolio:metrics:workers'
+_SNAPSHOT_KEY = 'portfolio:metrics:worker:{}'
+
+_timings = ContextVar('portfolio_timings', default=None)
+
+
+# ---------------------------------------------------------------------------
+# Timing one request
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def request_timer():
+    """Collect phase durations (seconds) for the request running inside the block."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to `phase` of the current request (if any)."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - started
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """
+    Installed on every connection, not per request: an async view's queries
+    run on other threads' connections, which the request context follows.
+    """
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def server_timing(total, timings):
+    """The Server-Timing header value (durations in milliseconds)."""
+    parts = [f'total;dur={total * 1000:.1f}']
+    parts += [f'{phase};dur={timings[phase] * 1000:.1f}' for phase in PHASES if phase in timings]
+    return ', '.join(parts)
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self._template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The normal Django template backend, with each render counted as 'template' time."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+# ---------------------------------------------------------------------------
+# Histograms
+# ---------------------------------------------------------------------------
+
+def _empty_route():
+    return {
+        'buckets': [0] * (len(BUCKETS) + 1),
+        'count': 0,
+        'sum': 0.0,
+        'phases': dict.fromkeys(PHASES, 0.0),
+    }
+
+
+class Recorder:
+    """This worker's histograms, plus the periodic snapshot into the cache."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.routes = {}
+        self.worker = f'{socket.gethostname()}:{os.getpid()}:{int(time.time())}'
+        self.pid = os.getpid()
+        self.last_flush = time.monotonic()
+
+    def observe(self, route, total, timings):
+        with self.lock:
+            if os.getpid() != self.pid:   # forked after import: start our own series
+                self._reset()
+            stats = self.routes.setdefault(route, _empty_route())
+            stats['buckets'][_bucket(total)] += 1
+            stats['count'] += 1
+            stats['sum'] += total
+            for phase, seconds in timings.items():
+                stats['phases'][phase] = stats['phases'].get(phase, 0.0) + seconds
+        self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                route: {**stats, 'buckets': list(stats['buckets']), 'phases': dict(stats['phases'])}
+                for route, stats in self.routes.items()
+            }
+
+    def flush(self, force=False):
+        """Write the snapshot to the cache if METRICS_FLUSH_SECONDS have passed (or `force`)."""
+        interval = getattr(settings, 'METRICS_FLUSH_SECONDS', 10)
+        if not force and time.monotonic() - self.last_flush < interval:
+            return
+        self.last_flush = time.monotonic()
+        ttl = getattr(settings, 'METRICS_WORKER_TTL', 24 * 3600)
+        try:
+            cache.set(_SNAPSHOT_KEY.format(self.worker), self.snapshot(), ttl)
+            # read-modify-write: a lost update only lasts until that worker's next flush
+            workers = cache.get(_WORKERS_KEY) or []
+            if self.worker not in workers:
+                cache.set(_WORKERS_KEY, [*workers, self.worker], ttl)
+        except Exception:
+            pass   # metrics must never break a request
+
+
+def _bucket(seconds):
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(BUCKETS)
+
+
+recorder = Recorder()
+
+
+def observe(route, total, timings):
+    recorder.observe(route, total, timings)
+
+
+def collect():
+    """Histograms of every worker that has flushed recently, added together."""
+    recorder.flush(force=True)
+    workers = cache.get(_WORKERS_KEY) or []
+    snapshots = cache.get_many([_SNAPSHOT_KEY.format(w) for w in workers])
+
+    live = [w for w in workers if _SNAPSHOT_KEY.format(w) in snapshots]
+    if len(live) != len(workers):
+        cache.set(_WORKERS_KEY, live, getattr(settings, 'METRICS_WORKER_TTL', 24 * 3600))
+
+    merged = {}
+    for snapshot in snapshots.values():
+        for route, stats in snapshot.items():
+            total = merged.setdefault(route, _empty_route())
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], stats['buckets'])]
+            total['count'] += stats['count']
+            total['sum'] += stats['sum']
+            for phase, seconds in stats['phases'].items():
+                total['phases'][phase] = total['phases'].get(phase, 0.0) + seconds
+    return merged, len(live)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(routes, workers):
+    """Prometheus text exposition format (0.0.4)."""
+    lines = [
+        '# HELP portfolio_metrics_workers Workers whose snapshot is included.',
+        '# TYPE portfolio_metrics_workers gauge',
+        f'portfolio_metrics_workers {workers}',
+        '# HELP portfolio_request_duration_seconds Time to produce a response, by URL name.',
+        '# TYPE portfolio_request_duration_seconds histogram',
+    ]
+    for route in sorted(routes):
+        stats, label = routes[route], _label(route)
+        cumulative = 0
+        for bound, count in zip((*map(str, BUCKETS), '+Inf'), stats['buckets']):
+            cumulative += count
+            lines.append(f'portfolio_request_duration_seconds_bucket{{route="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'portfolio_request_duration_seconds_sum{{route="{label}"}} {stats["sum"]:.6f}')
+        lines.append(f'portfolio_request_duration_seconds_count{{route="{label}"}} {stats["count"]}')
+
+    lines += [
+        '# HELP portfolio_request_phase_seconds_total Time spent in each phase of a request, by URL name.',
+        '# TYPE portfolio_request_phase_seconds_total counter',
+    ]
+    for route in sorted(routes):
+        label = _label(route)
+        for phase in PHASES:
+            seconds = routes[route]['phases'].get(phase, 0.0)
+            lines.append(f'portfolio_request_phase_seconds_total{{route="{label}",phase="{phase}"}} {seconds:.6f}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,317 @@
+"""
+Project middleware.
+
+Every class here runs in both modes, like Django's own middleware: under
+ASGI with an async view behind it, __call__ hands the request to
+__acall__ and it stays on the event loop. A sync-only middleware anywhere
+in the stack would put each request on a worker thread instead.
+"""
+
+import gzip
+import logging
+import time
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import budgets, metrics, page_cache, prerender
+
+
+logger = logging.getLogger('portfolio.budgets')
+
+
+def _route(request):
+    """URL name of the request, for per-route metrics and cache policies."""
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        return match.view_name
+    if getattr(request, 'prerendered', False):
+        return 'prerendered'
+    return 'unmatched'   # static files, 404s, redirects before URL resolution
+
+
+class _SyncAndAsync:
+    """Declares both modes; __init__ of a subclass calls _set_mode(get_response)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def _set_mode(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class StaticFilesMiddleware(_SyncAndAsync, WhiteNoiseMiddleware):
+    """WhiteNoise (whose own middleware is sync-only) for both modes."""
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self._set_mode(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self.find_file(request.path_info) if self.autorefresh else self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestTimingMiddleware(_SyncAndAsync):
+    """
+    Time every request (total, database, template rendering, visitor
+    tracking), add a Server-Timing header and record the total in the
+    per-route histograms (metrics.py). Removed when METRICS_ENABLED is
+    False.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self._set_mode(get_response)
+        self.header = getattr(settings, 'SERVER_TIMING_HEADER', True)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = request.timing_started = time.perf_counter()
+        with metrics.request_timer() as timings:
+            response = self.get_response(request)
+        return self._finish(request, response, started, timings)
+
+    async def __acall__(self, request):
+        started = request.timing_started = time.perf_counter()
+        with metrics.request_timer() as timings:
+            response = await self.get_response(request)
+        return self._finish(request, response, started, timings)
+
+    def _finish(self, request, response, started, timings):
+        total = time.perf_counter() - started
+        if self.header:
+            response['Server-Timing'] = metrics.server_timing(total, timings)
+        metrics.observe(_route(request), total, timings)
+        return response
+
+
+class HttpCacheMiddleware(_SyncAndAsync):
+    """
+    Cache-Control, strong ETags and compression for dynamic responses.
+
+    * Cache-Control comes from settings.CACHE_CONTROL by URL name, else
+      CACHE_CONTROL_DEFAULT (private, no-store). A response that sets a
+      cookie is never public, and one that already has Cache-Control
+      (WhiteNoise, never_cache) keeps it.
+    * GET/HEAD responses that may be stored get a strong ETag (per
+      content-coding), and a matching If-None-Match gets a 304.
+    * Text, JSON and CSV over COMPRESS_MIN_BYTES are brotli or gzip
+      compressed; streaming responses (CSV exports) chunk by chunk.
+      Responses that already have a Content-Encoding (page cache,
+      pre-rendered pages, WhiteNoise) are left alone.
+    """
+
+    COMPRESSIBLE = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml')
+    BROTLI_QUALITY = 5   # per request, so fast settings; cached pages use the maximum
+    GZIP_LEVEL = 6
+
+    def __init__(self, get_response):
+        self._set_mode(get_response)
+        self.policies = getattr(settings, 'CACHE_CONTROL', {})
+        self.default = getattr(settings, 'CACHE_CONTROL_DEFAULT', 'private, no-store')
+        self.min_bytes = getattr(settings, 'COMPRESS_MIN_BYTES', 512)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._process(request, await self.get_response(request))
+
+    def _process(self, request, response):
+        if not response.has_header('Cache-Control'):
+            policy = self.policies.get(_route(request), self.default)
+            if response.status_code not in (200, 304) or (response.cookies and 'public' in policy):
+                policy = self.default
+            response['Cache-Control'] = policy
+
+        encoding = self._encoding(request, response)
+        if self._needs_etag(request, response):
+            response['ETag'] = page_cache.make_etag(response.content, encoding)
+            not_modified = get_conditional_response(request, etag=response['ETag'], response=response)
+            if not_modified is not response:
+                return not_modified
+
+        if encoding != 'identity':
+            self._compress(response, encoding)
+        return response
+
+    def _encoding(self, request, response):
+        """The content-coding to apply, adding Vary when the answer depends on Accept-Encoding."""
+        if response.status_code != 200 or response.has_header('Content-Encoding'):
+            return 'identity'
+        if not response.get('Content-Type', '').startswith(self.COMPRESSIBLE):
+            return 'identity'
+        if not response.streaming and len(response.content) < self.min_bytes:
+            return 'identity'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return page_cache.negotiate_encoding(request)
+
+    @staticmethod
+    def _needs_etag(request, response):
+        return (
+            request.method in ('GET', 'HEAD') and response.status_code == 200 and not response.streaming
+            and not response.has_header('ETag') and 'no-store' not in response['Cache-Control']
+        )
+
+    def _compress(self, response, encoding):
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self._acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = self._compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                response.content = page_cache.brotli.compress(response.content, quality=self.BROTLI_QUALITY)
+            else:
+                response.content = gzip.compress(response.content, compresslevel=self.GZIP_LEVEL, mtime=0)
+            response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+
+    def _compressor(self, encoding):
+        """(compress one chunk and flush it, finish) for a streamed body."""
+        if encoding == 'br':
+            c = page_cache.brotli.Compressor(quality=self.BROTLI_QUALITY)
+            return (lambda chunk: c.process(chunk) + c.flush()), c.finish
+        c = zlib.compressobj(self.GZIP_LEVEL, zlib.DEFLATED, 31)   # 31 = gzip container
+        return (lambda chunk: c.compress(chunk) + c.flush(zlib.Z_SYNC_FLUSH)), c.flush
+
+    def _compress_stream(self, chunks, encoding):
+        compress, finish = self._compressor(encoding)
+        for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+
+    async def _acompress_stream(self, chunks, encoding):
+        compress, finish = self._compressor(encoding)
+        async for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+
+
+class PrerenderedPageMiddleware(_SyncAndAsync):
+    """
+    Serve the pages built by `manage.py prerender_pages` straight from memory.
+
+    Only GET/HEAD requests for a pre-rendered path are handled, and only
+    while the page's template, SiteSettings and projects still match what was
+    rendered. Visits are tracked exactly as in the views. Everything else
+    falls through to the normal view. Disabled when PRERENDER_SERVE is
+    False or nothing has been built.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PRERENDER_SERVE', True):
+            raise MiddlewareNotUsed
+        self.pages, self.site = prerender.load()
+        if not self.pages:
+            raise MiddlewareNotUsed
+        self._set_mode(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        page = self._page(request)
+        if page is not None and self._is_fresh(page):
+            from .views import _track_visitor
+            _track_visitor(request)
+            return self._serve(request, page)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        page = self._page(request)
+        if page is not None and await self._ais_fresh(page):
+            from .views import _atrack_visitor
+            await _atrack_visitor(request)
+            return self._serve(request, page)
+        return await self.get_response(request)
+
+    def _page(self, request):
+        if request.method in ('GET', 'HEAD'):
+            return self.pages.get(request.path_info)
+        return None
+
+    def _is_fresh(self, page):
+        try:
+            return self._template_unchanged(page) and prerender.site_fingerprint() == self.site
+        except Exception:
+            return False
+
+    async def _ais_fresh(self, page):
+        try:
+            return self._template_unchanged(page) and await prerender.asite_fingerprint() == self.site
+        except Exception:
+            return False
+
+    @staticmethod
+    def _template_unchanged(page):
+        return page_cache.template_mtime(get_template(page['template'])) == page['mtime']
+
+    def _serve(self, request, page):
+        request.prerendered = True
+        encoding = page_cache.negotiate_encoding(request)
+        if encoding not in page['variants']:
+            encoding = 'identity'
+        body, etag = page['variants'][encoding]
+        return page_cache.page_response(request, body, etag, encoding)
+
+
+class QueryBudgetMiddleware(_SyncAndAsync):
+    """
+    Development aid: check every request against its view's query budget
+    (budgets.py). QUERY_BUDGET_MODE = 'log' writes a warning with the SQL
+    and where it came from, 'raise' turns it into an error page. Any other
+    value removes the middleware.
+    """
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        self._set_mode(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with budgets.recording() as log:
+            response = self.get_response(request)
+        return self._check(request, response, log)
+
+    async def __acall__(self, request):
+        with budgets.recording() as log:
+            response = await self.get_response(request)
+        return self._check(request, response, log)
+
+    def _check(self, request, response, log):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            problems = budgets.violations(match.view_name, log)
+            if problems:
+                message = budgets.report(match.view_name, log, problems)
+                if self.mode == 'raise':
+                    raise budgets.BudgetExceeded(message)
+                logger.warning(message)
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0004_loginattempt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sitevisitor',
+            name='visited_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
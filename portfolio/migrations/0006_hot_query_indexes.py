@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0005_sitevisitor_visited_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['ip_address', 'created_at'], name='contact_ip_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['-created_at'], name='contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['is_read'], name='contact_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginattempt',
+            index=models.Index(fields=['ip_address', 'attempted_at'], name='login_ip_attempted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sitevisitor',
+            index=models.Index(fields=['visited_at'], name='visitor_visited_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sitevisitor',
+            index=models.Index(fields=['ip_address', 'visited_at'], name='visitor_ip_visited_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0007_visitorrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueVisitorSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('page', models.CharField(blank=True, default='', max_length=500)),
+                ('sketch', models.BinaryField()),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='uniquevisitorsketch',
+            constraint=models.UniqueConstraint(fields=('day', 'page'), name='unique_visitor_sketch_key'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:50
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def copy_contacted_ips(apps, schema_editor):
+    """One ContactedIP per IP that has a message or a visit marked sent_contact."""
+    ContactMessage = apps.get_model('portfolio', 'ContactMessage')
+    ContactedIP = apps.get_model('portfolio', 'ContactedIP')
+    SiteVisitor = apps.get_model('portfolio', 'SiteVisitor')
+
+    first = dict(
+        ContactMessage.objects.exclude(ip_address=None)
+        .order_by().values('ip_address').annotate(first=Min('created_at')).values_list('ip_address', 'first')
+    )
+    marked = (
+        SiteVisitor.objects.filter(sent_contact=True).exclude(ip_address=None)
+        .order_by().values_list('ip_address', flat=True).distinct()
+    )
+    for ip in marked:
+        first.setdefault(ip, django.utils.timezone.now())
+    ContactedIP.objects.bulk_create(
+        [ContactedIP(ip_address=ip, first_contact_at=at) for ip, at in first.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0009_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactedIP',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ip_address', models.GenericIPAddressField(unique=True)),
+                ('first_contact_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-first_contact_at'],
+            },
+        ),
+        migrations.RunPython(copy_contacted_ips, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='sitevisitor',
+            name='sent_contact',
+        ),
+    ]
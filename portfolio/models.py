@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .caching import VersionedValue
+
 
 class Project(models.Model):
     title = models.CharField(max_length=200)
@@ -62,27 +66,153 @@ class ContactMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # contact rate limit: ip + recent window
+            models.Index(fields=['ip_address', 'created_at'], name='contact_ip_created_idx'),
+            # newest-first listings on the dashboard / messages page
+            models.Index(fields=['-created_at'], name='contact_created_idx'),
+            # unread badge – only unread rows are indexed
+            models.Index(fields=['is_read'], condition=models.Q(is_read=False), name='contact_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.subject}"
 
 
+class OutboxEmail(models.Model):
+    """
+    Email waiting to be sent. Written in the same transaction as the row
+    that caused it, delivered later by the outbox worker (see outbox.py).
+    """
+    PENDING = 'pending'
+    SENT    = 'sent'
+    FAILED  = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    subject         = models.CharField(max_length=998)
+    body            = models.TextField()
+    from_email      = models.CharField(max_length=254)
+    to              = models.TextField(help_text="Comma-separated recipients")
+    status          = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts        = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error      = models.TextField(blank=True, default='')
+    created_at      = models.DateTimeField(auto_now_add=True)
+    sent_at         = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # worker poll: due pending rows only
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {self.to} ({self.status})"
+
+    def recipients(self):
+        return [addr.strip() for addr in self.to.split(',') if addr.strip()]
+
+
 class SiteVisitor(models.Model):
     """Tracks every visit to the portfolio site."""
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     page = models.CharField(max_length=500, default='/')
     referrer = models.TextField(blank=True, default='')
     user_agent = models.TextField(blank=True, default='')
-    visited_at = models.DateTimeField(auto_now_add=True)
-    sent_contact = models.BooleanField(default=False)
+    # set by the tracker when the request arrives, not when the batch is written
+    visited_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-visited_at']
+        indexes = [
+            # day counts, newest-first listing, retention cutoff
+            models.Index(fields=['visited_at'], name='visitor_visited_idx'),
+            # per-IP lookups (contact correlation)
+            models.Index(fields=['ip_address', 'visited_at'], name='visitor_ip_visited_idx'),
+        ]
 
     def __str__(self):
         return f"{self.ip_address} — {self.page} — {self.visited_at.strftime('%d %b %Y %H:%M')}"
 
 
+class ContactedIP(models.Model):
+    """
+    One row per IP that has sent a contact message. Joined to SiteVisitor at
+    read time (see sent_contact()), so a submission writes one small row
+    instead of updating every past visit from that IP.
+    """
+    ip_address       = models.GenericIPAddressField(unique=True)
+    first_contact_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-first_contact_at']
+
+    def __str__(self):
+        return f"{self.ip_address} — {self.first_contact_at:%d %b %Y %H:%M}"
+
+    @classmethod
+    def record(cls, ip_address):
+        if ip_address:
+            cls.objects.get_or_create(ip_address=ip_address)
+
+    @classmethod
+    def sent_contact(cls):
+        """Boolean expression for SiteVisitor querysets: .annotate(sent_contact=ContactedIP.sent_contact())"""
+        return models.Exists(cls.objects.filter(ip_address=models.OuterRef('ip_address')))
+
+
+class VisitorRollup(models.Model):
+    """
+    Hourly visit counts per page + referrer host.
+    Built from SiteVisitor by: python manage.py rollup_visitors
+    Kept after the raw rows are pruned, so history goes back further than 90 days.
+    """
+    bucket        = models.DateTimeField()   # start of the hour (UTC)
+    page          = models.CharField(max_length=500)
+    referrer_host = models.CharField(max_length=255, blank=True, default='')
+    hits          = models.PositiveIntegerField(default=0)
+    unique_ips    = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'page', 'referrer_host'], name='visitor_rollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket:%d %b %Y %H:00} — {self.page} — {self.hits}"
+
+
+class UniqueVisitorSketch(models.Model):
+    """
+    HyperLogLog sketch of the distinct IPs seen on one day (see hll.py).
+    page='' holds the sketch for the whole site. Maintained by rollup_visitors.
+    """
+    day    = models.DateField()
+    page   = models.CharField(max_length=500, blank=True, default='')
+    sketch = models.BinaryField()
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'page'], name='unique_visitor_sketch_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} — {self.page or 'all pages'}"
+
+
+class RollupWatermark(models.Model):
+    """Highest SiteVisitor id already folded into VisitorRollup."""
+    name       = models.CharField(max_length=50, unique=True)
+    last_id    = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
 class SiteUpdate(models.Model):
     """
     One row per site update/version.
@@ -112,6 +242,10 @@ class LoginAttempt(models.Model):
 
     class Meta:
         ordering = ['-attempted_at']
+        indexes = [
+            # lockout checks: ip + recent window
+            models.Index(fields=['ip_address', 'attempted_at'], name='login_ip_attempted_idx'),
+        ]
 
     def __str__(self):
         return f"{self.ip_address} — {self.attempted_at}"
@@ -129,6 +263,7 @@ class SiteSettings(models.Model):
     twitter_url = models.URLField(blank=True)
     email = models.EmailField(blank=True)
     resume_file = models.FileField(upload_to='resume/', blank=True)
+    updated_at = models.DateTimeField(auto_now=True)   # version stamp for the per-worker copy
 
     class Meta:
         verbose_name = "Site Settings"
@@ -143,5 +278,34 @@ class SiteSettings(models.Model):
 
     @classmethod
     def load(cls):
+        """
+        The singleton row, served from this worker's memory.
+        Edits are picked up within SITE_SETTINGS_RECHECK_SECONDS (see signals.py).
+        Treat the returned object as read-only.
+        """
+        return _site_settings.get()
+
+    @classmethod
+    def load_from_db(cls):
         obj, created = cls.objects.get_or_create(pk=1)
-        return obj
\ No newline at end of file
+        return obj
+
+    @classmethod
+    def cache_version(cls):
+        return _site_settings.version
+
+    @classmethod
+    async def acache_version(cls):
+        return await _site_settings.aversion()
+
+    @classmethod
+    def invalidate_cache(cls):
+        _site_settings.invalidate()
+
+
+_site_settings = VersionedValue(
+    'site_settings',
+    SiteSettings.load_from_db,
+    recheck_seconds=lambda: getattr(settings, 'SITE_SETTINGS_RECHECK_SECONDS', 5),
+    stamp=lambda: SiteSettings.objects.filter(pk=1).values_list('updated_at', flat=True).first(),
+)
\ No newline at end of file
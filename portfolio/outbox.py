@@ -0,0 +1,232 @@
+"""
+Outgoing email outbox.
+
+Views never talk to SMTP. ``enqueue()`` writes an OutboxEmail row inside
+the caller's transaction, so the email exists if and only if the
+ContactMessage does, and the request returns without waiting on a mail
+server. Delivery happens later, in batches, over one reused SMTP
+connection:
+
+    OUTBOX_DELIVERY = 'thread'   – a daemon thread in each web worker, woken
+                                   right after the enqueuing transaction
+                                   commits (default)
+    OUTBOX_DELIVERY = 'command'  – web workers only enqueue; run
+                                   `python manage.py run_outbox` as a worker
+    OUTBOX_DELIVERY = 'inline'   – send after commit, in the request thread
+                                   (tests / debugging)
+
+A send that fails for a transient reason (connection lost, timeout, a 4xx
+SMTP reply, the server being unreachable) is retried with exponential
+backoff (OUTBOX_RETRY_BASE_SECONDS * 2^attempt, capped at
+OUTBOX_RETRY_MAX_SECONDS) until OUTBOX_MAX_ATTEMPTS, then marked failed.
+Anything else – a 5xx reply such as refused recipients, a bad header –
+would fail the same way again and is marked failed at once. Rows are claimed with a
+short lease, so several workers can drain the same table without sending
+anything twice.
+"""
+
+import logging
+import os
+import smtplib
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(subject, body, to, from_email=None):
+    """Queue one email. Call inside the transaction that creates its cause."""
+    email = OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=', '.join(to),
+    )
+    transaction.on_commit(wake)
+    return email
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failure."""
+    base = _setting('OUTBOX_RETRY_BASE_SECONDS', 30)
+    return min(base * 2 ** max(attempts - 1, 0), _setting('OUTBOX_RETRY_MAX_SECONDS', 3600))
+
+
+def _claim(batch_size, now):
+    """Lease up to `batch_size` due rows to this caller and return them."""
+    due = list(
+        OutboxEmail.objects
+        .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    lease_until = now + timedelta(seconds=_setting('OUTBOX_LEASE_SECONDS', 300))
+    OutboxEmail.objects.filter(
+        pk__in=due, status=OutboxEmail.PENDING, next_attempt_at__lte=now,
+    ).update(next_attempt_at=lease_until)
+    # only the rows this update actually moved are ours
+    return list(OutboxEmail.objects.filter(pk__in=due, next_attempt_at=lease_until).order_by('pk'))
+
+
+def _mark_sent(email):
+    email.status = OutboxEmail.SENT
+    email.attempts += 1
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    email.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+
+
+def is_transient(error):
+    """True if sending again later may work: connection trouble or a 4xx SMTP reply."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):   # an OSError too, but not a network one
+        return False
+    return isinstance(error, OSError)   # refused, reset, timeout, DNS
+
+
+def _mark_failed(email, error, retry=True):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'[:2000]
+    if not retry or email.attempts >= _setting('OUTBOX_MAX_ATTEMPTS', 8):
+        email.status = OutboxEmail.FAILED
+    else:
+        email.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(email.attempts))
+    email.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error'])
+
+
+def send_pending(batch_size=None, now=None):
+    """
+    Send one batch of due emails over a single connection.
+    Returns (sent, failed) counts for this batch.
+    """
+    batch = _claim(batch_size or _setting('OUTBOX_BATCH_SIZE', 50), now or timezone.now())
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # mail server unreachable or misconfigured – the whole batch backs off
+        for email in batch:
+            _mark_failed(email, e)
+        return 0, len(batch)
+
+    try:
+        for i, email in enumerate(batch):
+            message = EmailMessage(
+                subject=email.subject, body=email.body, from_email=email.from_email,
+                to=email.recipients(), connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                transient = is_transient(e)
+                _mark_failed(email, e, retry=transient)
+                failed += 1
+                if not transient:   # this message's fault; the connection is fine
+                    continue
+                # the connection may be dead: reopen it once for the rest of the batch
+                # (left closed, send() would open and close one per message)
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as e:
+                    for rest in batch[i + 1:]:
+                        _mark_failed(rest, e)
+                    return sent, failed + len(batch) - i - 1
+            else:
+                _mark_sent(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def drain(batch_size=None):
+    """Send batches until nothing is due. Returns total (sent, failed)."""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = send_pending(batch_size)
+        if not sent and not failed:
+            return total_sent, total_failed
+        total_sent += sent
+        total_failed += failed
+
+
+# ---------------------------------------------------------------------------
+# In-process worker (OUTBOX_DELIVERY = 'thread')
+# ---------------------------------------------------------------------------
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread = None
+_pid = None
+_start_lock = threading.Lock()
+
+
+def _run():
+    while not _stop.is_set():
+        _wake.wait(_setting('OUTBOX_POLL_SECONDS', 30))
+        _wake.clear()
+        if _stop.is_set():
+            break
+        close_old_connections()
+        try:
+            drain()
+        except Exception:
+            # keep the worker alive; rows stay pending and are retried
+            logger.exception('Outbox delivery failed')
+    close_old_connections()
+
+
+def start_worker():
+    """Start this process's outbox thread (restarted after a fork)."""
+    global _thread, _pid
+    with _start_lock:
+        if _thread is not None and _pid == os.getpid() and _thread.is_alive():
+            return _thread
+        _stop.clear()
+        _pid = os.getpid()
+        _thread = threading.Thread(target=_run, name='outbox-worker', daemon=True)
+        _thread.start()
+        return _thread
+
+
+def wake():
+    """New mail was committed – deliver it according to OUTBOX_DELIVERY."""
+    mode = _setting('OUTBOX_DELIVERY', 'thread')
+    if mode == 'inline':
+        drain()
+    elif mode == 'thread':
+        start_worker()
+        _wake.set()
+
+
+def shutdown(timeout=5):
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread is not None and _pid == os.getpid():
+        _thread.join(timeout)
+    _thread = None
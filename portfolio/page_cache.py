@@ -0,0 +1,164 @@
+"""
+Rendered-response cache for the public pages.
+
+The home page and project pages only change when SiteSettings or the
+template file changes, so the rendered HTML is cached under
+
+    (template, variant, SiteSettings version, template mtime, content-coding)
+
+and stored already compressed (gzip, and brotli when the package is
+installed). Each entry carries a strong ETag and a Last-Modified date, so
+repeat visitors get a 304 with no body.
+
+Pages are rendered without the request, so nothing user-specific (such
+as the CSRF token) ends up in the shared copy, and the response sets no
+cookie, so a CDN can store it too (Cache-Control comes from
+HttpCacheMiddleware). main.js fetches the csrftoken cookie from
+/api/csrf/ the first time the contact form is sent.
+"""
+
+import gzip
+import hashlib
+import os
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import SiteSettings
+
+try:
+    import brotli
+except ImportError:  # optional – gzip only without it
+    brotli = None
+
+
+CONTENT_TYPE = 'text/html; charset=utf-8'
+
+
+def template_mtime(template):
+    try:
+        return int(os.path.getmtime(template.origin.name))
+    except (OSError, TypeError):
+        return 0
+
+
+def _accepted_codings(header):
+    codings = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        params = params.strip().replace(' ', '')
+        try:
+            q = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            q = 0.0
+        if name.strip() and q > 0:
+            codings.add(name.strip().lower())
+    return codings
+
+
+def negotiate_encoding(request):
+    """Best content-coding we can serve for this request's Accept-Encoding."""
+    accepted = _accepted_codings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return 'identity'
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=11)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    return body
+
+
+def render_html(template, context):
+    """Render a public page without a request. Returns UTF-8 bytes."""
+    if isinstance(template, str):
+        template = get_template(template)
+    # NOTPROVIDED = render {% csrf_token %} as nothing, without a DEBUG warning
+    return template.render({'csrf_token': 'NOTPROVIDED', **context}).encode('utf-8')
+
+
+def make_etag(html, encoding):
+    digest = hashlib.sha256(html).hexdigest()[:32]
+    return f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+
+
+def _build_entry(template, context_factory, encoding):
+    html = render_html(template, context_factory())
+    return {
+        'body': compress(html, encoding),
+        'etag': make_etag(html, encoding),
+        'last_modified': time.time(),
+    }
+
+
+def _cache_key(template_name, template, variant, site_version, encoding):
+    return 'portfolio:page:' + hashlib.sha1(
+        f'{template_name}|{variant}|{site_version}|{template_mtime(template)}|{encoding}'.encode()
+    ).hexdigest()
+
+
+def render_page(request, template_name, context_factory, variant=''):
+    """
+    Serve `template_name` from the page cache, rendering it on a miss.
+    `context_factory()` is only called on a miss. `variant` tells apart
+    pages that share a template (e.g. one per project) and must change
+    whenever their context does.
+    """
+    template = get_template(template_name)
+    encoding = negotiate_encoding(request)
+
+    if getattr(settings, 'PAGE_CACHE_ENABLED', True):
+        key = _cache_key(template_name, template, variant, SiteSettings.cache_version(), encoding)
+        entry = cache.get(key)
+        if entry is None:
+            entry = _build_entry(template, context_factory, encoding)
+            cache.set(key, entry, getattr(settings, 'PAGE_CACHE_SECONDS', 3600))
+    else:
+        entry = _build_entry(template, context_factory, encoding)
+
+    return page_response(request, entry['body'], entry['etag'], encoding, entry['last_modified'])
+
+
+async def arender_page(request, template_name, context_factory, variant=''):
+    """render_page() for async views. Same cache entries; a miss renders in a worker thread."""
+    template = get_template(template_name)
+    encoding = negotiate_encoding(request)
+    build = sync_to_async(_build_entry)
+
+    if getattr(settings, 'PAGE_CACHE_ENABLED', True):
+        key = _cache_key(template_name, template, variant, await SiteSettings.acache_version(), encoding)
+        entry = await cache.aget(key)
+        if entry is None:
+            entry = await build(template, context_factory, encoding)
+            await cache.aset(key, entry, getattr(settings, 'PAGE_CACHE_SECONDS', 3600))
+    else:
+        entry = await build(template, context_factory, encoding)
+
+    return page_response(request, entry['body'], entry['etag'], encoding, entry['last_modified'])
+
+
+def page_response(request, body, etag, encoding, last_modified=None):
+    """HttpResponse (or 304) for an already-rendered, possibly compressed page."""
+    last_modified = int(last_modified) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(body, content_type=CONTENT_TYPE)
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(body))
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
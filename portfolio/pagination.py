@@ -0,0 +1,60 @@
+"""
+Keyset ("seek") pagination for the admin tables.
+
+Pages are ordered newest first by (timestamp, id) and the cursor is the
+key of the last row shown, so the next page is a plain indexed range
+scan – no OFFSET – and costs the same on page 1 and page 10 000. Rows
+inserted while someone is paging don't shift or duplicate entries.
+"""
+
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db.models import Q
+
+
+@dataclass
+class KeysetPage:
+    items: list = field(default_factory=list)
+    next_cursor: str = ''
+    is_first: bool = True
+
+    @property
+    def has_next(self):
+        return bool(self.next_cursor)
+
+
+def encode_cursor(timestamp, pk):
+    raw = f'{timestamp.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, pk), or None for a missing / tampered cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        stamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(stamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate(queryset, order_field, cursor=None, page_size=50):
+    """One page of `queryset`, newest `order_field` first, starting after `cursor`."""
+    qs = queryset.order_by(f'-{order_field}', '-pk')
+    key = decode_cursor(cursor)
+    if key:
+        stamp, pk = key
+        qs = qs.filter(**{f'{order_field}__lte': stamp}).filter(
+            Q(**{f'{order_field}__lt': stamp}) | Q(**{order_field: stamp, 'pk__lt': pk})
+        )
+
+    rows = list(qs[:page_size + 1])
+    page = KeysetPage(items=rows[:page_size], is_first=key is None)
+    if len(rows) > page_size:
+        last = page.items[-1]
+        page.next_cursor = encode_cursor(getattr(last, order_field), last.pk)
+    return page
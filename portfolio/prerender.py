@@ -0,0 +1,134 @@
+"""
+Static pre-rendering of the public pages.
+
+``python manage.py prerender_pages`` (run at deploy time) renders the home
+page and every project page into PRERENDER_ROOT, one directory per URL,
+each with index.html plus .gz and .br variants. A manifest.json records the
+ETag of each page, the mtime of its template and a fingerprint of
+SiteSettings and the published projects.
+
+PrerenderedPageMiddleware then serves those files straight from memory
+and never touches the template engine. A page is only served while its
+template, SiteSettings and the projects still match the manifest.
+Otherwise the request falls through to the normal view and its page cache.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.forms.models import model_to_dict
+from django.template.loader import get_template
+from django.urls import reverse
+
+from . import page_cache, projects
+from .models import SiteSettings
+
+
+MANIFEST_NAME = 'manifest.json'
+ENCODINGS = ('br', 'gzip', 'identity')
+SUFFIXES = {'br': '.br', 'gzip': '.gz', 'identity': ''}
+
+_fingerprints = {}
+
+
+def prerender_root():
+    return Path(getattr(settings, 'PRERENDER_ROOT', settings.BASE_DIR / 'prerendered'))
+
+
+def public_pages():
+    """{url path: (template name, context factory)} for every page worth pre-rendering."""
+    from .views import PROJECT_TEMPLATES, _public_context
+
+    pages = {reverse('portfolio:home'): ('portfolio/index.html', _public_context)}
+    for slug, template in PROJECT_TEMPLATES.items():
+        pages[reverse('portfolio:project_detail', args=[slug])] = (template, _public_context)
+    pages[reverse('portfolio:project_example')] = (PROJECT_TEMPLATES['example'], _public_context)
+
+    for project in projects.all_pages():
+        context = lambda project=project: {**_public_context(), 'project': project}
+        paths = [reverse('portfolio:project_detail', args=[project.slug])]
+        if project.slug == 'example':
+            paths.append(reverse('portfolio:project_example'))
+        for path in paths:
+            pages[path] = ('portfolio/project_detail.html', context)
+    return pages
+
+
+def site_fingerprint():
+    """Hash of the SiteSettings values and the project index, memoised per version."""
+    version = (SiteSettings.cache_version(), projects.version())
+    if version not in _fingerprints:
+        values = model_to_dict(SiteSettings.load())
+        _fingerprints.clear()
+        _fingerprints[version] = hashlib.sha1(
+            json.dumps([values, projects.digest()], sort_keys=True, default=str).encode()
+        ).hexdigest()
+    return _fingerprints[version]
+
+
+async def asite_fingerprint():
+    """site_fingerprint() for async code: no thread hop while the versions are unchanged."""
+    version = (await SiteSettings.acache_version(), await projects.aversion())
+    if version in _fingerprints:
+        return _fingerprints[version]
+    return await sync_to_async(site_fingerprint)()
+
+
+def _directory_for(path):
+    return path.strip('/') or '.'
+
+
+def build(root=None):
+    """Render every public page into `root`. Returns the manifest dict."""
+    root = Path(root or prerender_root())
+    manifest = {'site': site_fingerprint(), 'pages': {}}
+
+    for path, (template_name, context_factory) in public_pages().items():
+        template = get_template(template_name)
+        html = page_cache.render_html(template, context_factory())
+        target = root / _directory_for(path)
+        target.mkdir(parents=True, exist_ok=True)
+
+        entry = {'dir': _directory_for(path), 'template': template_name,
+                 'mtime': page_cache.template_mtime(template), 'encodings': {}}
+        for encoding in ENCODINGS:
+            if encoding == 'br' and page_cache.brotli is None:
+                continue
+            body = page_cache.compress(html, encoding)
+            (target / f'index.html{SUFFIXES[encoding]}').write_bytes(body)
+            entry['encodings'][encoding] = {
+                'etag': page_cache.make_etag(html, encoding), 'size': len(body),
+            }
+        manifest['pages'][path] = entry
+
+    (root / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def load(root=None):
+    """
+    Read the pre-rendered pages into memory:
+    {path: {'template', 'mtime', 'variants': {encoding: (body, etag)}}}, site fingerprint.
+    Returns ({}, None) when nothing has been built.
+    """
+    root = Path(root or prerender_root())
+    try:
+        manifest = json.loads((root / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}, None
+
+    pages = {}
+    for path, entry in manifest.get('pages', {}).items():
+        variants = {}
+        for encoding, meta in entry['encodings'].items():
+            try:
+                body = (root / entry['dir'] / f'index.html{SUFFIXES[encoding]}').read_bytes()
+            except OSError:
+                continue
+            variants[encoding] = (body, meta['etag'])
+        if 'identity' in variants:
+            pages[path] = {'template': entry['template'], 'mtime': entry['mtime'], 'variants': variants}
+    return pages, manifest.get('site')
@@ -0,0 +1,112 @@
+"""
+In-memory index of the published projects.
+
+Project pages are rendered from ``Project`` rows through one shared
+template. The rows are read once into a {slug: ProjectPage} dict that
+each worker keeps in memory (``VersionedValue``), so resolving a slug
+costs no query. Saving or deleting a Project bumps the version (see
+signals.py and caching.py) and every worker rebuilds the index on its
+next check. With a per-process cache the version is the row count plus
+the newest updated_at, which any add, edit or delete changes.
+
+Technologies and description paragraphs are split once, when the index
+is built, rather than on every render.
+"""
+
+import hashlib
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .caching import VersionedValue
+
+
+@dataclass(frozen=True)
+class ProjectPage:
+    slug: str
+    title: str
+    summary: str
+    paragraphs: tuple
+    technologies: tuple
+    image_url: str
+    github_url: str
+    live_url: str
+    featured: bool
+    year: int
+
+    @classmethod
+    def from_project(cls, project):
+        paragraphs = tuple(p.strip() for p in project.description.replace('\r\n', '\n').split('\n\n') if p.strip())
+        return cls(
+            slug=project.slug,
+            title=project.title,
+            summary=paragraphs[0] if paragraphs else '',
+            paragraphs=paragraphs[1:] or paragraphs,
+            technologies=tuple(t for t in project.get_technologies_list() if t),
+            image_url=project.image.url if project.image else '',
+            github_url=project.github_url,
+            live_url=project.live_url,
+            featured=project.featured,
+            year=project.created_at.year,
+        )
+
+
+@dataclass(frozen=True)
+class ProjectIndex:
+    pages: dict      # slug -> ProjectPage, in Project.Meta.ordering
+    digest: str      # changes whenever any published value changes
+
+
+def _load_index():
+    from .models import Project
+
+    pages = {p.slug: ProjectPage.from_project(p) for p in Project.objects.all()}
+    digest = hashlib.sha1(repr(sorted(pages.items())).encode()).hexdigest()
+    return ProjectIndex(pages=pages, digest=digest)
+
+
+def _stamp():
+    from .models import Project
+
+    row = Project.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+    return f"{row['count']}:{row['latest']}"
+
+
+_index = VersionedValue(
+    'projects',
+    _load_index,
+    recheck_seconds=lambda: getattr(settings, 'SITE_SETTINGS_RECHECK_SECONDS', 5),
+    stamp=_stamp,
+)
+
+
+def get(slug):
+    """ProjectPage for `slug`, or None."""
+    return _index.get().pages.get(slug)
+
+
+async def aget(slug):
+    """Async get() – also returns the index digest: (ProjectPage or None, digest)."""
+    index = await _index.aget()
+    return index.pages.get(slug), index.digest
+
+
+def all_pages():
+    return list(_index.get().pages.values())
+
+
+def digest():
+    return _index.get().digest
+
+
+def version():
+    return _index.version
+
+
+async def aversion():
+    return await _index.aversion()
+
+
+def invalidate():
+    _index.invalidate()
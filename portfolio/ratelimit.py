@@ -0,0 +1,255 @@
+"""
+Rate limiting for the contact form and the admin login.
+
+Each scope has a rule in settings.RATE_LIMITS: (max events, window seconds).
+
+Backends (settings.RATE_LIMIT_BACKEND):
+
+    CacheRateLimiter        – sliding-window counters in the Django cache
+                              (cache.add + cache.incr, so parallel hits are
+                              all counted). Shared by all workers when
+                              CACHES points at a shared backend; with the
+                              default LocMemCache each worker counts on
+                              its own.
+    DatabaseRateLimiter     – counts LoginAttempt / ContactMessage rows.
+                              Shared and survives restarts on any setup.
+    LocalMemoryRateLimiter  – in-process sliding-window log, bounded LRU of
+                              IPs. Per worker process (N workers allow N
+                              times the limit), so only for single-process
+                              runs and tests.
+
+Left empty, RATE_LIMIT_BACKEND is CacheRateLimiter, so no check reads
+the database. On a multi-worker deployment without a shared cache that
+means per-worker limits. Set CACHE_BACKEND to Redis / Memcached for one
+count across workers, or RATE_LIMIT_BACKEND to DatabaseRateLimiter to
+trade the queries for a shared count.
+
+LoginAttempt rows are still written on every failed login, as an audit
+trail (and as the log DatabaseRateLimiter counts).
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+DEFAULT_RATE_LIMITS = {
+    'login': (5, 15 * 60),     # 5 failed logins per 15 minutes
+    'contact': (3, 10 * 60),   # 3 messages per 10 minutes
+}
+
+
+class BaseRateLimiter:
+
+    def __init__(self):
+        self.limits = {**DEFAULT_RATE_LIMITS, **getattr(settings, 'RATE_LIMITS', {})}
+
+    # --- storage, implemented by each backend ---
+
+    def _events(self, scope, key):
+        """Timestamps of recent hits, oldest first (at most `limit` of them)."""
+        raise NotImplementedError
+
+    def hit(self, scope, key):
+        raise NotImplementedError
+
+    def reset(self, scope, key):
+        raise NotImplementedError
+
+    # --- shared logic ---
+
+    def _recent(self, scope, key, now=None):
+        _, window = self.limits[scope]
+        cutoff = (now or time.time()) - window
+        return [t for t in self._events(scope, key) if t > cutoff]
+
+    def count(self, scope, key):
+        return len(self._recent(scope, key))
+
+    def is_limited(self, scope, key):
+        limit, _ = self.limits[scope]
+        return self.count(scope, key) >= limit
+
+    def remaining(self, scope, key):
+        limit, _ = self.limits[scope]
+        return max(0, limit - self.count(scope, key))
+
+    def retry_after(self, scope, key):
+        """Seconds until one more hit is allowed (0 if not limited)."""
+        limit, window = self.limits[scope]
+        now = time.time()
+        recent = self._recent(scope, key, now)
+        if len(recent) < limit:
+            return 0
+        return max(0, recent[-limit] + window - now)
+
+
+class LocalMemoryRateLimiter(BaseRateLimiter):
+    """Per-process log, LRU-bounded to RATE_LIMIT_MAX_KEYS IPs."""
+
+    def __init__(self):
+        super().__init__()
+        self.max_keys = getattr(settings, 'RATE_LIMIT_MAX_KEYS', 10000)
+        self._logs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _events(self, scope, key):
+        with self._lock:
+            log = self._logs.get((scope, key))
+            return list(log) if log else []
+
+    def hit(self, scope, key):
+        limit, _ = self.limits[scope]
+        with self._lock:
+            log = self._logs.get((scope, key))
+            if log is None:
+                log = self._logs[(scope, key)] = deque(maxlen=limit)
+                while len(self._logs) > self.max_keys:
+                    self._logs.popitem(last=False)
+            else:
+                self._logs.move_to_end((scope, key))
+            log.append(time.time())
+
+    def reset(self, scope, key):
+        with self._lock:
+            self._logs.pop((scope, key), None)
+
+
+class CacheRateLimiter(BaseRateLimiter):
+    """
+    Sliding-window counters in the Django cache (RATE_LIMIT_CACHE alias).
+
+    Hits are counted per fixed window: one integer per (scope, ip, window),
+    created with add() and bumped with incr(), which are atomic on the
+    shared backends. A check weighs the previous window by how much of it
+    still overlaps the sliding window:
+
+        estimate = previous * (1 - elapsed / window) + current
+
+    so a burst straddling a window boundary is still counted against the
+    limit. Two cache reads per check, whatever the traffic.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+
+    def _window(self, scope, now=None):
+        """Start (epoch seconds) of the fixed window `now` falls in."""
+        _, window = self.limits[scope]
+        now = time.time() if now is None else now
+        return now - now % window
+
+    def _key(self, scope, key, start):
+        return f'portfolio:ratelimit:{scope}:{key}:{int(start)}'
+
+    def _counts(self, scope, key, now):
+        """(window start, hits in the previous window, hits in this one)."""
+        _, window = self.limits[scope]
+        start = self._window(scope, now)
+        previous, current = self._key(scope, key, start - window), self._key(scope, key, start)
+        counts = self.cache.get_many([previous, current])
+        return start, counts.get(previous, 0), counts.get(current, 0)
+
+    def count(self, scope, key):
+        _, window = self.limits[scope]
+        now = time.time()
+        start, previous, current = self._counts(scope, key, now)
+        estimate = previous * (1 - (now - start) / window) + current
+        return math.ceil(estimate - 1e-9)   # a partial hit still takes a slot
+
+    def hit(self, scope, key):
+        _, window = self.limits[scope]
+        counter = self._key(scope, key, self._window(scope))
+        self.cache.add(counter, 0, 2 * window + 1)   # read again as `previous` during the next window
+        try:
+            self.cache.incr(counter)
+        except ValueError:   # expired between add() and incr()
+            self.cache.add(counter, 1, 2 * window + 1)
+
+    def reset(self, scope, key):
+        _, window = self.limits[scope]
+        start = self._window(scope)
+        self.cache.delete_many([self._key(scope, key, start - window), self._key(scope, key, start)])
+
+    def retry_after(self, scope, key):
+        """Seconds until the estimate leaves room for one more hit (0 if not limited)."""
+        limit, window = self.limits[scope]
+        now = time.time()
+        start, previous, current = self._counts(scope, key, now)
+        room = limit - 1   # the estimate a hit may still be added to
+        if previous * (1 - (now - start) / window) + current <= room:
+            return 0
+        if current <= room:   # the previous window slides out first
+            allowed_at = start + window * (1 - (room - current) / previous)
+        else:                 # then this one, during the next window
+            allowed_at = start + window + window * (1 - room / current)
+        return max(0, allowed_at - now)
+
+
+class DatabaseRateLimiter(BaseRateLimiter):
+    """
+    Counts the audit rows the views already write. hit()/reset() are no-ops:
+    the LoginAttempt / ContactMessage rows *are* the log.
+    """
+
+    def _source(self, scope):
+        from .models import ContactMessage, LoginAttempt
+        return {
+            'login': (LoginAttempt, 'attempted_at'),
+            'contact': (ContactMessage, 'created_at'),
+        }[scope]
+
+    def _events(self, scope, key):
+        limit, window = self.limits[scope]
+        model, date_field = self._source(scope)
+        window_start = timezone.now() - timedelta(seconds=window)
+        stamps = (
+            model.objects
+            .filter(ip_address=key, **{f'{date_field}__gte': window_start})
+            .order_by(f'-{date_field}')
+            .values_list(date_field, flat=True)[:limit]
+        )
+        return sorted(stamp.timestamp() for stamp in stamps)
+
+    def hit(self, scope, key):
+        pass
+
+    def reset(self, scope, key):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Configured backend
+# ---------------------------------------------------------------------------
+
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        backend = getattr(settings, 'RATE_LIMIT_BACKEND', '') or 'portfolio.ratelimit.CacheRateLimiter'
+        _limiter = import_string(backend)()
+    return _limiter
+
+
+def minutes_until_allowed(scope, key):
+    """retry_after() rounded up to whole minutes, for messages."""
+    return math.ceil(get_limiter().retry_after(scope, key) / 60)
+
+
+@receiver(setting_changed)
+def _reset_limiter(setting, **kwargs):
+    global _limiter
+    if setting.startswith('RATE_LIMIT'):
+        _limiter = None
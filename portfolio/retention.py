@@ -0,0 +1,134 @@
+"""
+Retention pruning for the log-style tables.
+
+Expired rows are deleted in primary-key batches (RETENTION_BATCH_SIZE rows
+per DELETE, RETENTION_BATCH_SLEEP seconds between batches) so a large
+backlog never holds a long lock. Nothing here runs on the request path:
+
+    python manage.py prune_visitors          # cron / deploy hook
+    RETENTION_PRUNE_INTERVAL = 3600          # or in-process, see gunicorn.conf.py
+
+Both also clear expired sessions, as `manage.py clearsessions` would.
+
+SiteVisitor rows are only deleted once they are folded into VisitorRollup
+(see rollup.py); the in-process runner updates the rollup first.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import rollup
+from .models import ContactMessage, LoginAttempt, SiteVisitor
+
+
+logger = logging.getLogger(__name__)
+
+
+# model -> the timestamp column its age is measured by
+PRUNABLE = {
+    'SiteVisitor': (SiteVisitor, 'visited_at'),
+    'LoginAttempt': (LoginAttempt, 'attempted_at'),
+    'ContactMessage': (ContactMessage, 'created_at'),
+}
+
+DEFAULT_RETENTION_DAYS = {
+    'SiteVisitor': 90,
+    'LoginAttempt': 30,
+    'ContactMessage': None,   # None = keep forever
+}
+
+PRUNE_LOCK_KEY = 'portfolio:retention:lock'
+
+
+def retention_days(name):
+    days = getattr(settings, 'RETENTION_DAYS', {})
+    return days.get(name, DEFAULT_RETENTION_DAYS.get(name))
+
+
+def prune_model(name, batch_size=None, sleep=None, now=None):
+    """Delete rows of one model older than its retention. Returns rows deleted."""
+    days = retention_days(name)
+    if days is None:
+        return 0
+
+    model, date_field = PRUNABLE[name]
+    batch_size = batch_size or getattr(settings, 'RETENTION_BATCH_SIZE', 1000)
+    sleep = getattr(settings, 'RETENTION_BATCH_SLEEP', 0.05) if sleep is None else sleep
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+
+    expired = model.objects.filter(**{f'{date_field}__lt': cutoff}).order_by('pk')
+    if model is SiteVisitor:
+        # never drop raw visits that haven't been rolled up yet
+        expired = expired.filter(pk__lte=rollup.watermark())
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        count, _ = model.objects.filter(pk__in=ids).delete()
+        deleted += count
+        if len(ids) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+    return deleted
+
+
+def prune_all(batch_size=None, sleep=None, now=None):
+    """Prune every model in PRUNABLE. Returns {name: rows deleted}."""
+    return {
+        name: prune_model(name, batch_size=batch_size, sleep=sleep, now=now)
+        for name in PRUNABLE
+    }
+
+
+def clear_expired_sessions():
+    """What `manage.py clearsessions` does: drop expired sessions (nothing to do for signed cookies)."""
+    engine = import_module(settings.SESSION_ENGINE)
+    try:
+        engine.SessionStore.clear_expired()
+    except NotImplementedError:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Optional in-process runner
+# ---------------------------------------------------------------------------
+
+_runner = None
+
+
+def _run_forever(interval):
+    while True:
+        time.sleep(interval)
+        # with a shared cache only one worker prunes per interval
+        if not cache.add(PRUNE_LOCK_KEY, True, timeout=max(interval - 1, 1)):
+            continue
+        try:
+            close_old_connections()
+            rollup.catch_up()
+            prune_all()
+            clear_expired_sessions()
+        except Exception:
+            logger.exception('Retention prune failed')
+        finally:
+            close_old_connections()
+
+
+def start_periodic_pruner(interval=None):
+    """Start a daemon thread that prunes every `interval` seconds (0 = off)."""
+    global _runner
+    interval = getattr(settings, 'RETENTION_PRUNE_INTERVAL', 0) if interval is None else interval
+    if not interval or (_runner is not None and _runner.is_alive()):
+        return None
+    _runner = threading.Thread(target=_run_forever, args=(interval,), name='retention-pruner', daemon=True)
+    _runner.start()
+    return _runner
@@ -0,0 +1,178 @@
+"""
+Incremental SiteVisitor -> VisitorRollup maintenance.
+
+A watermark (RollupWatermark.last_id) remembers the highest SiteVisitor id
+already processed. Each run only looks at rows above it, finds which hours
+they fall in, and rebuilds just those hour buckets from the raw rows. A
+rebuilt hour is exact (hits and distinct IPs), so running twice never
+double counts.
+
+The same pass feeds each hour's IPs into the per-day HyperLogLog sketches
+(UniqueVisitorSketch, one for the whole site and one per page). Adding an
+IP to a sketch again is a no-op, so rebuilding an hour is safe there too.
+
+All the hours of one pass are rebuilt together, so a pass costs the same
+handful of queries however many hours it covers. The dashboard only folds
+in ROLLUP_MAX_HOURS_PER_REQUEST hours per pass; a backlog (first deploy,
+a long quiet spell without a cron) is caught up by `manage.py
+rollup_visitors`, which render.yaml runs after migrate.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import TruncHour
+
+from .hll import HyperLogLog
+from .models import RollupWatermark, SiteVisitor, UniqueVisitorSketch, VisitorRollup
+
+
+WATERMARK_NAME = 'visitor_rollup'
+HOST_MAX_LENGTH = VisitorRollup._meta.get_field('referrer_host').max_length
+
+
+def referrer_host(referrer):
+    try:
+        return (urlsplit(referrer).hostname or '')[:HOST_MAX_LENGTH]
+    except ValueError:
+        return ''
+
+
+def watermark():
+    """Highest SiteVisitor id already rolled up (0 if never run)."""
+    row = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_id', flat=True).first()
+    return row or 0
+
+
+def _merge_sketches(ips_by_key):
+    """Add IPs to the daily sketches: {(day, page ('' = whole site)): set of ips}."""
+    ips_by_key = {key: ips for key, ips in ips_by_key.items() if ips}
+    if not ips_by_key:
+        return
+    with transaction.atomic():
+        existing = {
+            (row.day, row.page): row
+            for row in UniqueVisitorSketch.objects.select_for_update().filter(
+                day__in={day for day, _ in ips_by_key}, page__in={page for _, page in ips_by_key},
+            )
+        }
+        changed, created = [], []
+        for (day, page), ips in ips_by_key.items():
+            row = existing.get((day, page))
+            sketch = HyperLogLog.from_bytes(row.sketch) if row else HyperLogLog()
+            sketch.update(ips)
+            if row:
+                row.sketch = sketch.to_bytes()
+                changed.append(row)
+            else:
+                created.append(UniqueVisitorSketch(day=day, page=page, sketch=sketch.to_bytes()))
+        UniqueVisitorSketch.objects.bulk_update(changed, ['sketch'])
+        UniqueVisitorSketch.objects.bulk_create(created)
+
+
+def daily_sketches(start_day, end_day=None, page=''):
+    """{day: HyperLogLog} for the days in range that have a sketch."""
+    rows = UniqueVisitorSketch.objects.filter(day__gte=start_day, page=page)
+    if end_day is not None:
+        rows = rows.filter(day__lte=end_day)
+    return {day: HyperLogLog.from_bytes(blob) for day, blob in rows.values_list('day', 'sketch')}
+
+
+def merged_count(sketches):
+    """Estimated distinct IPs across several sketches."""
+    merged = HyperLogLog()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged.count()
+
+
+def unique_visitors(start_day, end_day=None, page=''):
+    """Estimated distinct IPs between two days (inclusive)."""
+    return merged_count(daily_sketches(start_day, end_day, page).values())
+
+
+def _pending(last_id, high_id, max_hours):
+    """
+    The next batch of rows above the watermark, in id order, covering at
+    most `max_hours` hours. Returns (last id in the batch, rows, hours).
+    """
+    end, count, hours = last_id, 0, set()
+    rows = (
+        SiteVisitor.objects.filter(id__gt=last_id, id__lte=high_id).order_by('id')
+        .annotate(hour=TruncHour('visited_at')).values_list('id', 'hour')
+        .iterator(chunk_size=2000)
+    )
+    for row_id, hour in rows:
+        if hour not in hours:
+            if max_hours is not None and len(hours) >= max_hours:
+                break
+            hours.add(hour)
+        end, count = row_id, count + 1
+    return end, count, sorted(hours)
+
+
+def _rebuild_hours(hours, high_id):
+    """Rebuild the buckets (and sketch IPs) of `hours` from every row up to `high_id`."""
+    counts = defaultdict(lambda: [0, set()])   # (hour, page, host) -> [hits, ips]
+    ips_by_key = defaultdict(set)              # (day, page) -> ips
+    rows = (
+        SiteVisitor.objects
+        .filter(visited_at__gte=hours[0], visited_at__lt=hours[-1] + timedelta(hours=1), id__lte=high_id)
+        .annotate(hour=TruncHour('visited_at')).filter(hour__in=hours)
+        .values_list('hour', 'page', 'referrer', 'ip_address')
+        .iterator(chunk_size=2000)
+    )
+    for hour, page, referrer, ip in rows:
+        entry = counts[(hour, page, referrer_host(referrer))]
+        entry[0] += 1
+        if ip:
+            entry[1].add(ip)
+            ips_by_key[(hour.date(), page)].add(ip)
+            ips_by_key[(hour.date(), '')].add(ip)
+
+    VisitorRollup.objects.filter(bucket__in=hours).delete()
+    VisitorRollup.objects.bulk_create([
+        VisitorRollup(bucket=hour, page=page, referrer_host=host, hits=hits, unique_ips=len(ips))
+        for (hour, page, host), (hits, ips) in counts.items()
+    ])
+    _merge_sketches(ips_by_key)
+
+
+def update_rollups(max_hours=None):
+    """
+    Fold the SiteVisitor rows newer than the watermark, at most
+    `max_hours` hour buckets' worth (None = all). Returns (rows, hours).
+
+    The watermark row is locked for the whole pass, so two callers
+    (dashboard, command, pruner) never rebuild the same hours at once;
+    the second one waits and then only sees what is still pending.
+    """
+    high_id = SiteVisitor.objects.aggregate(high=Max('id'))['high'] or 0
+    if high_id <= watermark():
+        return 0, 0   # the common case: no lock needed
+
+    RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    with transaction.atomic():
+        mark = RollupWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+        if high_id <= mark.last_id:
+            return 0, 0   # another caller caught up while we waited
+
+        end, count, hours = _pending(mark.last_id, high_id, max_hours)
+        _rebuild_hours(hours, end)
+
+        mark.last_id = end
+        mark.save(update_fields=['last_id', 'updated_at'])
+    return count, len(hours)
+
+
+def catch_up(batch_hours=168):
+    """update_rollups() in batches until nothing is pending. Returns (rows, hours)."""
+    rows = hours = 0
+    while True:
+        batch_rows, batch_hours_done = update_rollups(max_hours=batch_hours)
+        if not batch_rows:
+            return rows, hours
+        rows, hours = rows + batch_rows, hours + batch_hours_done
@@ -0,0 +1,77 @@
+"""
+Session engine for the admin panel (SESSION_ENGINE = 'portfolio.sessions').
+
+Django's cached_db backend in front of the SESSION_CACHE_ALIAS cache
+('sessions', a per-process LocMemCache by default). An admin page view
+reads the session from memory; django_session is only touched on a miss
+or when the session changes (login, logout).
+
+cached_db keeps the cached copy for as long as the session lives. With a
+per-worker cache a logout would then only reach the worker that handled
+it, so entries here expire after SESSION_CACHE_SECONDS and the other
+workers re-read the (deleted) row.
+
+The alternative, SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies',
+never queries at all, but a copied cookie stays valid until it expires.
+"""
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+
+
+class _ShortLivedCache:
+    """Wraps a cache so no entry is kept longer than `seconds`.
+
+    Every method that takes a timeout caps it, sync and async alike;
+    anything else (get, delete, ...) goes straight to the cache.
+    """
+
+    def __init__(self, cache, seconds):
+        self.cache = cache
+        self.seconds = seconds
+
+    def _cap(self, timeout):
+        return self.seconds if timeout is None else min(timeout, self.seconds)
+
+    def set(self, key, value, timeout=None, version=None):
+        self.cache.set(key, value, self._cap(timeout), version=version)
+
+    def add(self, key, value, timeout=None, version=None):
+        return self.cache.add(key, value, self._cap(timeout), version=version)
+
+    def set_many(self, data, timeout=None, version=None):
+        return self.cache.set_many(data, self._cap(timeout), version=version)
+
+    def touch(self, key, timeout=None, version=None):
+        return self.cache.touch(key, self._cap(timeout), version=version)
+
+    def get_or_set(self, key, default, timeout=None, version=None):
+        return self.cache.get_or_set(key, default, self._cap(timeout), version=version)
+
+    async def aset(self, key, value, timeout=None, version=None):
+        await self.cache.aset(key, value, self._cap(timeout), version=version)
+
+    async def aadd(self, key, value, timeout=None, version=None):
+        return await self.cache.aadd(key, value, self._cap(timeout), version=version)
+
+    async def aset_many(self, data, timeout=None, version=None):
+        return await self.cache.aset_many(data, self._cap(timeout), version=version)
+
+    async def atouch(self, key, timeout=None, version=None):
+        return await self.cache.atouch(key, self._cap(timeout), version=version)
+
+    async def aget_or_set(self, key, default, timeout=None, version=None):
+        return await self.cache.aget_or_set(key, default, self._cap(timeout), version=version)
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+
+class SessionStore(cached_db.SessionStore):
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = _ShortLivedCache(self._cache, getattr(settings, 'SESSION_CACHE_SECONDS', 300))
@@ -0,0 +1,30 @@
+"""
+Model signal handlers. Connected in PortfolioConfig.ready().
+"""
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import budgets, metrics, projects
+from .models import Project, SiteSettings
+
+
+@receiver([post_save, post_delete], sender=SiteSettings)
+def site_settings_changed(sender, **kwargs):
+    # after commit, so other workers never reload the old row under the new version
+    transaction.on_commit(SiteSettings.invalidate_cache)
+
+
+@receiver([post_save, post_delete], sender=Project)
+def project_changed(sender, **kwargs):
+    transaction.on_commit(projects.invalidate)
+
+
+@receiver(connection_created)
+def install_query_wrappers(sender, connection, **kwargs):
+    # no-ops outside a timed / recorded request; fires again on every reconnect
+    for wrapper in (metrics.db_wrapper, budgets.db_wrapper):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -19,7 +19,9 @@ const sanitizeInput = (input) => {
 };
 
 // ========== CSRF TOKEN HELPER ==========
-// Reads the csrftoken cookie that Django sets automatically
+// Reads the csrftoken cookie. The pages themselves don't set it (they are
+// the same for every visitor, so a CDN can store them); csrfToken() asks
+// /api/csrf/ for one the first time the contact form is sent.
 function getCookie(name) {
     let cookieValue = null;
     if (document.cookie && document.cookie !== '') {
@@ -35,6 +37,13 @@ function getCookie(name) {
     return cookieValue;
 }
 
+async function csrfToken() {
+    if (!getCookie('csrftoken')) {
+        await fetch('/api/csrf/', { credentials: 'same-origin' });
+    }
+    return getCookie('csrftoken');
+}
+
 // ========== LOADING SCREEN ==========
 window.addEventListener('load', () => {
     const loadingScreen = document.getElementById('loadingScreen');
@@ -247,6 +256,16 @@ window.addEventListener('scroll', () => {
 
 scrollTopBtn?.addEventListener('click', () => window.scrollTo({ top: 0, behavior: 'smooth' }));
 
+// ========== PROJECT CARDS ==========
+// Whole card is clickable (data-href); no inline onclick, so the CSP needs no 'unsafe-inline' scripts
+document.querySelectorAll('.project-card[data-href]').forEach(card => {
+    card.addEventListener('click', event => {
+        if (event.target.closest('a')) return;   // the "View Live Demo" link handles itself
+        if (card.dataset.target === '_blank') window.open(card.dataset.href, '_blank', 'noopener');
+        else window.location.href = card.dataset.href;
+    });
+});
+
 // ========== CONTACT FORM — DJANGO AJAX ==========
 const contactForm = document.getElementById('contactForm');
 
@@ -275,7 +294,7 @@ if (contactForm) {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
-                    'X-CSRFToken': getCookie('csrftoken')   // ← Django CSRF cookie
+                    'X-CSRFToken': await csrfToken()   // ← Django CSRF cookie
                 },
                 body: JSON.stringify({ name, email, subject, message })
             });
@@ -0,0 +1,22 @@
+"""
+Static files storage.
+
+After collectstatic every file has a content hash in its name and a
+.gz / .br copy next to it (WhiteNoise's CompressedManifestStaticFilesStorage),
+so WhiteNoise can serve it with a one-year immutable Cache-Control.
+
+Before collectstatic has run (tests, a fresh checkout with DEBUG off),
+{% static %} falls back to the plain name instead of raising.
+"""
+
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:   # neither in the manifest nor in STATIC_ROOT
+            return name
@@ -0,0 +1,332 @@
+"""
+Critical-CSS build for the public templates.
+
+index.html and the project templates carry their styles in one inline
+<style> block. That is convenient to edit, but it is sent again with
+every page view. ``build()`` writes a copy of each template to
+CSS_BUILD_DIR. In the copy:
+
+    <style>   only the critical rules: those whose selectors match the
+              above-the-fold markup (everything up to the end of the
+              first <section>), plus the @keyframes they use
+    <link>    at the end of <body>: bundle/css/project-shared.css (rules
+              every project page has) and bundle/css/<page>.css (the
+              rest, in source order)
+
+Both stylesheets are hashed and precompressed by collectstatic, so a
+repeat visit downloads only the HTML and its small critical block. The
+linked sheets hold the complete CSS, critical rules included, so the
+final cascade is the same as the original block's.
+
+A rule only moves to the shared sheet when nothing it jumps ahead of, in any
+template, sets one of its properties at the same specificity (so their
+order cannot matter). Otherwise it stays in the page sheet, in its
+original position.
+
+BuiltTemplateLoader serves a copy only while its source template is
+unchanged since the build, so editing a template switches that page
+back to the source until the next build.
+
+    python manage.py build_styles      # before collectstatic (render.yaml)
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.template import Origin
+from django.template.loaders.filesystem import Loader as FilesystemLoader
+
+
+# template -> group; rules every template of a group has go to bundle/css/<group>-shared.css
+TEMPLATES = {
+    'portfolio/index.html':                    None,
+    'portfolio/project_detail.html':           'project',
+    'portfolio/project-inventory-system.html': 'project',
+    'portfolio/project-joint-force.html':      'project',
+    'portfolio/project-example.html':          'project',
+}
+
+_STYLE_BLOCK = re.compile(r'[ \t]*<style>(.*?)</style>\n?', re.S)
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_ATTR = re.compile(r'\b(class|id)\s*=\s*"([^"]*)"')
+_TAG = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)')
+_SIMPLE = re.compile(r'([.#]?)(-?[_a-zA-Z][_a-zA-Z0-9-]*)')
+_ALWAYS_CRITICAL = {'*', 'html', 'body', ':root'}
+
+
+def build_dir():
+    return Path(getattr(settings, 'CSS_BUILD_DIR', settings.BASE_DIR / 'build' / 'templates'))
+
+
+def css_dir():
+    return Path(getattr(settings, 'ASSET_BUNDLE_DIR', settings.BASE_DIR / 'portfolio' / 'static' / 'bundle')) / 'css'
+
+
+# ---------------------------------------------------------------------------
+# A small CSS parser – enough for hand-written stylesheets
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Node:
+    prelude: str                                   # selector list, or '@media …' / '@keyframes …'
+    body: str = ''                                 # declarations (plain rules, @keyframes, @font-face)
+    children: list = field(default_factory=list)   # nested rules (@media / @supports)
+
+    @property
+    def is_at(self):
+        return self.prelude.startswith('@')
+
+    def text(self):
+        if self.children:
+            return f'{self.prelude}{{{"".join(c.text() for c in self.children)}}}'
+        return f'{self.prelude}{{{self.body}}}'
+
+    def properties(self):
+        if self.children:
+            return set().union(*(c.properties() for c in self.children))
+        return {d.split(':', 1)[0].strip().lower() for d in self.body.split(';') if ':' in d}
+
+
+def _squash(text):
+    return ' '.join(text.split())
+
+
+def parse(css):
+    """Top-level rules of `css` as Nodes; @media / @supports keep their inner rules."""
+    css = _COMMENT.sub('', css)
+    nodes, pos = [], 0
+    while True:
+        start = css.find('{', pos)
+        if start == -1:
+            return nodes
+        prelude = _squash(css[pos:start])
+        depth, i = 1, start + 1
+        while depth and i < len(css):
+            depth += {'{': 1, '}': -1}.get(css[i], 0)
+            i += 1
+        inner = css[start + 1:i - 1]
+        if prelude.startswith(('@media', '@supports')):
+            nodes.append(Node(prelude, children=parse(inner)))
+        else:
+            nodes.append(Node(prelude, body=_squash(inner).rstrip(';')))
+        pos = i
+
+
+def selector_tokens(selector):
+    """'.nav a.active:hover::after' -> {'.nav', 'a', '.active'}"""
+    selector = re.sub(r'::?[a-zA-Z-]+(\([^)]*\))?', ' ', selector)   # pseudo-classes / elements
+    selector = re.sub(r'\[[^\]]*\]', ' ', selector)                   # attribute selectors
+    tokens = {prefix + name for prefix, name in _SIMPLE.findall(selector)}
+    return tokens or {'*'}
+
+
+# ---------------------------------------------------------------------------
+# Critical rules
+# ---------------------------------------------------------------------------
+
+def fold_markup(source):
+    """The template markup a visitor sees first: <body> up to the end of the first <section>."""
+    body = source[source.find('<body'):]
+    end = body.find('</section>')
+    return body if end == -1 else body[:end]
+
+
+def markup_tokens(html):
+    tokens = {f'{tag.lower()}' for tag in _TAG.findall(html)}
+    for attr, value in _ATTR.findall(html):
+        value = re.sub(r'\{[{%].*?[%}]\}', ' ', value)   # template tags
+        tokens.update(('.' if attr == 'class' else '#') + v for v in value.split())
+    return tokens
+
+
+def _selector_matches(selector, present):
+    plain = selector.strip()
+    if plain in _ALWAYS_CRITICAL:
+        return True
+    return selector_tokens(selector) <= present | _ALWAYS_CRITICAL
+
+
+def critical(nodes, present):
+    """The nodes (and @media children) whose selectors can match tokens in `present`."""
+    picked = []
+    for node in nodes:
+        if node.children:
+            kept = critical(node.children, present)
+            if kept:
+                picked.append(Node(node.prelude, children=kept))
+        elif node.is_at:
+            continue   # @keyframes are added below, once we know which are used
+        elif any(_selector_matches(s, present) for s in node.prelude.split(',')):
+            picked.append(node)
+
+    used = ' '.join(n.text() for n in picked)
+    for node in nodes:
+        if node.prelude.startswith('@keyframes') and re.search(rf'\b{re.escape(node.prelude.split()[-1])}\b', used):
+            picked.append(node)
+    return picked
+
+
+# ---------------------------------------------------------------------------
+# Shared rules
+# ---------------------------------------------------------------------------
+
+def specificity(selector):
+    """(ids, classes / attributes / pseudo-classes, tags / pseudo-elements) of one selector."""
+    selector = re.sub(r':not\(([^)]*)\)', r' \1', selector)
+    pseudo_elements = len(re.findall(r'::[a-zA-Z-]+', selector))
+    selector = re.sub(r'::[a-zA-Z-]+', ' ', selector)
+    pseudo_classes = len(re.findall(r':[a-zA-Z-]+(\([^)]*\))?', selector))
+    selector = re.sub(r':[a-zA-Z-]+(\([^)]*\))?', ' ', selector)
+    attributes = len(re.findall(r'\[[^\]]*\]', selector))
+    selector = re.sub(r'\[[^\]]*\]', ' ', selector)
+    prefixes = [prefix for prefix, _ in _SIMPLE.findall(selector)]
+    return (prefixes.count('#'), prefixes.count('.') + pseudo_classes + attributes,
+            prefixes.count('') + pseudo_elements)
+
+
+def _declarations(node):
+    """[(specificities, properties)] of a rule, or of each rule inside an @media block."""
+    if node.children:
+        return [d for child in node.children for d in _declarations(child)]
+    return [({specificity(s) for s in node.prelude.split(',')}, node.properties())]
+
+
+def _conflict(a, b):
+    """
+    Could the order of `a` and `b` decide a property value? Only when both
+    set it at the same specificity (which elements match is not checked,
+    so this errs on the side of keeping a rule where it is).
+    """
+    if a.is_at and not a.children or b.is_at and not b.children:   # @keyframes / @font-face
+        return a.prelude == b.prelude
+    return any(
+        spec_a & spec_b and props_a & props_b
+        for spec_a, props_a in _declarations(a)
+        for spec_b, props_b in _declarations(b)
+    )
+
+
+def shared_rules(sheets):
+    """
+    The rules every sheet contains that can be loaded ahead of the page
+    rules without changing any cascade. Returns their texts in order.
+    """
+    common = set.intersection(*({n.text() for n in nodes} for nodes in sheets.values()))
+    first = next(iter(sheets.values()))
+    shared = [n.text() for n in first if n.text() in common]
+
+    changed = True
+    while changed:
+        changed = False
+        position = {text: i for i, text in enumerate(shared)}
+        for nodes in sheets.values():
+            for i, node in enumerate(nodes):
+                if node.text() not in position:
+                    continue
+                jumped = [o for o in nodes[:i] if position.get(o.text(), len(shared)) > position[node.text()]]
+                if any(_conflict(node, other) for other in jumped):
+                    shared.remove(node.text())
+                    changed = True
+                    break
+            if changed:
+                break
+    return shared
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def source_path(template_name):
+    return Path(settings.BASE_DIR) / 'portfolio' / 'templates' / template_name
+
+
+def _write_css(name, nodes):
+    text = '\n'.join(n.text() for n in nodes)
+    (css_dir() / name).write_text(text, encoding='utf-8')
+    return len(text.encode())
+
+
+def _render(source, match, critical_css, links):
+    built = source[:match.start()] + f'    <style>{critical_css}</style>\n' + source[match.end():]
+    tags = ''.join(f'    <link rel="stylesheet" href="{{% static \'bundle/css/{name}\' %}}">\n' for name in links)
+    built = built.replace('</body>', tags + '</body>', 1)
+    if not built.startswith('{% load'):
+        return '{% load static %}\n' + built
+    if 'static' not in built.split('\n', 1)[0]:
+        return built.replace('{% load ', '{% load static ', 1)
+    return built
+
+
+def build():
+    """Write the built templates and stylesheets. Returns a size report per template."""
+    sources, sheets = {}, {}
+    for name in TEMPLATES:
+        sources[name] = source_path(name).read_text(encoding='utf-8')
+        match = _STYLE_BLOCK.search(sources[name])
+        if match is not None:
+            sheets[name] = (match, parse(match.group(1)))
+    css_dir().mkdir(parents=True, exist_ok=True)
+
+    shared = {}   # group -> (file name, rule texts, bytes)
+    for group in {g for name, g in TEMPLATES.items() if g and name in sheets}:
+        members = {name: sheets[name][1] for name, g in TEMPLATES.items() if g == group and name in sheets}
+        texts = shared_rules(members) if len(members) > 1 else []
+        if texts:
+            by_text = {n.text(): n for n in next(iter(members.values()))}
+            filename = f'{group}-shared.css'
+            shared[group] = (filename, set(texts), _write_css(filename, [by_text[t] for t in texts]))
+
+    report, manifest = {}, {}
+    for name, (match, nodes) in sheets.items():
+        source, stem = sources[name], Path(name).stem
+        shared_file, shared_texts, shared_bytes = shared.get(TEMPLATES[name], (None, set(), 0))
+        page_nodes = [n for n in nodes if n.text() not in shared_texts]
+        page_bytes = _write_css(f'{stem}.css', page_nodes)
+        links = ([shared_file] if shared_file else []) + [f'{stem}.css']
+
+        critical_css = '\n'.join(n.text() for n in critical(nodes, markup_tokens(fold_markup(source))))
+        built = _render(source, match, critical_css, links)
+        target = build_dir() / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(built, encoding='utf-8')
+        manifest[name] = hashlib.sha256(source.encode()).hexdigest()
+
+        report[name] = {
+            'html_before': len(source.encode()),
+            'html_after': len(built.encode()),
+            'inline_css_before': len(match.group(1).encode()),
+            'inline_css_after': len(critical_css.encode()),
+            'page_css': page_bytes,
+            'shared_css': shared_bytes,
+        }
+
+    (build_dir() / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Loader
+# ---------------------------------------------------------------------------
+
+class BuiltTemplateLoader(FilesystemLoader):
+    """Load a template from CSS_BUILD_DIR while it was built from the current source."""
+
+    def get_dirs(self):
+        return [build_dir()]
+
+    def get_template_sources(self, template_name):
+        if template_name not in TEMPLATES:
+            return
+        try:
+            manifest = json.loads((build_dir() / 'manifest.json').read_text())
+            source = source_path(template_name).read_bytes()
+        except (OSError, ValueError):
+            return
+        if manifest.get(template_name) != hashlib.sha256(source).hexdigest():
+            return   # the template was edited after the build
+        yield Origin(name=str(build_dir() / template_name), template_name=template_name, loader=self)
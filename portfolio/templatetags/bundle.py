@@ -0,0 +1,78 @@
+import functools
+import os
+
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from portfolio import assets
+
+register = template.Library()
+
+# What a page loads while `manage.py build_assets` has not run (fresh
+# checkout, tests, a deploy whose pins are not complete yet): the CDN
+# files the bundle is built from, with an integrity attribute wherever
+# asset_pins.json has their hash. Entries without a scheme are local
+# static files.
+FALLBACK = {
+    'site.css': [
+        assets.VENDOR['bootstrap.min.css'],
+        assets.VENDOR['bootstrap-icons.min.css'],
+        assets.GOOGLE_FONTS['site'],
+        assets.VENDOR['aos.css'],
+    ],
+    'site.js': [
+        assets.VENDOR['bootstrap.bundle.min.js'],
+        assets.VENDOR['particles.min.js'],
+        assets.VENDOR['aos.js'],
+        'portfolio/js/main.js',
+    ],
+    'project.css': [
+        assets.GOOGLE_FONTS['project'],
+    ],
+}
+
+# the Content-Security-Policy each variant needs
+_CSP_SELF = "default-src 'self'; script-src 'self'; style-src 'self' 'unsafe-inline'; font-src 'self'; "
+_CSP_CDN = (
+    "default-src 'self'; script-src 'self' https://cdn.jsdelivr.net https://unpkg.com; "
+    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://unpkg.com https://fonts.googleapis.com; "
+    "font-src 'self' https://fonts.gstatic.com https://cdn.jsdelivr.net data:; "
+)
+
+
+_pins = functools.lru_cache(maxsize=None)(assets.load_pins)
+
+
+def is_built(name):
+    return os.path.exists(os.path.join(assets.bundle_dir(), name))   # not Path / name: a SafeString can't be interned
+
+
+def _tag(name, url):
+    integrity = _pins().get(url)
+    if '://' not in url:
+        url = static(url)
+    sri = format_html(' integrity="{}" crossorigin="anonymous"', integrity) if integrity else ''
+    if name.endswith('.css'):
+        return format_html('<link href="{}" rel="stylesheet"{}>', url, sri)
+    return format_html('<script src="{}"{}></script>', url, sri)
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    {% bundle 'site.css' %} / {% bundle 'site.js' %}
+
+    The <link> or <script> for bundle/<name>, or the CDN tags in FALLBACK
+    when the bundle has not been built.
+    """
+    if is_built(name):
+        return _tag(name, f'bundle/{name}')
+    return format_html_join('\n    ', '{}', ((_tag(name, url),) for url in FALLBACK[name]))
+
+
+@register.simple_tag
+def bundle_csp(*names):
+    """The start of the CSP for a page using `names`: same-origin only once they are all built."""
+    return mark_safe(_CSP_SELF if all(is_built(name) for name in names) else _CSP_CDN)
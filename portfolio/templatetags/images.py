@@ -0,0 +1,35 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from portfolio import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(path, alt='', sizes='100vw', loading='lazy', **attrs):
+    """
+    {% picture 'images/Avatar.jpg' alt='Me' sizes='(min-width: 992px) 33vw, 100vw' %}
+
+    A <picture> with AVIF / WebP / original srcsets from
+    `manage.py optimize_images`, or a plain <img> if `path` has no variants.
+    """
+    extra = format_html_join('', ' {}="{}"', sorted(attrs.items()))
+    entry = images.load_manifest().get(path)
+    if entry is None:
+        return format_html('<img src="{}" alt="{}" loading="{}" decoding="async"{}>',
+                           static(path), alt, loading, extra)
+
+    *modern, fallback = entry['sources'].items()
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, images.srcset(variants), sizes) for mime, variants in modern),
+    )
+    fallback_variants = fallback[1]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" '
+        'loading="{}" decoding="async"{}></picture>',
+        sources, static(fallback_variants[-1]['path']), images.srcset(fallback_variants), sizes,
+        entry['width'], entry['height'], alt, loading, extra,
+    )
@@ -1,3 +1,1407 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import smtplib
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.mail import BadHeaderError
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.http import Http404, HttpResponse
+from django.template import Context, Engine, Template
+from django.template.loader import get_template
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import assets, benchmark, budgets, caching, dashboard, exports, images, log, metrics, middleware, outbox, pagination, page_cache, prerender, projects, ratelimit, retention, rollup, sessions, styles, tracking, urls, views
+from .hll import HyperLogLog
+from .models import (
+    ContactedIP, ContactMessage, LoginAttempt, OutboxEmail, Project, SiteSettings, SiteVisitor, UniqueVisitorSketch, VisitorRollup,
+)
+
+
+@override_settings(VISITOR_TRACKING_ASYNC=False, OUTBOX_DELIVERY='command', PRERENDER_SERVE=False)
+class PortfolioTestCase(TestCase):
+    """
+    Base for the tests below. Visits are written inline and mail is only
+    queued, so no flusher or outbox thread writes to the test database
+    behind a test's back; pages are never served pre-rendered. Tests that
+    need one of these override it themselves.
+    """
+
+
+class AdminLoginMixin:
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        caches['sessions'].clear()
+        ratelimit._limiter = None
+
+    def login_admin(self):
+        self.client.post('/admin-panel/login/', {'password': settings.ADMIN_PANEL_PASSWORD})
+
+
+class VisitorBufferTests(PortfolioTestCase):
+
+    def _event(self, page='/'):
+        return {'ip_address': '10.0.0.1', 'page': page, 'referrer': '', 'user_agent': ''}
+
+    def test_flush_writes_queued_events_in_batches(self):
+        buf = tracking.VisitorBuffer(max_size=50, batch_size=4, background=False)
+        for i in range(10):
+            buf.put(self._event(f'/p{i}'))
+
+        self.assertEqual(SiteVisitor.objects.count(), 0)
+        self.assertEqual(buf.flush(), 10)
+        self.assertEqual(SiteVisitor.objects.count(), 10)
+        self.assertEqual(buf.snapshot()['pending'], 0)
+
+    def test_flush_leaves_the_dashboard_cache_alone(self):
+        cache.set(dashboard.CACHE_KEY, 'snapshot')
+        buf = tracking.VisitorBuffer(background=False)
+        buf.put(self._event())
+        buf.flush()
+        self.assertEqual(cache.get(dashboard.CACHE_KEY), 'snapshot')   # expires after DASHBOARD_CACHE_SECONDS
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        buf = tracking.VisitorBuffer(max_size=3, background=False)
+        results = [buf.put(self._event()) for _ in range(5)]
+
+        self.assertEqual(results, [True, True, True, False, False])
+        stats = buf.snapshot()
+        self.assertEqual(stats['queued'], 3)
+        self.assertEqual(stats['dropped'], 2)
+
+    def test_shutdown_flushes_remaining_events(self):
+        buf = tracking.VisitorBuffer(max_size=10, background=False)
+        buf.put(self._event())
+        buf.shutdown()
+        self.assertEqual(SiteVisitor.objects.count(), 1)
+
+
+class TrackVisitorViewTests(PortfolioTestCase):
+
+    def test_index_records_a_visit(self):
+        self.client.get('/', HTTP_REFERER='https://example.com/', REMOTE_ADDR='10.1.2.3')
+        visit = SiteVisitor.objects.get()
+        self.assertEqual(visit.page, '/')
+        self.assertEqual(visit.ip_address, '10.1.2.3')
+        self.assertEqual(visit.referrer, 'https://example.com/')
+
+
+class RetentionTests(PortfolioTestCase):
+
+    def test_prune_deletes_only_expired_rows_in_batches(self):
+        old = timezone.now() - timedelta(days=120)
+        SiteVisitor.objects.bulk_create(
+            [SiteVisitor(page='/old', visited_at=old) for _ in range(7)]
+            + [SiteVisitor(page='/new') for _ in range(2)]
+        )
+        self.assertEqual(retention.prune_model('SiteVisitor', sleep=0), 0)   # not rolled up yet
+
+        rollup.update_rollups()
+        deleted = retention.prune_model('SiteVisitor', batch_size=3, sleep=0)
+
+        self.assertEqual(deleted, 7)
+        self.assertEqual(list(SiteVisitor.objects.values_list('page', flat=True)), ['/new', '/new'])
+
+    @override_settings(RETENTION_DAYS={'LoginAttempt': 1, 'ContactMessage': None})
+    def test_retention_is_configurable_per_model(self):
+        LoginAttempt.objects.create(ip_address='10.0.0.1')
+        ContactMessage.objects.create(name='a', email='a@b.co', subject='s', message='m')
+        later = timezone.now() + timedelta(days=2)
+
+        result = retention.prune_all(sleep=0, now=later)
+
+        self.assertEqual(result['LoginAttempt'], 1)
+        self.assertEqual(result['ContactMessage'], 0)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+
+class HotQueryIndexTests(PortfolioTestCase):
+    """EXPLAIN every hot query and check it is served by the expected index."""
+
+    def _hot_queries(self):
+        now = timezone.now()
+        ip = '10.0.0.1'
+        return [
+            ('login_ip_attempted_idx',
+             LoginAttempt.objects.filter(ip_address=ip, attempted_at__gte=now).order_by()),
+            ('login_ip_attempted_idx',
+             LoginAttempt.objects.filter(ip_address=ip, attempted_at__gte=now).order_by('attempted_at')[:1]),
+            ('contact_ip_created_idx',
+             ContactMessage.objects.filter(ip_address=ip, created_at__gte=now).order_by()),
+            ('contact_unread_idx',
+             ContactMessage.objects.filter(is_read=False).order_by()),
+            ('contact_created_idx',
+             ContactMessage.objects.order_by('-created_at')[:5]),
+            ('visitor_visited_idx',
+             SiteVisitor.objects.filter(visited_at__gte=now).order_by()),
+            ('visitor_visited_idx',
+             SiteVisitor.objects.order_by('-visited_at')[:200]),
+            ('visitor_ip_visited_idx',
+             SiteVisitor.objects.filter(ip_address=ip).order_by()),
+        ]
+
+    def test_hot_queries_use_an_index(self):
+        if connection.vendor == 'postgresql':
+            # tiny test tables would always get a seq scan otherwise
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f'no plan expectations for {connection.vendor}')
+
+        for index_name, qs in self._hot_queries():
+            with self.subTest(query=str(qs.query)):
+                plan = qs.explain()
+                self.assertIn(index_name, plan)
+
+
+class VisitorRollupTests(PortfolioTestCase):
+
+    def test_rollup_groups_by_hour_page_and_referrer_host(self):
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+        SiteVisitor.objects.bulk_create([
+            SiteVisitor(page='/', ip_address='10.0.0.1', referrer='https://google.com/q', visited_at=hour),
+            SiteVisitor(page='/', ip_address='10.0.0.1', referrer='https://google.com/x', visited_at=hour),
+            SiteVisitor(page='/', ip_address='10.0.0.2', referrer='', visited_at=hour),
+            SiteVisitor(page='/project/x/', ip_address='10.0.0.3', visited_at=hour + timedelta(hours=1)),
+        ])
+
+        self.assertEqual(rollup.update_rollups(), (4, 2))
+
+        rows = {(r.bucket, r.page, r.referrer_host): (r.hits, r.unique_ips) for r in VisitorRollup.objects.all()}
+        self.assertEqual(rows, {
+            (hour, '/', 'google.com'): (2, 1),
+            (hour, '/', ''): (1, 1),
+            (hour + timedelta(hours=1), '/project/x/', ''): (1, 1),
+        })
+
+    def test_rollup_is_incremental_and_never_double_counts(self):
+        SiteVisitor.objects.create(page='/', ip_address='10.0.0.1')
+        rollup.update_rollups()
+        self.assertEqual(rollup.update_rollups(), (0, 0))
+
+        SiteVisitor.objects.create(page='/', ip_address='10.0.0.2')
+        self.assertEqual(rollup.update_rollups()[0], 1)
+
+        row = VisitorRollup.objects.get()
+        self.assertEqual((row.hits, row.unique_ips), (2, 2))
+        self.assertEqual(rollup.watermark(), SiteVisitor.objects.latest('id').id)
+
+    def test_backlog_is_folded_in_bounded_batches(self):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=3)
+        SiteVisitor.objects.bulk_create([
+            SiteVisitor(page='/', ip_address=f'10.0.0.{h % 5}', visited_at=start + timedelta(hours=h, minutes=m))
+            for h in range(60) for m in (1, 2)
+        ])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(rollup.update_rollups(max_hours=24), (48, 24))
+        # one pass: the same few statements however many hours it covers
+        self.assertLessEqual(len([q for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]), 12)
+        self.assertEqual(VisitorRollup.objects.count(), 24)
+
+        self.assertEqual(rollup.catch_up(batch_hours=10), (72, 36))
+        self.assertEqual(VisitorRollup.objects.aggregate(n=Sum('hits'))['n'], 120)
+        self.assertEqual(rollup.watermark(), SiteVisitor.objects.latest('id').id)
+
+
+class HyperLogLogTests(PortfolioTestCase):
+
+    # 3 standard errors for p=11 (1.04 / sqrt(2048) ≈ 2.3%)
+    TOLERANCE = 0.07
+
+    def test_estimates_are_within_the_error_bound(self):
+        for n in (10, 500, 5000, 50000):
+            with self.subTest(n=n):
+                sketch = HyperLogLog().update(f'10.{i >> 16}.{(i >> 8) & 255}.{i & 255}' for i in range(n))
+                self.assertLessEqual(abs(sketch.count() - n), max(1, n * self.TOLERANCE))
+
+    def test_duplicates_do_not_inflate_the_count(self):
+        sketch = HyperLogLog().update(['10.0.0.1', '10.0.0.2'] * 1000)
+        self.assertEqual(sketch.count(), 2)
+
+    def test_merge_matches_the_union_and_survives_storage(self):
+        a = HyperLogLog().update(f'a{i}' for i in range(3000))
+        b = HyperLogLog().update(f'a{i}' for i in range(2000, 6000))
+        merged = HyperLogLog.from_bytes(a.to_bytes()).merge(HyperLogLog.from_bytes(b.to_bytes()))
+
+        self.assertEqual(len(a.to_bytes()), 2049)
+        self.assertLessEqual(abs(merged.count() - 6000), 6000 * self.TOLERANCE)
+
+    def test_rollup_feeds_daily_sketches(self):
+        SiteVisitor.objects.bulk_create(
+            [SiteVisitor(page='/', ip_address=f'10.0.0.{i}') for i in range(40)]
+            + [SiteVisitor(page='/project/x/', ip_address='10.0.0.1')]
+        )
+        rollup.update_rollups()
+        rollup.update_rollups()
+
+        today = timezone.now().date()
+        self.assertEqual(UniqueVisitorSketch.objects.filter(day=today).count(), 3)
+        self.assertEqual(rollup.unique_visitors(today), 40)
+        self.assertEqual(rollup.unique_visitors(today, page='/project/x/'), 1)
+
+
+class DashboardSnapshotTests(AdminLoginMixin, PortfolioTestCase):
+
+    def test_snapshot_counts(self):
+        now = timezone.now()
+        SiteVisitor.objects.bulk_create(
+            [SiteVisitor(page='/') for _ in range(3)]
+            + [SiteVisitor(page='/', visited_at=now - timedelta(days=2))]
+            + [SiteVisitor(page='/', visited_at=now - timedelta(days=30))]
+        )
+        ContactMessage.objects.create(name='a', email='a@b.co', subject='s', message='m')
+        ContactMessage.objects.create(name='b', email='b@b.co', subject='s', message='m', is_read=True)
+
+        snap = dashboard.build_snapshot(now=now)
+
+        self.assertEqual(snap['total_visits'], 5)
+        self.assertEqual(snap['today_visits'], 3)
+        self.assertEqual(snap['chart_values'][-1], 3)
+        self.assertEqual(snap['chart_values'][-3], 1)
+        self.assertEqual(sum(snap['chart_values']), 4)
+        self.assertEqual((snap['total_messages'], snap['unread']), (2, 1))
+
+        # nothing new to roll up: watermark + max id, then sketches + the three reads
+        with self.assertNumQueries(6):
+            dashboard.build_snapshot(now=now)
+
+    def test_dashboard_is_served_from_cache_until_invalidated(self):
+        self.login_admin()
+        self.client.get('/admin-panel/')
+
+        SiteVisitor.objects.create(page='/')
+        response = self.client.get('/admin-panel/')
+        self.assertEqual(response.context['total_visits'], 0)
+
+        dashboard.invalidate()
+        response = self.client.get('/admin-panel/')
+        self.assertEqual(response.context['total_visits'], 1)
+
+
+class KeysetPaginationTests(AdminLoginMixin, PortfolioTestCase):
+
+    def test_walks_every_row_once_even_with_equal_timestamps(self):
+        stamp = timezone.now()
+        SiteVisitor.objects.bulk_create([SiteVisitor(page=f'/{i}', visited_at=stamp) for i in range(7)])
+
+        seen, cursor = [], None
+        while True:
+            page = pagination.paginate(SiteVisitor.objects.all(), 'visited_at', cursor, page_size=3)
+            seen += [v.pk for v in page.items]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(seen, sorted(SiteVisitor.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        self.assertIsNone(pagination.decode_cursor('not-a-cursor'))
+
+    @override_settings(ADMIN_PAGE_SIZE=2)
+    def test_messages_page_marks_only_displayed_rows_read(self):
+        for i in range(5):
+            ContactMessage.objects.create(name=f'n{i}', email='a@b.co', subject='s', message='m')
+        self.login_admin()
+
+        response = self.client.get('/admin-panel/messages/')
+        self.assertEqual(len(response.context['messages']), 2)
+        self.assertEqual(ContactMessage.objects.filter(is_read=True).count(), 2)
+
+        response = self.client.get('/admin-panel/messages/', {'cursor': response.context['page'].next_cursor})
+        self.assertEqual([m.name for m in response.context['messages']], ['n2', 'n1'])
+        self.assertEqual(ContactMessage.objects.filter(is_read=True).count(), 4)
+
+
+class ExportTests(AdminLoginMixin, PortfolioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        SiteVisitor.objects.bulk_create([
+            SiteVisitor(page='/', ip_address='10.0.0.1', visited_at=now - timedelta(days=3)),
+            SiteVisitor(page='/', ip_address='10.0.0.2', visited_at=now),
+            SiteVisitor(page='/project/x/', ip_address='10.0.0.3', visited_at=now),
+        ])
+
+    def test_export_requires_admin(self):
+        response = self.client.get('/admin-panel/export/visitors/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_csv_export_streams_filtered_rows(self):
+        self.login_admin()
+        today = timezone.now().date().isoformat()
+        response = self.client.get('/admin-panel/export/visitors/', {'start': today, 'page': '/'})
+
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:3], ['id', 'visited_at', 'ip_address'])
+        self.assertEqual([r[2] for r in rows[1:]], ['10.0.0.2'])
+
+    def test_ndjson_export_and_bad_input(self):
+        self.login_admin()
+        ContactedIP.record('10.0.0.1')
+        response = self.client.get('/admin-panel/export/visitors/', {'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['ip_address'] for line in lines], ['10.0.0.1', '10.0.0.2', '10.0.0.3'])
+        self.assertEqual([json.loads(line)['sent_contact'] for line in lines], [True, False, False])
+
+        self.assertEqual(self.client.get('/admin-panel/export/visitors/', {'start': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get('/admin-panel/export/nope/').status_code, 404)
+
+    def test_csv_cells_cannot_become_formulas(self):
+        ContactMessage.objects.create(name='=HYPERLINK("http://evil")', email='a@b.co',
+                                      subject='-2+3', message='\tx', ip_address='10.0.0.1')
+        rows = list(csv.reader(exports.csv_lines('messages', exports.export_queryset('messages'))))
+        self.assertEqual(rows[1][2:6], ['\'=HYPERLINK("http://evil")', 'a@b.co', "'-2+3", "'\tx"])
+
+        lines = list(exports.ndjson_lines('messages', exports.export_queryset('messages')))
+        self.assertEqual(json.loads(lines[0])['subject'], '-2+3')   # JSON is not a spreadsheet
+
+    def test_command_writes_gzip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'visits.csv.gz')
+            call_command('export_visitors', output=path, stdout=io.StringIO())
+            with gzip.open(path, 'rt') as fh:
+                self.assertEqual(len(fh.read().splitlines()), 4)
+
+
+@override_settings(RATE_LIMITS={'login': (3, 60), 'contact': (2, 60)})
+class RateLimiterTests(AdminLoginMixin, PortfolioTestCase):
+
+    def test_backends(self):
+        for backend in (ratelimit.LocalMemoryRateLimiter, ratelimit.CacheRateLimiter):
+            with self.subTest(backend=backend.__name__):
+                limiter = backend()
+                for _ in range(2):
+                    limiter.hit('login', '10.0.0.1')
+                self.assertFalse(limiter.is_limited('login', '10.0.0.1'))
+                self.assertEqual(limiter.remaining('login', '10.0.0.1'), 1)
+
+                limiter.hit('login', '10.0.0.1')
+                self.assertTrue(limiter.is_limited('login', '10.0.0.1'))
+                self.assertFalse(limiter.is_limited('login', '10.0.0.2'))
+                self.assertTrue(0 < limiter.retry_after('login', '10.0.0.1') <= 120)
+
+                limiter.reset('login', '10.0.0.1')
+                self.assertFalse(limiter.is_limited('login', '10.0.0.1'))
+
+    def test_cache_backend_counts_every_parallel_hit(self):
+        limiter = ratelimit.CacheRateLimiter()
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: limiter.hit('contact', '10.0.0.9'), range(40)))
+        self.assertEqual(limiter.count('contact', '10.0.0.9'), 40)
+
+    @override_settings(RATE_LIMIT_BACKEND='')
+    def test_default_backend_never_queries(self):
+        limiter = ratelimit.get_limiter()
+        self.assertIsInstance(limiter, ratelimit.CacheRateLimiter)
+        with self.assertNumQueries(0):
+            limiter.hit('login', '10.0.0.1')
+            limiter.is_limited('login', '10.0.0.1')
+
+    @override_settings(RATE_LIMITS={'contact': (5, 60)})
+    def test_cache_backend_slides_across_window_boundaries(self):
+        limiter = ratelimit.CacheRateLimiter()
+        now = [6000.0 + 59]   # one second before a window ends
+
+        def burst():
+            allowed = 0
+            for _ in range(10):
+                if not limiter.is_limited('contact', '10.0.0.5'):
+                    limiter.hit('contact', '10.0.0.5')
+                    allowed += 1
+            return allowed
+
+        with mock.patch('time.time', lambda: now[0]):
+            self.assertEqual(burst(), 5)
+            now[0] += 2                  # next window: a fixed window would allow 5 more
+            self.assertEqual(burst(), 0)
+            wait = limiter.retry_after('contact', '10.0.0.5')
+            self.assertAlmostEqual(wait, 11, delta=0.01)   # 5 * (1 - t/60) <= 4 from t = 12; now is t = 1
+            now[0] += wait - 1
+            self.assertTrue(limiter.is_limited('contact', '10.0.0.5'))
+            now[0] += 1
+            self.assertEqual(burst(), 1)
+            now[0] += 60                 # only the one late hit still counts, at 80%
+            self.assertEqual(burst(), 4)
+
+    @override_settings(RATE_LIMIT_MAX_KEYS=2)
+    def test_local_memory_backend_is_lru_bounded(self):
+        limiter = ratelimit.LocalMemoryRateLimiter()
+        for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            limiter.hit('contact', ip)
+        self.assertEqual(limiter.count('contact', '10.0.0.1'), 0)
+        self.assertEqual(limiter.count('contact', '10.0.0.3'), 1)
+
+    @override_settings(RATE_LIMIT_BACKEND='portfolio.ratelimit.CacheRateLimiter')
+    def test_login_lockout_checks_do_not_query_the_db(self):
+        for _ in range(3):
+            self.client.post('/admin-panel/login/', {'password': 'wrong'})
+        self.assertEqual(LoginAttempt.objects.count(), 3)   # audit trail
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/admin-panel/login/')
+        self.assertTrue(response.context['locked'])
+        self.assertEqual(response.context['minutes_left'], ratelimit.minutes_until_allowed('login', '127.0.0.1'))
+
+    @override_settings(RATE_LIMIT_BACKEND='portfolio.ratelimit.DatabaseRateLimiter')
+    def test_database_backend_counts_audit_rows(self):
+        for _ in range(3):
+            self.client.post('/admin-panel/login/', {'password': 'wrong'})
+        self.assertTrue(ratelimit.get_limiter().is_limited('login', '127.0.0.1'))
+
+
+class SiteSettingsCacheTests(PortfolioTestCase):
+
+    def setUp(self):
+        cache.clear()
+        SiteSettings.invalidate_cache()
+
+    def test_steady_state_load_makes_no_queries(self):
+        SiteSettings.load()
+        with self.assertNumQueries(0):
+            SiteSettings.load()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/')
+        self.assertFalse([q for q in ctx.captured_queries if 'portfolio_sitesettings' in q['sql']])
+
+    def test_save_invalidates_after_commit(self):
+        site = SiteSettings.load_from_db()
+        old_version = SiteSettings.cache_version()
+
+        site.hero_title = 'Changed'
+        with self.captureOnCommitCallbacks(execute=True):
+            site.save()
+
+        self.assertNotEqual(SiteSettings.cache_version(), old_version)
+        self.assertEqual(SiteSettings.load().hero_title, 'Changed')
+
+    @override_settings(SITE_SETTINGS_RECHECK_SECONDS=0)
+    def test_other_workers_notice_a_new_version_through_a_shared_cache(self):
+        with mock.patch.object(caching, 'is_process_local', return_value=False):
+            SiteSettings.load()
+            SiteSettings.objects.filter(pk=1).update(hero_title='Elsewhere')
+            self.assertNotEqual(SiteSettings.load().hero_title, 'Elsewhere')
+
+            # another worker saved and bumped the shared stamp
+            cache.set('portfolio:version:site_settings', 'bumped-elsewhere', None)
+            self.assertEqual(SiteSettings.load().hero_title, 'Elsewhere')
+
+    @override_settings(SITE_SETTINGS_RECHECK_SECONDS=0)
+    def test_other_workers_notice_a_new_version_with_a_per_process_cache(self):
+        SiteSettings.load()
+        version = SiteSettings.cache_version()
+
+        # another worker saved: its on_commit invalidate() only reached its own memory
+        SiteSettings.objects.filter(pk=1).update(hero_title='Elsewhere', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(SiteSettings.load().hero_title, 'Elsewhere')
+        self.assertNotEqual(SiteSettings.cache_version(), version)   # page cache keys move on too
+
+
+class PageCacheTests(PortfolioTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_page_is_precompressed_and_tracked_on_every_hit(self):
+        first = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(first.content, second.content)
+        self.assertIn(b'</html>', gzip.decompress(second.content))
+        self.assertIn('Accept-Encoding', second['Vary'])
+        self.assertEqual(second['Cache-Control'], settings.PUBLIC_CACHE_CONTROL)
+        self.assertFalse(second.cookies)   # shared by every visitor, so a CDN can store it
+        self.assertEqual(SiteVisitor.objects.count(), 2)
+        self.assertEqual([q for q in ctx.captured_queries if 'INSERT' not in q['sql']], [])
+
+    def test_etag_revalidation_returns_304(self):
+        response = self.client.get('/project/joint-force/')
+        self.assertNotIn('Content-Encoding', response)
+
+        again = self.client.get('/project/joint-force/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        self.assertEqual(SiteVisitor.objects.count(), 2)
+
+    def test_settings_change_gives_a_new_entry(self):
+        etag = self.client.get('/')['ETag']
+        SiteSettings.invalidate_cache()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get('/')['ETag'], etag)   # same HTML, fresh render
+        self.assertTrue([q for q in ctx.captured_queries if 'portfolio_sitesettings' in q['sql']])
+
+    def test_unknown_project_is_404(self):
+        self.assertEqual(self.client.get('/project/nope/').status_code, 404)
+
+
+@override_settings(PRERENDER_SERVE=True)
+class PrerenderTests(PortfolioTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+
+    def test_built_pages_are_served_by_the_middleware(self):
+        manifest = prerender.build(self.root)
+        self.assertIn('/project/joint-force/', manifest['pages'])
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'index.html.gz')))
+
+        with override_settings(PRERENDER_ROOT=self.root):
+            with self.assertTemplateNotUsed('portfolio/index.html'):
+                response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+            again = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], manifest['pages']['/']['encodings']['gzip']['etag'])
+        self.assertFalse(response.cookies)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['Cache-Control'], settings.PUBLIC_CACHE_CONTROL)
+        self.assertEqual(SiteVisitor.objects.count(), 2)
+
+    def test_stale_site_settings_fall_through_to_the_view(self):
+        prerender.build(self.root)
+        site = SiteSettings.load()
+        site.hero_title = 'Changed after deploy'
+        with self.captureOnCommitCallbacks(execute=True):
+            site.save()
+
+        with override_settings(PRERENDER_ROOT=self.root):
+            with self.assertTemplateUsed('portfolio/index.html'):
+                self.client.get('/')
+
+
+class ProjectPageTests(PortfolioTestCase):
+
+    def setUp(self):
+        cache.clear()
+        projects.invalidate()
+
+    def _create(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Project.objects.create(**{
+                'title': 'Route Planner',
+                'description': 'Plans routes.\n\nBuilt with a graph search.',
+                'technologies': 'Django, PostGIS ,',
+                **fields,
+            })
+
+    def test_project_row_is_rendered_with_the_shared_template(self):
+        self._create()
+        with self.assertTemplateUsed('portfolio/project_detail.html'):
+            response = self.client.get('/project/route-planner/')
+        self.assertContains(response, 'Route Planner')
+        self.assertContains(response, '<span class="tech-badge">PostGIS</span>', html=True)
+        self.assertEqual(projects.get('route-planner').technologies, ('Django', 'PostGIS'))
+
+    def test_slug_lookup_needs_no_query(self):
+        self._create()
+        projects.get('route-planner')   # warm the index
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/project/route-planner/')
+            self.client.get('/project/missing/')
+        self.assertEqual([q for q in ctx.captured_queries if 'portfolio_project' in q['sql']], [])
+
+    def test_saving_a_project_rebuilds_the_index(self):
+        project = self._create()
+        self.assertEqual(self.client.get('/project/route-planner/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.title = 'Route Planner 2'
+            project.save()
+        self.assertContains(self.client.get('/project/route-planner/'), 'Route Planner 2')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.delete()
+        self.assertEqual(self.client.get('/project/route-planner/').status_code, 404)
+
+    @override_settings(SITE_SETTINGS_RECHECK_SECONDS=0)
+    def test_edits_made_by_another_worker_are_picked_up(self):
+        # another process: rows change, but its invalidate() (on_commit) never
+        # reaches this process's memory or writes the shared stamp here
+        self.assertEqual(self.client.get('/project/route-planner/').status_code, 404)
+
+        project = Project.objects.create(title='Route Planner', description='Plans routes.', technologies='Django')
+        self.assertEqual(self.client.get('/project/route-planner/').status_code, 200)
+
+        Project.objects.filter(pk=project.pk).update(title='Route Planner 2', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertContains(self.client.get('/project/route-planner/'), 'Route Planner 2')
+
+        Project.objects.filter(pk=project.pk).delete()
+        self.assertEqual(self.client.get('/project/route-planner/').status_code, 404)
+
+    def test_hand_written_pages_still_served(self):
+        with self.assertTemplateUsed('portfolio/project-joint-force.html'):
+            self.client.get('/project/joint-force/')
+
+
+class CountingEmailBackend(LocMemEmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class BrokenEmailBackend(LocMemEmailBackend):
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('smtp down')
+
+
+class FakeSMTP:
+    """
+    Stands in for smtplib.SMTP under Django's SMTP backend: counts
+    connections, drops on 'fail', refuses the recipient (550) on 'refused'.
+    """
+    connections = 0
+    delivered = []
+
+    def __init__(self, host, port, **kwargs):
+        FakeSMTP.connections += 1
+        self.alive = True
+
+    def sendmail(self, from_addr, to_addrs, msg, *args, **kwargs):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected('connection closed')
+        if b'Subject: fail' in msg:
+            self.alive = False
+            raise smtplib.SMTPServerDisconnected('dropped mid-message')
+        if b'Subject: refused' in msg:
+            raise smtplib.SMTPRecipientsRefused({to_addrs[0]: (550, b'no such user')})
+        FakeSMTP.delivered.append(msg)
+        return {}
+
+    def quit(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected('connection closed')
+
+    def close(self):
+        pass
+
+
+class OutboxTests(PortfolioTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ratelimit._limiter = None
+
+    def _post_contact(self):
+        return self.client.post('/api/contact/', data=json.dumps({
+            'name': 'Ada', 'email': 'ada@example.com', 'subject': 'Hello', 'message': 'Hi there',
+        }), content_type='application/json')
+
+    def test_contact_records_ip_without_touching_visits(self):
+        SiteVisitor.objects.create(ip_address='127.0.0.1', page='/')
+        with CaptureQueriesContext(connection) as ctx:
+            self._post_contact()
+        self._post_contact()
+
+        self.assertEqual(ContactedIP.objects.filter(ip_address='127.0.0.1').count(), 1)
+        self.assertFalse([q for q in ctx.captured_queries if 'portfolio_sitevisitor' in q['sql']])
+        visitor = SiteVisitor.objects.annotate(sent_contact=ContactedIP.sent_contact()).get()
+        self.assertTrue(visitor.sent_contact)
+
+    def test_contact_queues_email_instead_of_sending(self):
+        response = self._post_contact()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.subject, '[Portfolio] Hello')
+
+        self.assertEqual(outbox.drain(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, [settings.ADMIN_EMAIL])
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.SENT)
+
+    @override_settings(OUTBOX_DELIVERY='inline')
+    def test_inline_delivery_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post_contact()
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_BACKEND='portfolio.tests.CountingEmailBackend')
+    def test_one_connection_per_batch(self):
+        CountingEmailBackend.opened = 0
+        for i in range(5):
+            outbox.enqueue(f'subject {i}', 'body', ['me@example.com'])
+
+        self.assertEqual(outbox.drain(batch_size=3), (5, 0))
+        self.assertEqual(CountingEmailBackend.opened, 2)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend')
+    def test_failed_message_reopens_the_connection_once(self):
+        FakeSMTP.connections, FakeSMTP.delivered = 0, []
+        for subject in ('one', 'fail', 'three', 'four', 'five'):
+            outbox.enqueue(subject, 'body', ['me@example.com'])
+
+        with mock.patch('smtplib.SMTP', FakeSMTP):
+            self.assertEqual(outbox.send_pending(), (4, 1))
+        self.assertEqual(FakeSMTP.connections, 2)   # the batch's, plus one after the drop
+        self.assertEqual(len(FakeSMTP.delivered), 4)
+        self.assertEqual(OutboxEmail.objects.get(subject='fail').status, OutboxEmail.PENDING)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend')
+    def test_permanent_failures_are_not_retried(self):
+        FakeSMTP.connections, FakeSMTP.delivered = 0, []
+        for subject in ('one', 'refused', 'three'):
+            outbox.enqueue(subject, 'body', ['me@example.com'])
+
+        with mock.patch('smtplib.SMTP', FakeSMTP):
+            self.assertEqual(outbox.send_pending(), (2, 1))
+        self.assertEqual(FakeSMTP.connections, 1)   # the connection was fine, no reconnect
+        refused = OutboxEmail.objects.get(subject='refused')
+        self.assertEqual((refused.status, refused.attempts), (OutboxEmail.FAILED, 1))
+        self.assertIn('no such user', refused.last_error)
+
+    def test_only_connection_trouble_and_4xx_replies_are_transient(self):
+        transient = [
+            ConnectionRefusedError(), TimeoutError(), smtplib.SMTPServerDisconnected(),
+            smtplib.SMTPResponseException(451, b'try again'),
+            smtplib.SMTPRecipientsRefused({'a@example.com': (452, b'mailbox full')}),
+        ]
+        permanent = [
+            BadHeaderError('newline'), smtplib.SMTPAuthenticationError(535, b'bad login'),
+            smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'no such user')}),
+            smtplib.SMTPNotSupportedError(),
+        ]
+        for error in transient:
+            self.assertTrue(outbox.is_transient(error), error)
+        for error in permanent:
+            self.assertFalse(outbox.is_transient(error), error)
+
+    @override_settings(EMAIL_BACKEND='portfolio.tests.BrokenEmailBackend',
+                       OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_BASE_SECONDS=30)
+    def test_failures_back_off_then_give_up(self):
+        outbox.enqueue('s', 'b', ['me@example.com'])
+
+        self.assertEqual(outbox.send_pending(), (0, 1))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.PENDING, 1))
+        self.assertIn('smtp down', email.last_error)
+        self.assertAlmostEqual((email.next_attempt_at - timezone.now()).total_seconds(), 30, delta=5)
+        self.assertEqual(outbox.send_pending(), (0, 0))   # not due yet
+        self.assertEqual(outbox.retry_delay(2), 60)
+
+        for _ in range(2):
+            outbox.send_pending(now=timezone.now() + timedelta(days=1))
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.FAILED)
+
+    def test_run_outbox_command(self):
+        outbox.enqueue('s', 'b', ['me@example.com'])
+        call_command('run_outbox', '--once', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class AsyncViewTests(PortfolioTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ratelimit._limiter = None
+        self.factory = AsyncRequestFactory()
+
+    async def test_async_index_matches_sync_page(self):
+        sync_body = (await self.async_client.get('/')).content   # sync view, fills the page cache
+        response = await views.aportfolio_index(self.factory.get('/'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, sync_body)
+        self.assertEqual(await SiteVisitor.objects.acount(), 2)
+
+    async def test_async_project_detail(self):
+        response = await views.aproject_detail(self.factory.get('/project/joint-force/'), 'joint-force')
+        self.assertIn(b'Joint Force', response.content)
+        with self.assertRaises(Http404):
+            await views.aproject_detail(self.factory.get('/project/nope/'), 'nope')
+
+    async def test_async_contact_saves_and_queues_email(self):
+        request = self.factory.post('/api/contact/', data=json.dumps({
+            'name': 'Ada', 'email': 'ada@example.com', 'subject': 'Hi', 'message': 'Hello',
+        }), content_type='application/json')
+        request._dont_enforce_csrf_checks = True
+
+        response = await views.acontact_api(request)
+        self.assertEqual(json.loads(response.content)['success'], True)
+        self.assertEqual(await ContactMessage.objects.acount(), 1)
+        self.assertEqual(await OutboxEmail.objects.filter(status=OutboxEmail.PENDING).acount(), 1)
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(DEBUG=True, QUERY_BUDGET_MODE='log')
+    def test_no_middleware_moves_async_requests_to_a_thread(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('loaded')
+        self.assertEqual([line for line in logs.output if 'adapted' in line], [])
+
+    async def test_async_requests_time_queries_run_in_threads(self):
+        async def view(request):
+            await SiteVisitor.objects.acount()   # runs on a sync_to_async thread's connection
+            return HttpResponse('ok')
+
+        timing = middleware.RequestTimingMiddleware(view)
+        with budgets.recording() as log:
+            response = await timing(self.factory.get('/'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertEqual(log.count, 1)
+
+    async def test_prerendered_pages_are_served_on_the_event_loop(self):
+        template = get_template('portfolio/index.html')
+        page = {'template': 'portfolio/index.html', 'mtime': page_cache.template_mtime(template),
+                'variants': {'identity': (b'built', '"v1"')}}
+        site = await prerender.asite_fingerprint()
+        view = mock.AsyncMock()
+        with mock.patch.object(prerender, 'load', return_value=({'/': page}, site)), \
+                self.settings(PRERENDER_SERVE=True):
+            prerendered = middleware.PrerenderedPageMiddleware(view)
+        response = await prerendered(self.factory.get('/'))
+        self.assertEqual(response.content, b'built')
+        view.assert_not_called()
+        self.assertEqual(await SiteVisitor.objects.acount(), 1)
+
+
+class BenchmarkTests(PortfolioTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ratelimit._limiter = None
+
+    def test_seed_and_run_every_endpoint(self):
+        counts = benchmark.seed(200, batch_size=64)
+        self.assertEqual(counts, {'SiteVisitor': 200, 'ContactMessage': 20, 'LoginAttempt': 20})
+        self.assertEqual(SiteVisitor.objects.count(), 200)
+
+        results = benchmark.run(iterations=3, warmup=1)
+        self.assertEqual(set(results), set(benchmark.ENDPOINTS))
+        self.assertEqual(results['portfolio_index']['statuses'], [200])
+        self.assertEqual(results['project_detail_404']['statuses'], [404])
+        self.assertEqual(results['admin_dashboard']['statuses'], [200])   # logged in, not redirected
+        self.assertEqual(results['admin_metrics']['statuses'], [200])
+        self.assertEqual(results['admin_logout']['statuses'], [302])
+
+        covered = {route for summary in results.values() for route in summary['routes']}
+        every_route = {f'portfolio:{pattern.name}' for pattern in urls.urlpatterns}
+        self.assertEqual(every_route - covered, set())
+        for summary in results.values():
+            self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+
+    def test_compare_flags_regressions(self):
+        old = {'results': {'a': {'p95_ms': 10.0, 'queries_per_request': 2}}}
+        new = {'results': {
+            'a': {'p95_ms': 10.5, 'queries_per_request': 3},
+            'b': {'p95_ms': 1.0, 'queries_per_request': 0},
+        }}
+        lines, regressed = benchmark.compare(old, new, threshold=0.2)
+        self.assertEqual(regressed, ['a'])
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(benchmark.percentile([5, 1, 3, 2, 4], 50), 3)
+
+
+class QueryBudgetTests(AdminLoginMixin, PortfolioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        SiteSettings.invalidate_cache()
+        projects.invalidate()
+
+    def test_every_route_has_a_budget(self):
+        from django.urls import get_resolver
+        names = {f'portfolio:{p.name}' for p in get_resolver('portfolio.urls').url_patterns}
+        self.assertEqual(names - set(budgets.BUDGETS), set())
+
+    def test_views_stay_within_budget_on_a_cold_cache(self):
+        with budgets.within_budget('portfolio:home'):
+            self.client.get('/')
+        with budgets.within_budget('portfolio:project_detail'):
+            self.client.get('/project/joint-force/')
+        with budgets.within_budget('portfolio:contact_submit'):
+            self.client.post('/api/contact/', data=json.dumps({
+                'name': 'Ada', 'email': 'ada@example.com', 'subject': 'Hi', 'message': 'Hello',
+            }), content_type='application/json')
+        with budgets.within_budget('portfolio:admin_login'):
+            self.login_admin()
+
+        SiteVisitor.objects.create(ip_address='10.0.0.1', page='/')   # dashboard has a rollup to catch up
+        for name, path in [
+            ('portfolio:admin_dashboard', '/admin-panel/'),
+            ('portfolio:admin_visitors', '/admin-panel/visitors/'),
+            ('portfolio:admin_messages', '/admin-panel/messages/'),
+            ('portfolio:admin_updates', '/admin-panel/updates/'),
+            ('portfolio:admin_export', '/admin-panel/export/visitors/'),
+            ('portfolio:admin_metrics', '/admin-panel/metrics/'),
+        ]:
+            with self.subTest(name), budgets.within_budget(name):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'portfolio:admin_updates': (0, 1000)})
+    def test_overrun_reports_sql_and_origin(self):
+        self.login_admin()
+        with self.assertRaises(budgets.BudgetExceeded) as ctx:
+            with budgets.within_budget('portfolio:admin_updates'):
+                self.client.get('/admin-panel/updates/')
+        self.assertIn('over budget', str(ctx.exception))
+        self.assertIn('portfolio_siteupdate', str(ctx.exception))
+        self.assertIn('portfolio/views.py', str(ctx.exception))
+
+    def test_database_time_is_only_checked_when_asked(self):
+        log = budgets.QueryLog([budgets.QueryRecord('SELECT 1', 5000.0, [])])   # a slow runner, not a slow view
+        self.assertEqual(budgets.violations('portfolio:admin_updates', log, check_time=False), [])
+        self.assertIn('ms in the database', budgets.violations('portfolio:admin_updates', log)[0])
+
+    @override_settings(QUERY_BUDGET_MODE='log', QUERY_BUDGETS={'portfolio:admin_updates': (0, 1000)})
+    def test_middleware_logs_overruns(self):
+        self.login_admin()
+        with self.assertLogs('portfolio.budgets', 'WARNING') as logs:
+            self.client.get('/admin-panel/updates/')
+        self.assertIn('portfolio:admin_updates over budget', logs.output[0])
+
+
+@override_settings(METRICS_TOKEN='scrape-me')
+class RequestTimingTests(AdminLoginMixin, PortfolioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.recorder._reset()
+
+    def test_server_timing_header_splits_the_request(self):
+        header = self.client.get('/').headers['Server-Timing']
+        phases = dict(part.split(';dur=') for part in header.split(', '))
+        self.assertEqual(set(phases), {'total', 'db', 'template', 'tracking'})
+        self.assertGreaterEqual(float(phases['total']), float(phases['template']))
+
+    def test_histograms_are_admin_only(self):
+        self.client.get('/')
+        self.assertEqual(self.client.get('/admin-panel/metrics/').status_code, 302)
+        wrong = self.client.get('/admin-panel/metrics/', HTTP_AUTHORIZATION='Bearer nope')
+        self.assertEqual(wrong.status_code, 302)
+
+        response = self.client.get('/admin-panel/metrics/', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('portfolio_request_duration_seconds_bucket{route="portfolio:home",le="+Inf"} 1', body)
+        self.assertIn('portfolio_request_duration_seconds_count{route="portfolio:home"} 1', body)
+        self.assertIn('portfolio_request_phase_seconds_total{route="portfolio:home",phase="template"}', body)
+
+    def test_snapshots_of_all_workers_are_added_up(self):
+        metrics.observe('portfolio:home', 0.003, {'db': 0.001})
+        other = metrics.Recorder()
+        other.worker = 'other-host:1:0'
+        other.observe('portfolio:home', 0.2, {'db': 0.05})
+        other.flush(force=True)
+
+        routes, workers = metrics.collect()
+        self.assertEqual(workers, 2)
+        home = routes['portfolio:home']
+        self.assertEqual(home['count'], 2)
+        self.assertEqual(home['buckets'][0], 1)                                  # <= 5 ms
+        self.assertEqual(home['buckets'][metrics.BUCKETS.index(0.25)], 1)
+        self.assertAlmostEqual(home['phases']['db'], 0.051)
+
+        text = metrics.render_prometheus(routes, workers)
+        self.assertIn('route="portfolio:home",le="0.005"} 1', text)
+        self.assertIn('route="portfolio:home",le="0.25"} 2', text)   # buckets are cumulative
+
+
+class LoggingTests(PortfolioTestCase):
+
+    def record(self, msg='Visitor tracking failed', **extra):
+        record = logging.LogRecord('portfolio.tracking', logging.ERROR, __file__, 1, msg, (), None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_lines_carry_request_fields_and_exception(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            record = logging.LogRecord('portfolio.views', logging.ERROR, __file__, 1, 'boom', (), sys.exc_info())
+        record.route, record.ip_hash = 'portfolio:home', log.hash_ip('10.0.0.1')
+        data = json.loads(log.JsonFormatter().format(record))
+        self.assertEqual(data['message'], 'boom')
+        self.assertEqual(data['route'], 'portfolio:home')
+        self.assertEqual(len(data['ip_hash']), 12)
+        self.assertNotIn('10.0.0.1', json.dumps(data))
+        self.assertIn('ZeroDivisionError', data['exception'])
+
+    def test_background_handler_writes_from_its_own_thread(self):
+        stream = io.StringIO()
+        handler = log.BackgroundHandler(stream=stream)
+        handler.setFormatter(log.JsonFormatter())
+        handler.handle(self.record())
+        handler.stop()   # drains the queue
+        self.assertEqual(json.loads(stream.getvalue())['logger'], 'portfolio.tracking')
+
+    def test_repeated_errors_are_sampled(self):
+        sampler = log.SampledFilter(burst=2, window=60)
+        passed = [sampler.filter(self.record()) for _ in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+
+        sampler.seen[('portfolio.tracking', 'Visitor tracking failed')][0] -= 60   # next window
+        record = self.record()
+        self.assertTrue(sampler.filter(record))
+        self.assertEqual(record.suppressed, 3)
+
+    def test_tracking_errors_are_logged_not_printed(self):
+        with mock.patch.object(tracking, 'record_visit', side_effect=RuntimeError('db down')), \
+                self.assertLogs('portfolio.tracking', 'ERROR') as logs:
+            self.assertEqual(self.client.get('/').status_code, 200)
+        record = logs.records[0]
+        self.assertEqual(record.route, 'portfolio:home')
+        self.assertEqual(record.ip_hash, log.hash_ip('127.0.0.1'))
+        self.assertIn('duration_ms', vars(record))
+
+
+class ImageOptimizationTests(PortfolioTestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.src = os.path.join(root, 'static', 'images')
+        self.out = os.path.join(root, 'static', 'optimized')
+        os.makedirs(self.src)
+        Image.new('RGBA', (1000, 500), (0, 120, 200, 255)).save(os.path.join(self.src, 'Shot 1.png'))
+        Image.new('RGBA', (200, 200), (0, 0, 0, 0)).save(os.path.join(self.src, 'icon.png'))
+        patcher = override_settings(
+            IMAGE_SOURCE_DIR=self.src, IMAGE_VARIANTS_DIR=self.out,
+            STATICFILES_DIRS=[os.path.join(root, 'static')], IMAGE_WIDTHS=(320, 640),
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def test_variants_are_resized_hashed_and_listed(self):
+        call_command('optimize_images', stdout=io.StringIO())
+        manifest = images.load_manifest()
+
+        shot = manifest['images/Shot 1.png']
+        self.assertEqual((shot['width'], shot['height']), (1000, 500))
+        self.assertEqual(list(shot['sources'])[0], 'image/avif' if 'AVIF' in Image.SAVE else 'image/webp')
+        self.assertEqual(list(shot['sources'])[-1], 'image/jpeg')        # opaque: alpha dropped
+        self.assertEqual([v['width'] for v in shot['sources']['image/webp']], [320, 640, 1000])
+        self.assertRegex(shot['sources']['image/webp'][0]['path'], r'^optimized/shot-1-320w\.[0-9a-f]{10}\.webp$')
+        self.assertEqual(list(manifest['images/icon.png']['sources'])[-1], 'image/png')   # keeps transparency
+        for variants in shot['sources'].values():
+            for v in variants:
+                self.assertTrue(os.path.exists(os.path.join(self.out, os.path.basename(v['path']))))
+
+    def test_unchanged_sources_are_skipped_and_stale_variants_removed(self):
+        images.optimize()
+        os.remove(os.path.join(self.src, 'icon.png'))
+        results = images.optimize()
+        self.assertFalse(results['images/Shot 1.png'][1])
+        self.assertFalse(any(name.startswith('icon-') for name in os.listdir(self.out)))
+
+    def test_picture_tag(self):
+        tpl = Template("{% load images %}{% picture 'images/Shot 1.png' alt='Shot' sizes='50vw' %}")
+        self.assertEqual(
+            tpl.render(Context()),
+            '<img src="/static/images/Shot 1.png" alt="Shot" loading="lazy" decoding="async">',
+        )
+
+        images.optimize()
+        html = tpl.render(Context())
+        self.assertTrue(html.startswith('<picture><source type="image/'))
+        self.assertIn('width="1000" height="500"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn(' 640w, ', html)
+        self.assertIn('sizes="50vw"', html)
+
+
+class AssetBundleTests(PortfolioTestCase):
+
+    ICONS_CSS = (
+        '@font-face{font-display:block;font-family:bootstrap-icons;'
+        'src:url("./fonts/bootstrap-icons.woff2?abc") format("woff2"),url("./fonts/bootstrap-icons.woff?abc") format("woff")}'
+        '.bi::before,[class^=bi-]::before{font-family:bootstrap-icons!important}'
+        '.bi-alarm::before{content:"\\f102"}.bi-github::before{content:"\\f3ed"}.bi-zoom-in::before{content:"\\f62c"}'
+        '/*# sourceMappingURL=bootstrap-icons.min.css.map */'
+    )
+
+    def test_only_used_icons_are_kept(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.html', delete=False) as f:
+            f.write('<i class="bi bi-github"></i> <i class="bi bi-zoom-in">')
+        self.addCleanup(os.remove, f.name)
+        css, codepoints = assets.icon_css(self.ICONS_CSS, assets.used_icons([f.name]), 'fonts/icons.woff2')
+        self.assertEqual(codepoints, [0xf3ed, 0xf62c])
+        self.assertIn('.bi-github::before', css)
+        self.assertNotIn('bi-alarm', css)
+        self.assertIn('src:url("fonts/icons.woff2") format("woff2")}', css)
+        self.assertNotIn('.woff?', css)
+
+    def test_google_fonts_are_localized_latin_only(self):
+        css = (
+            '/* latin-ext */\n@font-face { font-family: \'Orbitron\'; src: url(https://fonts.gstatic.com/a.woff2) format(\'woff2\'); }\n'
+            '/* latin */\n@font-face { font-family: \'Orbitron\'; src: url(https://fonts.gstatic.com/b.woff2) format(\'woff2\'); }\n'
+        )
+        fetched = []
+        with tempfile.TemporaryDirectory() as tmp:
+            out = assets.localize_fonts(css, Path(tmp), 'project', fetch=lambda url: fetched.append(url) or b'font')
+            self.assertEqual(len(os.listdir(tmp)), 1)
+        self.assertEqual(fetched, ['https://fonts.gstatic.com/b.woff2'])
+        self.assertRegex(out, r'url\("fonts/project-[0-9a-f]{10}\.woff2"\)')
+        self.assertNotIn('gstatic', out)
+
+    def test_source_map_comments_are_removed(self):
+        self.assertEqual(assets.strip_source_maps('a{}/*# sourceMappingURL=x.css.map */'), 'a{}')
+        self.assertEqual(assets.strip_source_maps('x();\n//# sourceMappingURL=x.js.map'), 'x();\n')
+
+    def test_downloads_must_match_a_pinned_hash(self):
+        pins = {'https://cdn.example/a.js': assets.integrity(b'a')}
+        downloads = {'https://cdn.example/a.js': b'a', 'https://cdn.example/b.js': b'b'}
+        fetch = assets.pinned(pins, fetch=downloads.get)
+        self.assertEqual(fetch('https://cdn.example/a.js'), b'a')
+        with self.assertRaisesRegex(ValueError, 'no pinned hash'):
+            fetch('https://cdn.example/b.js')
+
+        downloads['https://cdn.example/a.js'] = b'tampered'
+        with self.assertRaisesRegex(ValueError, 'integrity mismatch'):
+            assets.pinned(pins, record=True, fetch=downloads.get)('https://cdn.example/a.js')
+
+        assets.pinned(pins, record=True, fetch=downloads.get)('https://cdn.example/b.js')
+        self.assertEqual(pins['https://cdn.example/b.js'], assets.integrity(b'b'))
+
+    def test_font_files_are_fetched_through_the_pins(self):
+        css = "/* latin */\n@font-face { src: url(https://fonts.gstatic.com/b.woff2) format('woff2'); }\n"
+        with tempfile.TemporaryDirectory() as tmp, self.assertRaisesRegex(ValueError, 'no pinned hash'):
+            assets.localize_fonts(css, Path(tmp), 'site', assets.pinned({}, fetch=lambda url: b'font'))
+
+    def test_pages_only_load_same_origin_assets(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, 'site.css').write_text('')
+            Path(tmp, 'site.js').write_text('')
+            with override_settings(ASSET_BUNDLE_DIR=Path(tmp)):
+                cache.clear()
+                html = self.client.get('/').content.decode()
+        self.assertIn('/static/bundle/site.css', html)   # plain name until collectstatic has run
+        self.assertIn('/static/bundle/site.js', html)
+        self.assertIn("script-src 'self'; style-src 'self' 'unsafe-inline'; font-src 'self';", html)
+        for origin in ('cdn.jsdelivr.net', 'unpkg.com', 'fonts.googleapis.com'):
+            self.assertNotIn(origin, html)
+        self.assertNotIn('onclick=', html)
+
+    def test_pages_fall_back_to_the_cdn_without_a_bundle(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(ASSET_BUNDLE_DIR=Path(tmp)):
+            cache.clear()
+            html = self.client.get('/').content.decode()
+        self.assertNotIn('/static/bundle/', html)
+        self.assertIn(
+            f'<link href="{assets.VENDOR["bootstrap.min.css"]}" rel="stylesheet" '
+            f'integrity="{assets.load_pins()[assets.VENDOR["bootstrap.min.css"]]}" crossorigin="anonymous">', html,
+        )
+        for url in (assets.VENDOR['aos.js'], assets.VENDOR['particles.min.js'], '/static/portfolio/js/main.js'):
+            self.assertIn(f'<script src="{url}"', html)
+        self.assertIn("script-src 'self' https://cdn.jsdelivr.net https://unpkg.com;", html)   # the CSP lets them load
+
+
+class StyleBuildTests(PortfolioTestCase):
+
+    CSS = (
+        'body { margin: 0 }\n'
+        '.hero { color: red; animation: fade 1s }\n'
+        '.footer { color: blue }\n'
+        '@keyframes fade { from { opacity: 0 } }\n'
+        '@keyframes spin { to { transform: rotate(1turn) } }\n'
+        '@media (max-width: 600px) { .hero { color: green } .footer { padding: 0 } }\n'
+    )
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        patcher = override_settings(CSS_BUILD_DIR=Path(root, 'build'), ASSET_BUNDLE_DIR=Path(root, 'bundle'))
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.addCleanup(self._reset_template_cache)
+
+    def _reset_template_cache(self):
+        for loader in Engine.get_default().template_loaders:
+            loader.reset()
+
+    def test_critical_rules_match_the_fold(self):
+        nodes = styles.parse(self.CSS)
+        picked = styles.critical(nodes, styles.markup_tokens('<body><div class="hero x">'))
+        self.assertEqual(
+            [n.text() for n in picked],
+            ['body{margin: 0}', '.hero{color: red; animation: fade 1s}',
+             '@media (max-width: 600px){.hero{color: green}}', '@keyframes fade{from { opacity: 0 }}'],
+        )
+
+    def test_shared_rules_keep_the_cascade(self):
+        a = styles.parse('.card { color: red } .title { margin: 0 } .card { color: blue }')
+        b = styles.parse('.card { color: blue } .title { margin: 0 }')
+        c = styles.parse('.title { margin: 0 } .x { padding: 0 }')
+        # '.card{color: blue}' would jump ahead of '.card{color: red}' in a
+        self.assertEqual(styles.shared_rules({'a': a, 'b': b}), ['.title{margin: 0}'])
+        self.assertEqual(styles.shared_rules({'a': a, 'b': b, 'c': c}), ['.title{margin: 0}'])
+        self.assertEqual(styles.shared_rules({'b': b, 'c': c}), ['.title{margin: 0}'])
+        self.assertEqual(styles.specificity('a.active:hover::after'), (0, 2, 2))
+
+    def test_build_writes_templates_and_sheets(self):
+        call_command('build_styles', stdout=io.StringIO())
+        built = (settings.CSS_BUILD_DIR / 'portfolio' / 'index.html').read_text()
+        self.assertIn("{% static 'bundle/css/index.css' %}", built)
+        self.assertNotIn('project-shared.css', built)   # index is not in the project group
+        self.assertLess(len(built), len(styles.source_path('portfolio/index.html').read_text()))
+
+        project = (settings.CSS_BUILD_DIR / 'portfolio' / 'project-example.html').read_text()
+        self.assertIn("{% static 'bundle/css/project-shared.css' %}", project)
+        shared = {n.text() for n in styles.parse((settings.ASSET_BUNDLE_DIR / 'css' / 'project-shared.css').read_text())}
+        self.assertTrue(shared)
+        for name, group in styles.TEMPLATES.items():
+            if group == 'project':
+                source = styles.source_path(name).read_text()
+                rules = {n.text() for n in styles.parse(styles._STYLE_BLOCK.search(source).group(1))}
+                self.assertLessEqual(shared, rules)
+
+    def test_loader_uses_the_build_only_while_the_source_is_unchanged(self):
+        styles.build()
+        self._reset_template_cache()
+        cache.clear()
+        self.assertIn('/static/bundle/css/index.css', self.client.get('/').content.decode())
+
+        manifest = settings.CSS_BUILD_DIR / 'manifest.json'
+        manifest.write_text(json.dumps({'portfolio/index.html': 'stale'}))
+        self._reset_template_cache()
+        cache.clear()
+        self.assertNotIn('/static/bundle/css/index.css', self.client.get('/').content.decode())
+
+
+class HttpCacheTests(AdminLoginMixin, PortfolioTestCase):
+
+    def test_admin_pages_are_private_compressed_and_not_etagged(self):
+        self.login_admin()
+        response = self.client.get('/admin-panel/updates/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertNotIn('ETag', response)
+        self.assertIn(b'</html>', gzip.decompress(response.content))
+
+    @override_settings(CACHE_CONTROL={'portfolio:admin_metrics': 'public, max-age=60'}, METRICS_TOKEN='t0k3n')
+    def test_strong_etag_per_encoding_and_304(self):
+        auth = {'HTTP_AUTHORIZATION': 'Bearer t0k3n'}
+        plain = self.client.get('/admin-panel/metrics/', **auth)
+        self.assertEqual(plain['Cache-Control'], 'public, max-age=60')
+        self.assertRegex(plain['ETag'], r'^"[0-9a-f]{32}"$')
+
+        with mock.patch.object(metrics, 'render_prometheus', return_value='# same\n' * 100):
+            gz = self.client.get('/admin-panel/metrics/', HTTP_ACCEPT_ENCODING='gzip', **auth)
+            self.assertTrue(gz['ETag'].endswith('-gzip"'))
+            again = self.client.get('/admin-panel/metrics/', HTTP_ACCEPT_ENCODING='gzip',
+                                    HTTP_IF_NONE_MATCH=gz['ETag'], **auth)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_streamed_export_is_compressed_per_chunk(self):
+        for i in range(50):
+            ContactMessage.objects.create(name=f'n{i}', email='a@b.co', subject='s', message='m' * 50)
+        self.login_admin()
+        response = self.client.get('/admin-panel/export/messages/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        body = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual(body.count('a@b.co'), 50)
+
+    def test_small_json_is_not_compressed(self):
+        response = self.client.post('/api/contact/', data='{}', content_type='application/json',
+                                    HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+
+    def test_csrf_endpoint_sets_the_cookie(self):
+        response = self.client.get('/api/csrf/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIn('csrftoken', response.cookies)
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+
+
+class AdminSessionTests(AdminLoginMixin, PortfolioTestCase):
+
+    def _session_queries(self, path='/admin-panel/updates/'):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(path).status_code, 200)
+        return [q['sql'] for q in ctx.captured_queries if 'django_session' in q['sql']]
+
+    def test_admin_page_views_do_not_query_the_session_table(self):
+        self.login_admin()
+        self.assertEqual(self._session_queries(), [])
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_logout_reaches_workers_once_their_copy_expires(self):
+        self.login_admin()
+        self.client.get('/admin-panel/logout/')
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertRedirects(self.client.get('/admin-panel/updates/'), '/admin-panel/login/')
+
+        store = sessions.SessionStore()
+        store['x'] = 1
+        store.set_expiry(3600)
+        with mock.patch.object(store._cache.cache, 'set') as cache_set:
+            store.save()
+        self.assertEqual(cache_set.call_args.args[2], settings.SESSION_CACHE_SECONDS)
+
+    def test_every_write_path_caps_the_timeout(self):
+        wrapped = sessions._ShortLivedCache(mock.MagicMock(), 5)
+        for name in ('set', 'add', 'touch', 'get_or_set'):
+            getattr(wrapped, name)('k', *(['v'] if name != 'touch' else []), timeout=3600)
+        wrapped.set_many({'k': 'v'}, timeout=3600)
+        for name in ('set', 'add', 'touch', 'get_or_set', 'set_many'):
+            self.assertEqual(getattr(wrapped.cache, name).call_args.args[-1], 5, name)
+
+        wrapped = sessions._ShortLivedCache(mock.AsyncMock(), 5)
+
+        async def write():
+            await wrapped.aset('k', 'v', 3600)
+            await wrapped.aadd('k', 'v', 3600)
+            await wrapped.atouch('k', 3600)
+            await wrapped.aget_or_set('k', 'v', 3600)
+            await wrapped.aset_many({'k': 'v'}, 3600)
+        async_to_sync(write)()
+        for name in ('aset', 'aadd', 'atouch', 'aget_or_set', 'aset_many'):
+            self.assertEqual(getattr(wrapped.cache, name).call_args.args[-1], 5, name)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions_never_touch_the_database(self):
+        self.login_admin()
+        self.assertEqual(self._session_queries(), [])
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_token_is_computed_once_and_follows_settings(self):
+        views._make_token.cache_clear()
+        self.login_admin()
+        self.client.get('/admin-panel/updates/')
+        self.assertEqual(views._make_token.cache_info().misses, 1)
+        with override_settings(ADMIN_PANEL_PASSWORD='changed'):
+            self.assertRedirects(self.client.get('/admin-panel/updates/'), '/admin-panel/login/')
+
+    def test_retention_clears_expired_sessions(self):
+        Session.objects.create(session_key='old', session_data='', expire_date=timezone.now() - timedelta(days=1))
+        Session.objects.create(session_key='new', session_data='', expire_date=timezone.now() + timedelta(days=1))
+        call_command('prune_visitors', stdout=io.StringIO())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['new'])
@@ -0,0 +1,210 @@
+"""
+Buffered visitor tracking.
+
+Views hand each page view to ``record_visit()``, which only drops a small
+dict onto an in-process queue. A daemon thread drains that queue and
+writes the rows with a single ``bulk_create`` every
+VISITOR_FLUSH_BATCH_SIZE events or every VISITOR_FLUSH_INTERVAL_MS,
+whichever comes first. Page latency therefore never depends on the
+SiteVisitor table.
+
+If the queue is full (DB down, huge spike) new events are dropped and
+counted instead of blocking the request. Whatever is still queued when
+the process exits is flushed by ``shutdown()`` – registered with atexit
+and called from gunicorn's ``worker_exit`` hook (see gunicorn.conf.py).
+
+Writes do not invalidate the admin dashboard: under traffic a flush
+happens every couple of seconds, and the snapshot would never be served
+from cache. New visits show up once it expires (DASHBOARD_CACHE_SECONDS).
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import SiteVisitor
+
+
+logger = logging.getLogger(__name__)
+
+PAGE_MAX_LENGTH = SiteVisitor._meta.get_field('page').max_length
+
+
+class VisitorBuffer:
+    """Bounded queue of visit events + the thread that writes them."""
+
+    def __init__(self, max_size=10000, batch_size=100, interval_ms=2000, background=True):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = max(1, batch_size)
+        self.interval = max(interval_ms, 1) / 1000
+        self.background = background
+
+        # counters – read them with snapshot()
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+        self._stats_lock = threading.Lock()
+        self._flush_lock = threading.Lock()   # one writer at a time
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    # --- producer side (request thread) ---
+
+    def put(self, event):
+        """Queue one event. Never blocks; returns False if it was dropped."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+
+        with self._stats_lock:
+            self.queued += 1
+
+        if self.background:
+            self._ensure_thread()
+            if self.queue.qsize() >= self.batch_size:
+                self._wake.set()
+        return True
+
+    # --- consumer side (flusher thread) ---
+
+    def flush(self):
+        """Write everything currently queued. Returns the number of rows written."""
+        total = 0
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    break
+                total += self._write(batch)
+        return total
+
+    def _write(self, batch):
+        try:
+            SiteVisitor.objects.bulk_create([SiteVisitor(**event) for event in batch])
+        except Exception:
+            # Don't let tracking errors kill the flusher
+            logger.exception('Could not write %d visits', len(batch))
+            with self._stats_lock:
+                self.failed += len(batch)
+            return 0
+        with self._stats_lock:
+            self.written += len(batch)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def _ensure_thread(self):
+        # Also restarts the thread in a forked child (gunicorn --preload),
+        # where the parent's thread no longer exists.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='visitor-flusher', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout=5):
+        """Stop the flusher thread and write whatever is left."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def snapshot(self):
+        with self._stats_lock:
+            return {
+                'pending': self.queue.qsize(),
+                'queued': self.queued,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed,
+            }
+
+
+# ---------------------------------------------------------------------------
+# Module-level buffer used by the views
+# ---------------------------------------------------------------------------
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = VisitorBuffer(
+                    max_size=getattr(settings, 'VISITOR_QUEUE_MAX_SIZE', 10000),
+                    batch_size=getattr(settings, 'VISITOR_FLUSH_BATCH_SIZE', 100),
+                    interval_ms=getattr(settings, 'VISITOR_FLUSH_INTERVAL_MS', 2000),
+                )
+                atexit.register(_buffer.shutdown)
+    return _buffer
+
+
+def _event(ip_address, page, referrer, user_agent):
+    return {
+        'ip_address': ip_address,
+        'page': (page or '/')[:PAGE_MAX_LENGTH],
+        'referrer': referrer or '',
+        'user_agent': user_agent or '',
+        'visited_at': timezone.now(),
+    }
+
+
+def record_visit(ip_address, page, referrer='', user_agent=''):
+    """Queue one SiteVisitor row (or write it inline when buffering is off)."""
+    event = _event(ip_address, page, referrer, user_agent)
+    if not getattr(settings, 'VISITOR_TRACKING_ASYNC', True):
+        SiteVisitor.objects.create(**event)
+        return True
+    return get_buffer().put(event)
+
+
+async def arecord_visit(ip_address, page, referrer='', user_agent=''):
+    """record_visit() for async views. Queueing never blocks the event loop."""
+    event = _event(ip_address, page, referrer, user_agent)
+    if not getattr(settings, 'VISITOR_TRACKING_ASYNC', True):
+        await SiteVisitor.objects.acreate(**event)
+        return True
+    return get_buffer().put(event)
+
+
+def shutdown():
+    """Flush the module buffer, if one was ever created."""
+    if _buffer is not None:
+        _buffer.shutdown()
@@ -1,14 +1,22 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'portfolio'
 
+# native async versions when served by an ASGI server (uvicorn)
+if getattr(settings, 'ASYNC_VIEWS', False):
+    index, project_detail, contact_api = views.aportfolio_index, views.aproject_detail, views.acontact_api
+else:
+    index, project_detail, contact_api = views.portfolio_index, views.project_detail, views.contact_api
+
 urlpatterns = [
     # public
-    path('', views.portfolio_index, name='home'),
-    path('project/<slug:slug>/', views.project_detail, name='project_detail'),
-    path('project-example/', views.project_detail, {'slug': 'example'}, name='project_example'),
-    path('api/contact/', views.contact_api, name='contact_submit'),
+    path('', index, name='home'),
+    path('project/<slug:slug>/', project_detail, name='project_detail'),
+    path('project-example/', project_detail, {'slug': 'example'}, name='project_example'),
+    path('api/contact/', contact_api, name='contact_submit'),
+    path('api/csrf/', views.csrf_cookie, name='csrf_cookie'),
 
     # custom admin panel
     path('admin-panel/login/', views.admin_login, name='admin_login'),
@@ -17,4 +25,6 @@ urlpatterns = [
     path('admin-panel/visitors/', views.admin_visitors, name='admin_visitors'),
     path('admin-panel/messages/', views.admin_messages, name='admin_messages'),
     path('admin-panel/updates/', views.admin_updates, name='admin_updates'),
+    path('admin-panel/export/<str:kind>/', views.admin_export, name='admin_export'),
+    path('admin-panel/metrics/', views.admin_metrics, name='admin_metrics'),
 ]
\ No newline at end of file
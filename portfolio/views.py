@@ -1,17 +1,25 @@
 import json
 import hashlib
-from datetime import timedelta
-from functools import wraps
+import hmac
+import logging
+from functools import lru_cache, wraps
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.core.mail import send_mail, BadHeaderError
-from django.http import JsonResponse
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.db import transaction
 from django.shortcuts import render, redirect
-from django.views.decorators.csrf import csrf_protect
-from django.views.decorators.http import require_POST
+from django.views.decorators.csrf import csrf_protect, ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
 
-from .models import ContactMessage, SiteSettings, SiteVisitor, SiteUpdate, LoginAttempt
+from . import dashboard, exports, log, metrics, outbox, page_cache, pagination, projects, ratelimit, tracking
+from .models import ContactMessage, ContactedIP, SiteSettings, SiteVisitor, SiteUpdate, LoginAttempt
+
+
+logger = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
@@ -24,49 +32,39 @@ def _get_client_ip(request):
 
 
 def _track_visitor(request):
-    """Log one row into SiteVisitor. Also auto-deletes visits older than 90 days."""
+    """Queue one SiteVisitor row. Old rows are pruned by `manage.py prune_visitors`."""
     try:
-        ip = _get_client_ip(request)
-        SiteVisitor.objects.create(
-            ip_address=ip,
-            page=request.path,
-            referrer=request.META.get('HTTP_REFERER', ''),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-        )
-        # cleanup old records – keeps the DB lean
-        cutoff = timezone.now() - timedelta(days=90)
-        SiteVisitor.objects.filter(visited_at__lt=cutoff).delete()
-    except Exception as e:
+        with metrics.timed('tracking'):
+            tracking.record_visit(
+                ip_address=_get_client_ip(request),
+                page=request.path,
+                referrer=request.META.get('HTTP_REFERER', ''),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            )
+    except Exception:
         # Don't let tracking errors break the site
-        print(f"Visitor tracking error: {e}")
-        pass
+        tracking.logger.exception('Visitor tracking failed', extra=log.request_extra(request))
 
 
 # ---------------------------------------------------------------------------
-# Brute-force protection helpers
+# Brute-force protection / rate-limit helpers
 # ---------------------------------------------------------------------------
-# Rules: 5 failed attempts from one IP within 15 minutes = locked for 15 min.
-
-BRUTE_MAX_ATTEMPTS = 5
-BRUTE_WINDOW_MINUTES = 15
-
+# Rules live in settings.RATE_LIMITS (see ratelimit.py):
+#   login   – 5 failed attempts from one IP within 15 minutes = locked.
+#   contact – max 3 submissions from one IP per 10 minutes.
 
 def _is_ip_locked(ip):
     """Check if this IP has too many recent failed logins."""
     try:
-        window_start = timezone.now() - timedelta(minutes=BRUTE_WINDOW_MINUTES)
-        fails = LoginAttempt.objects.filter(
-            ip_address=ip,
-            attempted_at__gte=window_start,
-        ).count()
-        return fails >= BRUTE_MAX_ATTEMPTS
+        return ratelimit.get_limiter().is_limited('login', ip)
     except Exception:
         return False
 
 
 def _record_failed_login(ip):
-    """Save one failed attempt row."""
+    """Count one failed attempt and save an audit row."""
     try:
+        ratelimit.get_limiter().hit('login', ip)
         LoginAttempt.objects.create(ip_address=ip)
     except Exception:
         pass
@@ -75,40 +73,15 @@ def _record_failed_login(ip):
 def _minutes_until_unlock(ip):
     """Return how many minutes remain on the lockout, rounded up."""
     try:
-        window_start = timezone.now() - timedelta(minutes=BRUTE_WINDOW_MINUTES)
-        oldest = (
-            LoginAttempt.objects
-            .filter(ip_address=ip, attempted_at__gte=window_start)
-            .order_by('attempted_at')
-            .first()
-        )
-        if not oldest:
-            return 0
-        unlock_at = oldest.attempted_at + timedelta(minutes=BRUTE_WINDOW_MINUTES)
-        remaining = (unlock_at - timezone.now()).total_seconds()
-        return max(0, int(remaining // 60) + 1)
+        return ratelimit.minutes_until_allowed('login', ip)
     except Exception:
         return 0
 
 
-# ---------------------------------------------------------------------------
-# Rate-limit helper for contact form
-# ---------------------------------------------------------------------------
-# Rules: max 3 submissions from one IP per 10 minutes.
-
-CONTACT_MAX_PER_WINDOW = 3
-CONTACT_WINDOW_MINUTES = 10
-
-
 def _is_contact_rate_limited(ip):
     """True when this IP has submitted too many messages recently."""
     try:
-        window_start = timezone.now() - timedelta(minutes=CONTACT_WINDOW_MINUTES)
-        count = ContactMessage.objects.filter(
-            ip_address=ip,
-            created_at__gte=window_start,
-        ).count()
-        return count >= CONTACT_MAX_PER_WINDOW
+        return ratelimit.get_limiter().is_limited('contact', ip)
     except Exception:
         return False
 
@@ -117,52 +90,60 @@ def _is_contact_rate_limited(ip):
 # Public portfolio pages
 # ---------------------------------------------------------------------------
 
-def portfolio_index(request):
-    _track_visitor(request)
+def _public_context():
     try:
         site = SiteSettings.load()
-    except Exception as e:
-        print(f"SiteSettings error: {e}")
+    except Exception:
+        logger.exception('Could not load SiteSettings')
         site = None
-    return render(request, 'portfolio/index.html', {'site': site})
+    return {'site': site}
+
+
+def portfolio_index(request):
+    _track_visitor(request)
+    return page_cache.render_page(request, 'portfolio/index.html', _public_context)
+
+
+# Hand-written pages from before projects lived in the DB. A Project row
+# with the same slug takes precedence.
+PROJECT_TEMPLATES = {
+    'inventory-system': 'portfolio/project-inventory-system.html',
+    'joint-force':       'portfolio/project-joint-force.html',
+    'example':           'portfolio/project-example.html',
+}
 
 
 def project_detail(request, slug):
     _track_visitor(request)
-    try:
-        site = SiteSettings.load()
-    except Exception as e:
-        print(f"SiteSettings error: {e}")
-        site = None
-    
-    template_map = {
-        'inventory-system': 'portfolio/project-inventory-system.html',
-        'joint-force':       'portfolio/project-joint-force.html',
-        'example':           'portfolio/project-example.html',
-    }
-    template = template_map.get(slug)
+
+    project = projects.get(slug)
+    if project is not None:
+        return page_cache.render_page(
+            request, 'portfolio/project_detail.html',
+            lambda: {**_public_context(), 'project': project},
+            variant=f'{slug}|{projects.digest()}',
+        )
+
+    template = PROJECT_TEMPLATES.get(slug)
     if template is None:
-        from django.http import Http404
         raise Http404("Project not found.")
-    return render(request, template, {'site': site})
+    return page_cache.render_page(request, template, _public_context)
 
 
-@csrf_protect
-@require_POST
-def contact_api(request):
+def _clean_contact(request):
     """
-    AJAX endpoint: POST JSON -> validate -> save -> email -> return JSON.
-    Protected by: CSRF token, honeypot field, rate limiting per IP.
+    Parse and validate the contact form JSON.
+    Returns (fields, None) or (None, JsonResponse to send back).
     """
     try:
         body = json.loads(request.body)
     except json.JSONDecodeError:
-        return JsonResponse({'success': False, 'error': 'Invalid JSON.'}, status=400)
+        return None, JsonResponse({'success': False, 'error': 'Invalid JSON.'}, status=400)
 
     # --- HONEYPOT: if this hidden field has any value, it's a bot ---
     if body.get('website', '').strip():
         # silently pretend it worked – bots don't know they failed
-        return JsonResponse({'success': True, 'message': 'Message sent successfully!'})
+        return None, JsonResponse({'success': True, 'message': 'Message sent successfully!'})
 
     name    = body.get('name', '').strip()
     email   = body.get('email', '').strip()
@@ -170,58 +151,144 @@ def contact_api(request):
     message = body.get('message', '').strip()
 
     if not all([name, email, subject, message]):
-        return JsonResponse({'success': False, 'error': 'All fields are required.'}, status=400)
+        return None, JsonResponse({'success': False, 'error': 'All fields are required.'}, status=400)
 
     if len(subject) > 300 or len(name) > 200 or len(message) > 5000:
-        return JsonResponse({'success': False, 'error': 'Input too long.'}, status=400)
+        return None, JsonResponse({'success': False, 'error': 'Input too long.'}, status=400)
 
     # basic email format sanity check
     if '@' not in email or '.' not in email.split('@')[-1]:
-        return JsonResponse({'success': False, 'error': 'Invalid email.'}, status=400)
+        return None, JsonResponse({'success': False, 'error': 'Invalid email.'}, status=400)
+
+    return {'name': name, 'email': email, 'subject': subject, 'message': message}, None
+
+
+def _save_contact(fields, ip):
+    """Save the message, with the notification email queued in the same transaction."""
+    owner_email = getattr(settings, 'ADMIN_EMAIL', settings.EMAIL_HOST_USER)
+    with transaction.atomic():
+        ContactMessage.objects.create(ip_address=ip, **fields)
+        ContactedIP.record(ip)   # visitor list shows this IP as "sent contact"
+        # sent by the outbox worker, not this request
+        outbox.enqueue(
+            subject=f"[Portfolio] {fields['subject']}",
+            body=(
+                f"New contact message from your portfolio site.\n\n"
+                f"Name:    {fields['name']}\n"
+                f"Email:   {fields['email']}\n"
+                f"Subject: {fields['subject']}\n\n"
+                f"--- Message ---\n{fields['message']}"
+            ),
+            to=[owner_email],
+        )
+    try:
+        ratelimit.get_limiter().hit('contact', ip)
+    except Exception:
+        pass
+
+
+@ensure_csrf_cookie
+@require_GET
+def csrf_cookie(request):
+    """
+    Set the csrftoken cookie for the contact form. The public pages don't
+    set it, so they are identical for every visitor and a CDN can store them.
+    """
+    return HttpResponse(status=204)
+
+
+RATE_LIMITED_RESPONSE = {'success': False, 'error': 'Too many messages. Please wait a few minutes.'}
+
+
+@csrf_protect
+@require_POST
+def contact_api(request):
+    """
+    AJAX endpoint: POST JSON -> validate -> save + queue email -> return JSON.
+    Protected by: CSRF token, honeypot field, rate limiting per IP.
+    """
+    fields, error = _clean_contact(request)
+    if error is not None:
+        return error
 
     ip = _get_client_ip(request)
 
     # --- RATE LIMIT ---
     if _is_contact_rate_limited(ip):
-        return JsonResponse(
-            {'success': False, 'error': 'Too many messages. Please wait a few minutes.'},
-            status=429,
-        )
+        return JsonResponse(RATE_LIMITED_RESPONSE, status=429)
 
-    # 1. Save to database
+    # Save to database + queue the email to your inbox
     try:
-        ContactMessage.objects.create(
-            name=name, email=email, subject=subject, message=message, ip_address=ip
-        )
-    except Exception as e:
-        print(f"Database error: {e}")
+        _save_contact(fields, ip)
+    except Exception:
+        logger.exception('Could not save contact message', extra=log.request_extra(request))
         return JsonResponse({'success': False, 'error': 'Database error.'}, status=500)
+    dashboard.invalidate()
+
+    return JsonResponse({'success': True, 'message': 'Message sent successfully!'})
+
+
+# ---------------------------------------------------------------------------
+# Async versions of the public views (ASGI, settings.ASYNC_VIEWS)
+# ---------------------------------------------------------------------------
+# Same behaviour as the sync views above. Page views never leave the event
+# loop on a cache hit: every middleware in settings.MIDDLEWARE is
+# async-capable, visits go onto the tracking queue, slugs resolve from the
+# in-memory project index and the page comes from the page cache.
 
-    # 2. Mark matching SiteVisitor rows
+async def _atrack_visitor(request):
     try:
-        SiteVisitor.objects.filter(ip_address=ip).update(sent_contact=True)
+        with metrics.timed('tracking'):
+            await tracking.arecord_visit(
+                ip_address=_get_client_ip(request),
+                page=request.path,
+                referrer=request.META.get('HTTP_REFERER', ''),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            )
     except Exception:
-        pass
+        tracking.logger.exception('Visitor tracking failed', extra=log.request_extra(request))
 
-    # 3. Send email to your inbox
-    owner_email = getattr(settings, 'ADMIN_EMAIL', settings.EMAIL_HOST_USER)
 
-    try:
-        send_mail(
-            subject=f"[Portfolio] {subject}",
-            message=(
-                f"New contact message from your portfolio site.\n\n"
-                f"Name:    {name}\n"
-                f"Email:   {email}\n"
-                f"Subject: {subject}\n\n"
-                f"--- Message ---\n{message}"
-            ),
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[owner_email],
-            fail_silently=False,
+async def aportfolio_index(request):
+    await _atrack_visitor(request)
+    return await page_cache.arender_page(request, 'portfolio/index.html', _public_context)
+
+
+async def aproject_detail(request, slug):
+    await _atrack_visitor(request)
+
+    project, digest = await projects.aget(slug)
+    if project is not None:
+        return await page_cache.arender_page(
+            request, 'portfolio/project_detail.html',
+            lambda: {**_public_context(), 'project': project},
+            variant=f'{slug}|{digest}',
         )
-    except (BadHeaderError, Exception):
-        pass  # saved to DB anyway
+
+    template = PROJECT_TEMPLATES.get(slug)
+    if template is None:
+        raise Http404("Project not found.")
+    return await page_cache.arender_page(request, template, _public_context)
+
+
+@csrf_protect
+@require_POST
+async def acontact_api(request):
+    fields, error = _clean_contact(request)
+    if error is not None:
+        return error
+
+    ip = _get_client_ip(request)
+    if await sync_to_async(_is_contact_rate_limited)(ip):
+        return JsonResponse(RATE_LIMITED_RESPONSE, status=429)
+
+    # the transaction (message + outbox row) still runs as one sync block
+    try:
+        await sync_to_async(_save_contact)(fields, ip)
+    except Exception:
+        logger.exception('Could not save contact message', extra=log.request_extra(request))
+        return JsonResponse({'success': False, 'error': 'Database error.'}, status=500)
+    await dashboard.ainvalidate()
 
     return JsonResponse({'success': True, 'message': 'Message sent successfully!'})
 
@@ -233,14 +300,21 @@ def contact_api(request):
 ADMIN_SESSION_KEY = '_portfolio_admin_auth'
 
 
+@lru_cache(maxsize=None)
 def _make_token():
+    """Session value of a logged-in admin. Computed once per process (settings don't change)."""
     raw = settings.SECRET_KEY + settings.ADMIN_PANEL_PASSWORD
     return hashlib.sha256(raw.encode()).hexdigest()
 
 
+@receiver(setting_changed)
+def _reset_token(setting, **kwargs):
+    if setting in ('SECRET_KEY', 'ADMIN_PANEL_PASSWORD'):
+        _make_token.cache_clear()
+
+
 def _is_admin(request):
-    expected = _make_token()
-    return request.session.get(ADMIN_SESSION_KEY) == expected
+    return hmac.compare_digest(request.session.get(ADMIN_SESSION_KEY, ''), _make_token())
 
 
 def admin_required(view_func):
@@ -281,6 +355,7 @@ def admin_login(request):
             else:
                 request.session.set_expiry(3600)  # 1 hour
             try:
+                ratelimit.get_limiter().reset('login', ip)
                 LoginAttempt.objects.filter(ip_address=ip).delete()
             except Exception:
                 pass
@@ -294,12 +369,7 @@ def admin_login(request):
                 minutes_left = _minutes_until_unlock(ip)
             else:
                 try:
-                    window_start = timezone.now() - timedelta(minutes=BRUTE_WINDOW_MINUTES)
-                    used = LoginAttempt.objects.filter(
-                        ip_address=ip,
-                        attempted_at__gte=window_start,
-                    ).count()
-                    remaining = BRUTE_MAX_ATTEMPTS - used
+                    remaining = ratelimit.get_limiter().remaining('login', ip)
                     error = f'Invalid password. {remaining} attempt{"s" if remaining != 1 else ""} left.'
                 except Exception:
                     error = 'Invalid password.'
@@ -316,51 +386,33 @@ def admin_logout(request):
     return redirect('portfolio:admin_login')
 
 
+def _admin_page_size():
+    return getattr(settings, 'ADMIN_PAGE_SIZE', 50)
+
+
 # --- dashboard ---
 
 @admin_required
 def admin_dashboard(request):
     try:
-        now = timezone.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        total_visits   = SiteVisitor.objects.count()
-        today_visits   = SiteVisitor.objects.filter(visited_at__gte=today_start).count()
-        total_messages = ContactMessage.objects.count()
-        unread         = ContactMessage.objects.filter(is_read=False).count()
-
-        chart_labels = []
-        chart_values = []
-        for i in range(6, -1, -1):
-            day = now - timedelta(days=i)
-            day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end   = day_start + timedelta(days=1)
-            count = SiteVisitor.objects.filter(visited_at__gte=day_start, visited_at__lt=day_end).count()
-            chart_labels.append(day.strftime('%a'))
-            chart_values.append(count)
-
-        recent_messages = ContactMessage.objects.order_by('-created_at')[:5]
-
-        ctx = {
-            'total_visits': total_visits,
-            'today_visits': today_visits,
-            'total_messages': total_messages,
-            'unread': unread,
-            'chart_labels': json.dumps(chart_labels),
-            'chart_values': json.dumps(chart_values),
-            'recent_messages': recent_messages,
-        }
-    except Exception as e:
-        print(f"Dashboard error: {e}")
+        snapshot = dashboard.get_snapshot()
+        ctx = dict(snapshot)
+        ctx['chart_labels'] = json.dumps(snapshot['chart_labels'])
+        ctx['chart_values'] = json.dumps(snapshot['chart_values'])
+    except Exception:
+        logger.exception('Could not build dashboard', extra=log.request_extra(request))
         ctx = {
             'total_visits': 0,
             'today_visits': 0,
+            'unique_today': 0,
+            'unique_week': 0,
             'total_messages': 0,
             'unread': 0,
             'chart_labels': json.dumps([]),
             'chart_values': json.dumps([]),
             'recent_messages': [],
         }
+    ctx['unread_count'] = ctx['unread']
     return render(request, 'portfolio/admin_dashboard.html', ctx)
 
 
@@ -369,10 +421,20 @@ def admin_dashboard(request):
 @admin_required
 def admin_visitors(request):
     try:
-        visitors = SiteVisitor.objects.order_by('-visited_at')[:200]
+        page = pagination.paginate(
+            SiteVisitor.objects.only(
+                'ip_address', 'page', 'referrer', 'user_agent', 'visited_at',
+            ).annotate(sent_contact=ContactedIP.sent_contact()),
+            'visited_at',
+            cursor=request.GET.get('cursor'),
+            page_size=_admin_page_size(),
+        )
     except Exception:
-        visitors = []
-    return render(request, 'portfolio/admin_visitors.html', {'visitors': visitors})
+        page = pagination.KeysetPage()
+    return render(request, 'portfolio/admin_visitors.html', {
+        'visitors': page.items,
+        'page': page,
+    })
 
 
 # --- messages ---
@@ -380,11 +442,66 @@ def admin_visitors(request):
 @admin_required
 def admin_messages(request):
     try:
-        messages = ContactMessage.objects.order_by('-created_at')
-        messages.update(is_read=True)
+        page = pagination.paginate(
+            ContactMessage.objects.only(
+                'name', 'email', 'subject', 'message', 'ip_address', 'created_at', 'is_read',
+            ),
+            'created_at',
+            cursor=request.GET.get('cursor'),
+            page_size=_admin_page_size(),
+        )
+        # only what is on screen counts as read
+        unread_ids = [msg.pk for msg in page.items if not msg.is_read]
+        if unread_ids and ContactMessage.objects.filter(pk__in=unread_ids).update(is_read=True):
+            dashboard.invalidate()
     except Exception:
-        messages = []
-    return render(request, 'portfolio/admin_messages.html', {'messages': messages})
+        page = pagination.KeysetPage()
+    return render(request, 'portfolio/admin_messages.html', {
+        'messages': page.items,
+        'page': page,
+    })
+
+
+# --- exports ---
+
+@admin_required
+def admin_export(request, kind):
+    """Stream visitors / messages as CSV or NDJSON. ?format=&start=&end=&page="""
+    if kind not in exports.EXPORTS:
+        raise Http404("Unknown export.")
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return HttpResponseBadRequest('format must be csv or ndjson')
+    try:
+        start = exports.parse_day(request.GET.get('start'))
+        end = exports.parse_day(request.GET.get('end'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    response = StreamingHttpResponse(
+        exports.stream(kind, fmt, start=start, end=end, page=request.GET.get('page')),
+        content_type=exports.FORMATS[fmt],
+    )
+    filename = f"{kind}-{timezone.now():%Y%m%d-%H%M}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# --- metrics ---
+
+def _has_metrics_token(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+def admin_metrics(request):
+    """Request latency histograms (metrics.py) for Prometheus. Admin session or METRICS_TOKEN."""
+    if not (_is_admin(request) or _has_metrics_token(request)):
+        return redirect('portfolio:admin_login')
+    routes, workers = metrics.collect()
+    return HttpResponse(metrics.render_prometheus(routes, workers),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 # --- updates / versions ---
@@ -29,6 +29,10 @@ DEBUG = os.environ.get('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
+# Route the public pages and contact API to their async views. Turn on when
+# serving portfolio_site.asgi with uvicorn; leave off under gunicorn (WSGI).
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+
 
 # Application definition
 
@@ -50,8 +54,11 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'portfolio.middleware.RequestTimingMiddleware',   # first, so 'total' covers everything
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'portfolio.middleware.HttpCacheMiddleware',     # outside session/CSRF, so it sees their cookies
+    'portfolio.middleware.QueryBudgetMiddleware',   # dev only, see QUERY_BUDGET_MODE
+    'portfolio.middleware.StaticFilesMiddleware',   # WhiteNoise, sync and async
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +66,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+
+    # Your middleware
+    'portfolio.middleware.PrerenderedPageMiddleware',
 ]
 
 
@@ -66,10 +76,18 @@ ROOT_URLCONF = 'portfolio_site.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'portfolio.metrics.TimedDjangoTemplates',   # DjangoTemplates + render timing
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # templates rewritten by `manage.py build_styles` first (while
+            # they match their source), then the usual app directories
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'portfolio.styles.BuiltTemplateLoader',
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -120,6 +138,29 @@ STATICFILES_DIRS = [
     BASE_DIR / 'portfolio' / 'static',
 ]
 
+# collectstatic writes content-hashed, gzip + brotli precompressed copies
+# (served with immutable Cache-Control by WhiteNoise). Front-end libraries
+# and fonts are self-hosted once `python manage.py build_assets` has written
+# them to portfolio/static/bundle/; until then the pages load them from
+# their CDNs (portfolio/templatetags/bundle.py).
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'portfolio.storage.StaticFilesStorage'},
+}
+ASSET_BUNDLE_DIR = BASE_DIR / 'portfolio' / 'static' / 'bundle'
+
+# `python manage.py optimize_images` writes resized WebP/AVIF copies of
+# portfolio/static/images here (hashed names + manifest.json) for the
+# {% picture %} tag; run before collectstatic. Not committed.
+IMAGE_VARIANTS_DIR = BASE_DIR / 'portfolio' / 'static' / 'optimized'
+IMAGE_WIDTHS       = (320, 640, 960, 1280)   # plus the original width, up to IMAGE_MAX_WIDTH
+IMAGE_MAX_WIDTH    = 1600
+
+# `python manage.py build_styles` writes copies of the public templates
+# here with only the critical CSS inline; the rest goes to
+# ASSET_BUNDLE_DIR/css. Run before collectstatic. Not committed.
+CSS_BUILD_DIR = BASE_DIR / 'build' / 'templates'
+
 # Media files
 
 MEDIA_URL = '/media/'
@@ -164,6 +205,17 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'Hishamharismeet@gmail.com'
 ADMIN_EMAIL        = 'Hishamharismeet@gmail.com'
 
+# --- OUTBOX (see portfolio/outbox.py) ---
+# 'thread'  = send from a background thread in each web worker
+# 'command' = web only queues; run `python manage.py run_outbox` separately
+# 'inline'  = send right after the request's transaction commits
+OUTBOX_DELIVERY           = os.environ.get('OUTBOX_DELIVERY', 'thread')
+OUTBOX_BATCH_SIZE         = 50      # emails per SMTP connection
+OUTBOX_POLL_SECONDS       = 30      # retry check interval for the worker
+OUTBOX_MAX_ATTEMPTS       = 8
+OUTBOX_RETRY_BASE_SECONDS = 30      # 30s, 60s, 2m, 4m ... after each failure
+OUTBOX_RETRY_MAX_SECONDS  = 3600
+
 
 # ============================================================
 # SECURITY HEADERS
@@ -180,17 +232,13 @@ X_FRAME_OPTIONS = 'DENY'
 
 # Content Security Policy â€” tells the browser exactly what is allowed to run
 # This blocks any script/style that isn't explicitly from your approved sources
+# (the policy once the asset bundle is built; index.html adds the CDN origins
+# while it isn't, see {% bundle_csp %})
 SECURE_CONTENT_SECURITY_POLICY = (
     "default-src 'self'; "                                          # everything else: only your own domain
-    "script-src 'self' 'unsafe-inline' "                            # your own JS + inline scripts
-        "https://cdn.jsdelivr.net "                                 # Bootstrap JS
-        "https://unpkg.com "                                        # AOS
-        "https://cdn.jsdelivr.net/npm/particles.js@2.0.0/particles.min.js; "  # Particles
-    "style-src 'self' 'unsafe-inline' "                             # your own CSS + inline styles
-        "https://cdn.jsdelivr.net "                                 # Bootstrap CSS
-        "https://unpkg.com "                                        # AOS CSS
-        "https://fonts.googleapis.com; "                            # Google Fonts CSS
-    "font-src 'self' https://fonts.gstatic.com https://cdn.jsdelivr.net data:; "                   # Google Fonts files + Bootstrap Icons
+    "script-src 'self'; "                                           # bundle/site.js (Bootstrap, AOS, particles, main.js)
+    "style-src 'self' 'unsafe-inline'; "                            # bundle CSS + the inline <style> blocks
+    "font-src 'self'; "                                             # self-hosted fonts + icon font
     "img-src 'self' https://images.unsplash.com data:; "            # your images + unsplash placeholders
     "connect-src 'self'; "                                          # AJAX only to your own domain
     "frame-ancestors 'none'; "                                      # no iframes embedding you (same as X-Frame-Options)
@@ -235,6 +283,170 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 # Session expires when the browser closes (unless "remember me" sets expiry)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
+# Admin sessions: 'portfolio.sessions' = database rows with a per-worker
+# in-memory copy (CACHES['sessions']), so admin page views don't query
+# django_session; copies expire after SESSION_CACHE_SECONDS so a logout
+# reaches every worker. 'django.contrib.sessions.backends.signed_cookies'
+# never touches the database, but a logout can't revoke a copied cookie.
+# Expired rows are cleared by `manage.py prune_visitors`.
+SESSION_ENGINE        = os.environ.get('SESSION_ENGINE', 'portfolio.sessions')
+SESSION_CACHE_ALIAS   = 'sessions'
+SESSION_CACHE_SECONDS = 300
+
+# ============================================================
+# CACHE
+# ============================================================
+# Local memory by default. With several gunicorn workers, point this
+# at something they share so rate limits and cached pages agree, e.g.
+#   CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   CACHE_LOCATION=/var/tmp/portfolio_cache
+# ============================================================
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'portfolio'),
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+}
+
+
+# ============================================================
+# RATE LIMITS (contact form + admin login)
+# ============================================================
+# (max events, window in seconds) per IP.
+#   CacheRateLimiter       – sliding-window counters in CACHES (default; no
+#                            queries, per worker unless CACHE_BACKEND is shared)
+#   DatabaseRateLimiter    – counts LoginAttempt / ContactMessage rows
+#   LocalMemoryRateLimiter – in-process, per worker (single process only)
+# ============================================================
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', '')
+RATE_LIMITS = {
+    'login':   (5, 15 * 60),
+    'contact': (3, 10 * 60),
+}
+RATE_LIMIT_MAX_KEYS = 10000   # IPs remembered by the in-memory backend
+
+# SiteSettings is kept in each worker's memory; edits reach every
+# worker within this many seconds (sooner in the worker that saved)
+SITE_SETTINGS_RECHECK_SECONDS = 5
+
+# Rendered home / project pages are cached (precompressed, with ETags).
+# Keys include the SiteSettings version and template mtime, so edits
+# show up immediately; this is just how long an unused entry lives.
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_SECONDS = 60 * 60
+
+# Cache-Control per URL name (HttpCacheMiddleware); anything not listed
+# (admin panel, contact API, errors) gets CACHE_CONTROL_DEFAULT. The
+# public pages are public but revalidated on every request, so a CDN in
+# front stores them and gets a 304 from the page cache while each visit is
+# still tracked. Adding s-maxage lets the CDN answer on its own, but then
+# those visits never reach SiteVisitor.
+PUBLIC_CACHE_CONTROL  = 'public, max-age=0, must-revalidate'
+CACHE_CONTROL = {
+    'portfolio:home':            PUBLIC_CACHE_CONTROL,
+    'portfolio:project_detail':  PUBLIC_CACHE_CONTROL,
+    'portfolio:project_example': PUBLIC_CACHE_CONTROL,
+    'prerendered':               PUBLIC_CACHE_CONTROL,
+}
+CACHE_CONTROL_DEFAULT = 'private, no-store'
+
+# Other dynamic responses (admin pages, JSON, CSV exports) are brotli /
+# gzip compressed on the fly above this size
+COMPRESS_MIN_BYTES = 512
+
+# `python manage.py prerender_pages` writes the public pages here at
+# deploy time; the middleware serves them without touching templates.
+PRERENDER_ROOT  = BASE_DIR / 'prerendered'
+PRERENDER_SERVE = os.environ.get('PRERENDER_SERVE', 'True') == 'True'
+
+# ============================================================
+# VISITOR TRACKING
+# ============================================================
+# Page views are queued in memory and written to SiteVisitor in
+# batches by a background thread, so a public page never waits on
+# the database. Queued events are flushed when a worker exits.
+# ============================================================
+VISITOR_TRACKING_ASYNC    = True   # False = write each visit inline
+VISITOR_QUEUE_MAX_SIZE    = 10000  # events held in memory before new ones are dropped
+VISITOR_FLUSH_BATCH_SIZE  = 100    # write as soon as this many are queued...
+VISITOR_FLUSH_INTERVAL_MS = 2000   # ...or at least this often
+
+# Admin dashboard numbers are cached this long; new visits show up once
+# it runs out (messages drop the cache at once)
+DASHBOARD_CACHE_SECONDS = 30
+
+# The dashboard folds at most this many hours of new visits into the
+# hourly rollup per load; `manage.py rollup_visitors` catches up the rest
+ROLLUP_MAX_HOURS_PER_REQUEST = 48
+
+# Rows per page on the admin Visitors / Messages tables
+ADMIN_PAGE_SIZE = 50
+
+# Per-view query budgets (portfolio/budgets.py), checked on every request
+# by QueryBudgetMiddleware: 'log' = warn, 'raise' = error page, 'off' = disabled.
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'off')
+
+# Request timing (portfolio/metrics.py): Server-Timing headers plus
+# per-route latency histograms at /admin-panel/metrics/ (Prometheus text).
+# Each worker writes its counts to the cache every METRICS_FLUSH_SECONDS;
+# use a shared CACHE_BACKEND to see all workers in one scrape. Scrapers
+# can send "Authorization: Bearer <METRICS_TOKEN>" instead of logging in.
+METRICS_ENABLED       = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+SERVER_TIMING_HEADER  = True
+METRICS_FLUSH_SECONDS = 10
+METRICS_TOKEN         = os.environ.get('METRICS_TOKEN', '')
+
+# ============================================================
+# LOGGING
+# ============================================================
+# portfolio.* loggers write one JSON object per line to stderr from a
+# background thread (portfolio/log.py); the request thread only queues
+# the record. Repeated visitor-tracking errors are sampled: at most 5
+# per message per minute, with a "suppressed" count on the next one.
+# ============================================================
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'portfolio.log.JsonFormatter'},
+    },
+    'filters': {
+        'sampled': {'()': 'portfolio.log.SampledFilter', 'burst': 5, 'window': 60},
+    },
+    'handlers': {
+        'background': {
+            'class': 'portfolio.log.BackgroundHandler',
+            'formatter': 'json',
+            'max_size': 10000,   # queued records before new ones are dropped
+        },
+    },
+    'loggers': {
+        'portfolio': {'handlers': ['background'], 'level': LOG_LEVEL, 'propagate': False},
+        'portfolio.tracking': {'filters': ['sampled']},
+    },
+}
+
+# ============================================================
+# DATA RETENTION
+# ============================================================
+# Old rows are deleted by `python manage.py prune_visitors`, never
+# during a page view. None = keep forever.
+# ============================================================
+RETENTION_DAYS = {
+    'SiteVisitor':    90,
+    'LoginAttempt':   30,
+    'ContactMessage': None,
+}
+RETENTION_BATCH_SIZE     = 1000   # rows per DELETE
+RETENTION_BATCH_SLEEP    = 0.05   # seconds between batches
+RETENTION_PRUNE_INTERVAL = 0      # seconds; > 0 also prunes inside gunicorn workers
+
 #DataBase
 
 DATABASES = {